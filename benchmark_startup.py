@@ -0,0 +1,79 @@
+"""
+Startup time benchmark.
+Run this to track how long a worker takes to import the application and to boot.
+
+It performs the following, each in a fresh interpreter so caches do not skew results:
+
+1. Measures the time to import the FastAPI application (`import main`)
+2. Lists the slowest imported modules as reported by `python -X importtime`
+3. Optionally (--boot) measures the startup event: migrations and initial data seeding
+
+Usage:
+    python benchmark_startup.py [--runs 5] [--boot]
+
+Note: --boot connects to the configured database, so its timings include network latency.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+print(time.perf_counter() - start)
+"""
+
+BOOT_SNIPPET = """
+import asyncio, time
+import main
+start = time.perf_counter()
+asyncio.run(main.startup_event())
+print(time.perf_counter() - start)
+"""
+
+
+def run_snippet(snippet: str) -> float:
+    """Run a snippet in a fresh interpreter and return the duration it prints"""
+    result = subprocess.run(
+        [sys.executable, "-c", snippet], capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int = 15):
+    """Return the modules with the highest cumulative import time, in microseconds"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], capture_output=True, text=True, check=True
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        timings.append((int(cumulative_us), module.strip()))
+    return sorted(timings, reverse=True)[:limit]
+
+
+def report(label: str, durations):
+    print(
+        f"{label}: median {statistics.median(durations) * 1000:.1f} ms, "
+        f"min {min(durations) * 1000:.1f} ms, max {max(durations) * 1000:.1f} ms over {len(durations)} run(s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure application import and boot time")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh-interpreter runs")
+    parser.add_argument("--boot", action="store_true", help="Also time the startup event (needs the database)")
+    args = parser.parse_args()
+
+    report("import main", [run_snippet(IMPORT_SNIPPET) for _ in range(args.runs)])
+
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, module in slowest_imports():
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    if args.boot:
+        report("\nstartup event", [run_snippet(BOOT_SNIPPET) for _ in range(args.runs)])
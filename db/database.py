@@ -40,38 +40,58 @@ def get_db() -> Session:
         db.close()
 
 
+ALEMBIC_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
 def init_db():
-    """Initialize database tables"""
-    # Import models to ensure they are registered with Base before creating tables
-    from .models import Role, User, RecommendationTypeModel, Recommendation, Journal, WeeklyReport
+    """
+    Bring the database schema up to date by applying Alembic migrations.
+    
+    Databases created before migrations were introduced (by Base.metadata.create_all)
+    are stamped with the initial revision first, so only the newer migrations run.
+    """
+    from alembic import command
+    from alembic.config import Config as AlembicConfig
+    from sqlalchemy import inspect
+    
+    alembic_cfg = AlembicConfig(ALEMBIC_CONFIG_PATH)
     
-    # Create tables if they don't exist
-    Base.metadata.create_all(bind=engine)
+    # A plain connection, not engine.begin(): Alembic then runs each migration in its own
+    # transaction, and migrations can step out of it with autocommit_block()
+    with engine.connect() as connection:
+        # Run migrations on the application engine and keep the app's logging setup
+        alembic_cfg.attributes["connection"] = connection
+        alembic_cfg.attributes["configure_logger"] = False
+        
+        tables = inspect(connection).get_table_names()
+        # End the transaction the inspection began, or Alembic treats it as an outer transaction
+        connection.rollback()
+        if "alembic_version" not in tables and "users" in tables:
+            command.stamp(alembic_cfg, "0001")
+        command.upgrade(alembic_cfg, "head")
 
 
 def create_initial_data(db: Session):
     """
     Seed the database with initial data.
-    This function should be called after init_db() and only if the database is empty.
+    This function should be called after init_db() and is safe to run multiple times.
     """
+    from sqlalchemy.dialects.postgresql import insert
     from .models import Role, RecommendationTypeModel
     from .db_enum import UserRole, RecommendationType
     import logging
     
-    # Create user roles if they don't exist
-    for role in UserRole:
-        existing_role = db.query(Role).filter(Role.role_type == role).first()
-        if not existing_role:
-            db.add(Role(role_type=role))
-            logging.info(f"Created role: {role.value}")
+    # One INSERT ... ON CONFLICT DO NOTHING per table instead of a SELECT per enum value
+    result = db.execute(
+        insert(Role).values([{"role_type": role} for role in UserRole]).on_conflict_do_nothing(index_elements=["role_type"])
+    )
+    logging.info(f"Created {result.rowcount} role(s)")
     
-    # Create recommendation types if they don't exist
-    for recco_type in RecommendationType:
-        existing_type = db.query(RecommendationTypeModel).filter(
-            RecommendationTypeModel.recommendation_type == recco_type
-        ).first()
-        if not existing_type:
-            db.add(RecommendationTypeModel(recommendation_type=recco_type))
-            logging.info(f"Created recommendation type: {recco_type.value}")
+    result = db.execute(
+        insert(RecommendationTypeModel).values(
+            [{"recommendation_type": recco_type} for recco_type in RecommendationType]
+        ).on_conflict_do_nothing(index_elements=["recommendation_type"])
+    )
+    logging.info(f"Created {result.rowcount} recommendation type(s)")
     
     db.commit()
@@ -15,3 +15,11 @@ class UserRole(enum.Enum):
     ENTREPRENEUR = "entrepreneur"
     PARENT = "parent"
     ADMIN = "admin"
+
+
+class AnalysisStatus(enum.Enum):
+    """Enumeration for the sentiment analysis state of a journal entry"""
+    PENDING = "pending"
+    PROVISIONAL = "provisional"  # scored by the local lexicon, LLM refinement outstanding
+    COMPLETED = "completed"
+    FAILED = "failed"
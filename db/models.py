@@ -1,14 +1,16 @@
-from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, Boolean, Date, DateTime, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, Boolean, Date, DateTime, Enum, LargeBinary, UniqueConstraint, Index, JSON
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
-from .db_enum import RecommendationType, UserRole
+import base64
+import zlib
+from .db_enum import RecommendationType, UserRole, AnalysisStatus
 from .abstract import BasicModel
 
 class Role(BasicModel):
     """Role model representing user roles"""
     __tablename__ = "roles"
     
-    role_type = Column(Enum(UserRole), nullable=False)
+    role_type = Column(Enum(UserRole), nullable=False, unique=True)
     
     # Relationships
     users = relationship("User", back_populates="role")
@@ -58,6 +60,7 @@ class Recommendation(BasicModel):
     recco_category = Column(Integer, ForeignKey("recommendation_types.id"), nullable=False)
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
+    emotion_profile = Column(JSON(none_as_null=True), nullable=True) # Target sentiment/emotion scores (0-10) keyed by name
     
     # Relationships
     recommendation_type = relationship("RecommendationTypeModel", back_populates="recommendations")
@@ -66,13 +69,58 @@ class Recommendation(BasicModel):
         return f"<Recommendation(id={self.id}, title={self.title}, category_id={self.recco_category})>"
 
 
+class CatalogueVersion(BasicModel):
+    """Single-row version counter of the recommendation catalogue, bumped on every catalogue change"""
+    __tablename__ = "catalogue_versions"
+    
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<CatalogueVersion(id={self.id}, version={self.version})>"
+
+
+class IdempotencyKey(BasicModel):
+    """Stored response of a request sent with an Idempotency-Key header, replayed for retries until it expires"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "endpoint", "key", name="uq_idempotency_keys_user_endpoint_key"),)
+    
+    key = Column(String(255), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    endpoint = Column(String(100), nullable=False)
+    request_hash = Column(String(64), nullable=False) # Detects the same key reused for a different request
+    status_code = Column(Integer, nullable=True) # NULL while the first request is still in progress
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<IdempotencyKey(id={self.id}, endpoint={self.endpoint}, key={self.key})>"
+
+
+class SingleFlightResult(BasicModel):
+    """Result of a coalesced computation shared between worker processes until it expires"""
+    __tablename__ = "single_flight_results"
+    
+    key_hash = Column(String(64), nullable=False, unique=True) # Digest of the flight name and key
+    result = Column(Text, nullable=True) # JSON; NULL while the claiming worker is still computing
+    created_at = Column(DateTime, default=datetime.utcnow) # Claim time, renewed when a dead claim is taken over
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<SingleFlightResult(id={self.id}, key_hash={self.key_hash})>"
+
+
 class Journal(BasicModel):
     """Journal model for user entries and sentiment analysis"""
     __tablename__ = "journals"
+    __table_args__ = (Index("ix_journals_user_created", "user_id", "created_at", "id"),)
     
     journal_content = Column(Text, nullable=False)
+    digest = Column(Text, nullable=True) # Condensed content used in place of journal_content in weekly prompts
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    analysis_status = Column(Enum(AnalysisStatus), nullable=False, default=AnalysisStatus.COMPLETED, server_default=AnalysisStatus.COMPLETED.name)
     
     # Sentiment scores
     positive_score = Column(Integer, default=0)
@@ -102,16 +150,42 @@ class Journal(BasicModel):
 class WeeklyReport(BasicModel):
     """Weekly report model for user progress tracking"""
     __tablename__ = "weekly_reports"
+    __table_args__ = (Index("ix_weekly_reports_user_created", "user_id", "created_at", "id"),)
     
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     from_date = Column(Date, nullable=False)
     to_date = Column(Date, nullable=False)
-    report_response = Column(Text, nullable=True) # Stores the LLM analysis report
-    visualizations = Column(Text, nullable=True) # Stores the JSON string of visualization image strings
+    report_response = deferred(Column(Text, nullable=True)) # Stores the LLM analysis report, loaded on access
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="weekly_reports")
+    charts = relationship("WeeklyReportChart", back_populates="report", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<WeeklyReport(id={self.id}, user_id={self.user_id}, from={self.from_date}, to={self.to_date})>"
+
+
+class WeeklyReportChart(BasicModel):
+    """Rendered chart of a weekly report, stored as zlib-compressed PNG bytes"""
+    __tablename__ = "weekly_report_charts"
+    __table_args__ = (UniqueConstraint("report_id", "chart_name", name="uq_weekly_report_charts_report_chart"),)
+    
+    report_id = Column(Integer, ForeignKey("weekly_reports.id", ondelete="CASCADE"), nullable=False, index=True)
+    chart_name = Column(String(50), nullable=False)
+    image = deferred(Column(LargeBinary, nullable=False)) # Loaded on access
+    
+    # Relationships
+    report = relationship("WeeklyReport", back_populates="charts")
+    
+    @classmethod
+    def from_base64(cls, chart_name: str, img_str: str) -> "WeeklyReportChart":
+        """Build a chart row from a base64 encoded PNG as returned by the plotting helpers"""
+        return cls(chart_name=chart_name, image=zlib.compress(base64.b64decode(img_str)))
+    
+    def to_base64(self) -> str:
+        """Return the chart as a base64 encoded PNG string"""
+        return base64.b64encode(zlib.decompress(self.image)).decode('utf-8')
+    
+    def __repr__(self):
+        return f"<WeeklyReportChart(id={self.id}, report_id={self.report_id}, chart_name={self.chart_name})>"
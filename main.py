@@ -1,7 +1,8 @@
 import os
 from dotenv import load_dotenv
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import logging
 
 # Configure logging
@@ -15,8 +16,13 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 # Import database components
-from db.database import init_db, get_db, create_initial_data, SessionLocal
+from db.database import init_db, get_db, create_initial_data, SessionLocal, engine
 from include_routers import include_all_routers
+from utils.warmup import start_warmup, is_ready, completed_steps
+from utils.metrics import MetricsMiddleware, metrics_response
+from utils.profiling import ProfilingMiddleware, profiling_enabled
+from utils.query_stats import QueryStatsMiddleware, install_query_instrumentation
+from utils.write_behind import journal_write_buffer, JOURNAL_WRITE_BEHIND
 
 # Create FastAPI application
 app = FastAPI(
@@ -34,6 +40,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record per-route request latency
+app.add_middleware(MetricsMiddleware)
+
+# Count SQL statements and DB time per request, log slow queries and N+1 patterns
+install_query_instrumentation(engine)
+app.add_middleware(QueryStatsMiddleware)
+
+# Opt-in per-request profiling; only installed when PROFILE_TOKEN is set
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
 # Include all routers
 include_all_routers(app)
 
@@ -47,15 +64,32 @@ async def root():
         "version": "0.1.0",
     }
 
+# Readiness endpoint - used by the load balancer
+@app.get("/ready", tags=["Root"])
+async def ready():
+    """Readiness check - returns 503 until the worker has finished warming up"""
+    if not is_ready():
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "warming_up", "completed_steps": completed_steps()},
+        )
+    return {"status": "ready", "completed_steps": completed_steps()}
+
+# Metrics endpoint - scraped by Prometheus
+@app.get("/metrics", tags=["Root"], include_in_schema=False)
+async def metrics():
+    """Expose request, stage, token, cache and error metrics"""
+    return metrics_response()
+
 # Startup event - runs when the application starts
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
     logger.info("Initializing database on application startup...")
     
-    # Create all tables based on models
+    # Apply pending schema migrations
     init_db()
-    logger.info("Database tables created or verified.")
+    logger.info("Database migrations applied.")
     
     # Seed initial data (safe to run multiple times)
     db = SessionLocal()
@@ -68,6 +102,19 @@ async def startup_event():
         db.close()
     
     logger.info("Database initialization complete.")
+    
+    # Warm up pools, templates, charts and the LLM client; /ready reports when done
+    start_warmup()
+    
+    # Batch journal inserts from concurrent requests
+    if JOURNAL_WRITE_BEHIND:
+        journal_write_buffer.start()
+
+# Shutdown event - runs after in-flight requests have finished
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write the journal entries still buffered before the worker exits"""
+    await journal_write_buffer.stop()
 
 # Run the application
 # if __name__ == "__main__":
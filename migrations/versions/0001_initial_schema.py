@@ -0,0 +1,127 @@
+"""initial schema
+
+Matches the tables previously created by Base.metadata.create_all.
+Databases that already have these tables should be stamped instead of upgraded:
+
+    alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+user_role = sa.Enum('STUDENT', 'EMPLOYEE', 'ENTREPRENEUR', 'PARENT', 'ADMIN', name='userrole')
+recommendation_type = sa.Enum('MUSIC', 'FOOD', 'EXERCISE', 'MOVIE', name='recommendationtype')
+
+
+def upgrade() -> None:
+    op.create_table(
+        'roles',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('role_type', user_role, nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_roles_id'), 'roles', ['id'], unique=False)
+
+    op.create_table(
+        'recommendation_types',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('recommendation_type', recommendation_type, nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('recommendation_type'),
+    )
+    op.create_index(op.f('ix_recommendation_types_id'), 'recommendation_types', ['id'], unique=False)
+
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('password', sa.String(length=255), nullable=False),
+        sa.Column('role_id', sa.Integer(), nullable=False),
+        sa.Column('date_joined', sa.DateTime(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['role_id'], ['roles.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+
+    op.create_table(
+        'recommendations',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('ref_url', sa.String(length=255), nullable=False),
+        sa.Column('recco_category', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['recco_category'], ['recommendation_types.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_recommendations_id'), 'recommendations', ['id'], unique=False)
+
+    op.create_table(
+        'journals',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('journal_content', sa.Text(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('positive_score', sa.Integer(), nullable=True),
+        sa.Column('negative_score', sa.Integer(), nullable=True),
+        sa.Column('neutral_score', sa.Integer(), nullable=True),
+        sa.Column('happiness_score', sa.Integer(), nullable=True),
+        sa.Column('sadness_score', sa.Integer(), nullable=True),
+        sa.Column('fear_score', sa.Integer(), nullable=True),
+        sa.Column('anger_score', sa.Integer(), nullable=True),
+        sa.Column('surprise_score', sa.Integer(), nullable=True),
+        sa.Column('joy_score', sa.Integer(), nullable=True),
+        sa.Column('love_score', sa.Integer(), nullable=True),
+        sa.Column('disgust_score', sa.Integer(), nullable=True),
+        sa.Column('relief_score', sa.Integer(), nullable=True),
+        sa.Column('gratitude_score', sa.Integer(), nullable=True),
+        sa.Column('confusion_score', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_journals_id'), 'journals', ['id'], unique=False)
+
+    op.create_table(
+        'weekly_reports',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('from_date', sa.Date(), nullable=False),
+        sa.Column('to_date', sa.Date(), nullable=False),
+        sa.Column('report_response', sa.Text(), nullable=True),
+        sa.Column('visualizations', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_weekly_reports_id'), 'weekly_reports', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_weekly_reports_id'), table_name='weekly_reports')
+    op.drop_table('weekly_reports')
+    op.drop_index(op.f('ix_journals_id'), table_name='journals')
+    op.drop_table('journals')
+    op.drop_index(op.f('ix_recommendations_id'), table_name='recommendations')
+    op.drop_table('recommendations')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_recommendation_types_id'), table_name='recommendation_types')
+    op.drop_table('recommendation_types')
+    op.drop_index(op.f('ix_roles_id'), table_name='roles')
+    op.drop_table('roles')
+    recommendation_type.drop(op.get_bind(), checkfirst=True)
+    user_role.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,89 @@
+"""move weekly report charts to weekly_report_charts
+
+Converts the base64 PNGs held as JSON text in weekly_reports.visualizations
+into one zlib-compressed binary row per chart, then drops the old column.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+"""
+import base64
+import json
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'weekly_report_charts',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('report_id', sa.Integer(), nullable=False),
+        sa.Column('chart_name', sa.String(length=50), nullable=False),
+        sa.Column('image', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['report_id'], ['weekly_reports.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('report_id', 'chart_name', name='uq_weekly_report_charts_report_chart'),
+    )
+    op.create_index(op.f('ix_weekly_report_charts_id'), 'weekly_report_charts', ['id'], unique=False)
+    op.create_index(op.f('ix_weekly_report_charts_report_id'), 'weekly_report_charts', ['report_id'], unique=False)
+
+    bind = op.get_bind()
+    charts = sa.table(
+        'weekly_report_charts',
+        sa.column('report_id', sa.Integer),
+        sa.column('chart_name', sa.String),
+        sa.column('image', sa.LargeBinary),
+    )
+
+    # Stream reports one at a time so a large table is never held in memory
+    result = bind.execution_options(stream_results=True, yield_per=50).execute(
+        sa.text("SELECT id, visualizations FROM weekly_reports WHERE visualizations IS NOT NULL")
+    )
+    for report_id, visualizations in result:
+        try:
+            images = json.loads(visualizations)
+        except (TypeError, ValueError):
+            continue
+        rows = [
+            {
+                "report_id": report_id,
+                "chart_name": chart_name,
+                "image": zlib.compress(base64.b64decode(img_str)),
+            }
+            for chart_name, img_str in images.items()
+            if img_str
+        ]
+        if rows:
+            bind.execute(charts.insert(), rows)
+
+    op.drop_column('weekly_reports', 'visualizations')
+
+
+def downgrade() -> None:
+    op.add_column('weekly_reports', sa.Column('visualizations', sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    images = {}
+    for report_id, chart_name, image in bind.execute(
+        sa.text("SELECT report_id, chart_name, image FROM weekly_report_charts ORDER BY report_id")
+    ):
+        images.setdefault(report_id, {})[chart_name] = base64.b64encode(zlib.decompress(image)).decode('utf-8')
+
+    for report_id, charts in images.items():
+        bind.execute(
+            sa.text("UPDATE weekly_reports SET visualizations = :visualizations WHERE id = :id"),
+            {"visualizations": json.dumps(charts), "id": report_id},
+        )
+
+    op.drop_index(op.f('ix_weekly_report_charts_report_id'), table_name='weekly_report_charts')
+    op.drop_index(op.f('ix_weekly_report_charts_id'), table_name='weekly_report_charts')
+    op.drop_table('weekly_report_charts')
@@ -0,0 +1,23 @@
+"""index weekly_reports for keyset pagination
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_weekly_reports_user_created', 'weekly_reports', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_weekly_reports_user_created', table_name='weekly_reports')
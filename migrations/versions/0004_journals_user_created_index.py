@@ -0,0 +1,23 @@
+"""index journals by user and creation time
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_journals_user_created', 'journals', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_journals_user_created', table_name='journals')
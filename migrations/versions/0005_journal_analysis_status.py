@@ -0,0 +1,31 @@
+"""add analysis_status to journals
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+analysis_status = sa.Enum('PENDING', 'COMPLETED', 'FAILED', name='analysisstatus')
+
+
+def upgrade() -> None:
+    analysis_status.create(op.get_bind(), checkfirst=True)
+    op.add_column(
+        'journals',
+        sa.Column('analysis_status', analysis_status, nullable=False, server_default='COMPLETED'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('journals', 'analysis_status')
+    analysis_status.drop(op.get_bind(), checkfirst=True)
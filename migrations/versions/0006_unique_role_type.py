@@ -0,0 +1,27 @@
+"""make roles.role_type unique
+
+Lets role seeding use a single INSERT ... ON CONFLICT DO NOTHING.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('roles') as batch_op:
+        batch_op.create_unique_constraint('roles_role_type_key', ['role_type'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('roles') as batch_op:
+        batch_op.drop_constraint('roles_role_type_key', type_='unique')
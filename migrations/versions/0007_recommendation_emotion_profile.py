@@ -0,0 +1,23 @@
+"""add emotion_profile to recommendations
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('recommendations', sa.Column('emotion_profile', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('recommendations', 'emotion_profile')
@@ -0,0 +1,32 @@
+"""add catalogue_versions
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    catalogue_versions = op.create_table(
+        'catalogue_versions',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_catalogue_versions_id'), 'catalogue_versions', ['id'], unique=False)
+    op.bulk_insert(catalogue_versions, [{"id": 1, "version": 1}])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_catalogue_versions_id'), table_name='catalogue_versions')
+    op.drop_table('catalogue_versions')
@@ -0,0 +1,26 @@
+"""add PROVISIONAL to analysisstatus
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Only PostgreSQL has a native enum type to extend; ADD VALUE cannot run inside a transaction block
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE analysisstatus ADD VALUE IF NOT EXISTS 'PROVISIONAL' AFTER 'PENDING'")
+
+
+def downgrade() -> None:
+    # PostgreSQL cannot drop an enum value, so provisional rows are folded into COMPLETED and the value stays
+    op.execute("UPDATE journals SET analysis_status = 'COMPLETED' WHERE analysis_status = 'PROVISIONAL'")
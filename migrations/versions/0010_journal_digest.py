@@ -0,0 +1,23 @@
+"""add digest to journals
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('journals', sa.Column('digest', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('journals', 'digest')
@@ -0,0 +1,36 @@
+"""add single_flight_results
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'single_flight_results',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('key_hash', sa.String(length=64), nullable=False),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('key_hash'),
+    )
+    op.create_index(op.f('ix_single_flight_results_id'), 'single_flight_results', ['id'], unique=False)
+    op.create_index(op.f('ix_single_flight_results_expires_at'), 'single_flight_results', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_single_flight_results_expires_at'), table_name='single_flight_results')
+    op.drop_index(op.f('ix_single_flight_results_id'), table_name='single_flight_results')
+    op.drop_table('single_flight_results')
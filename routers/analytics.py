@@ -1,19 +1,81 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, undefer
+from typing import Optional, Dict, Any, List
 from datetime import date, timedelta, datetime
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+import asyncio
+import hashlib
 import json
+import logging
+import os
 
-from db.database import get_db
-from db.models import User, WeeklyReport
+from db.database import get_db, SessionLocal
+from db.models import User, WeeklyReport, WeeklyReportChart
 from .utils import (
     get_user_journals_for_week, 
     format_journal_data_for_weekly_analysis,
+    backfill_journal_digests,
     generate_weekly_analysis,
     generate_visualizations,
+    parse_chart_names,
+    get_user_reports_page,
+    choose_analytics_bucket,
 )
+from .emotion_frame import EmotionFrame
+from .fast_analytics import compute_fast_weekly_analysis
+from schemas.analytics import WeeklyReportPage, WeeklyReportSummary, WeeklyReportDetail, FastWeeklyAnalysisResponse, ScoreSeries
 from utils.security import get_current_user
+from utils.metrics import time_stage
+from utils.single_flight import SingleFlight, DatabaseResultBackend, SINGLE_FLIGHT_BACKEND
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the LLM weekly analysis before answering with the fast statistics instead
+WEEKLY_ANALYSIS_LLM_TIMEOUT = float(os.environ.get('WEEKLY_ANALYSIS_LLM_TIMEOUT', '30'))
+
+# Concurrent identical requests (dashboard reloads, retries) share one LLM call, chart rendering or report.
+# Keys are (user, stage, fingerprint of the input data), so any change to the entries starts a new computation.
+# Coalescing is per worker unless SINGLE_FLIGHT_BACKEND=database, which shares the results between workers.
+analytics_flights = SingleFlight(
+    "analytics", DatabaseResultBackend(SessionLocal) if SINGLE_FLIGHT_BACKEND == "database" else None
+)
+
+
+def fingerprint_journals_data(journals_data) -> str:
+    """Digest of the formatted entries sent to the weekly analysis prompt"""
+    return hashlib.sha1(json.dumps(journals_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+async def shared_weekly_analysis(user_id: int, formatted_data, frame: EmotionFrame, timeout: Optional[float] = None) -> dict:
+    """
+    The weekly LLM analysis, computed once for concurrent requests on the same entries.
+    timeout bounds the LLM calls of a computation this caller starts, so tier fallbacks fit in it.
+    """
+    return await analytics_flights.do(
+        (user_id, "weekly_analysis_llm", fingerprint_journals_data(formatted_data)),
+        lambda: run_in_threadpool(generate_weekly_analysis, formatted_data, frame, timeout)
+    )
+
+
+async def shared_visualizations(user_id: int, frame: EmotionFrame, chart_names: List[str]) -> Dict[str, str]:
+    """The named charts of a frame, rendered once for concurrent requests on the same data"""
+    return await analytics_flights.do(
+        (user_id, "charts", frame.fingerprint(), tuple(chart_names)),
+        lambda: run_in_threadpool(generate_visualizations, frame, chart_names)
+    )
+
+
+def resolve_chart_names(charts: Optional[str]) -> List[str]:
+    """
+    The requested chart names (all registered charts by default), as a 400 on unknown names
+    """
+    try:
+        return parse_chart_names(charts)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 
 # Create router with prefix and tags defined here
 router = APIRouter(
@@ -24,14 +86,26 @@ router = APIRouter(
 
 @router.get("/weekly-analysis", status_code=status.HTTP_200_OK) # Removed {user_id} from path
 async def get_weekly_analysis(
+    mode: str = Query("llm", pattern="^(llm|fast)$", description="fast computes the statistics without the LLM"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user) # Add dependency
 ):
     """
-    Generate a weekly analysis report based on the authenticated user's journal entries from the past 7 days
+    Generate a weekly analysis report based on the authenticated user's journal entries from the past 7 days.
+    If the LLM fails or exceeds WEEKLY_ANALYSIS_LLM_TIMEOUT, the fast statistics are returned instead.
     """
     user_id = current_user.id # Use the authenticated user's ID
     
+    if mode == "fast":
+        frame = EmotionFrame.load(db, user_id, datetime.utcnow() - timedelta(days=7))
+        if not len(frame):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No journal entries found for the past week"
+            )
+        with time_stage("fast_weekly_analysis"):
+            return FastWeeklyAnalysisResponse(**compute_fast_weekly_analysis(frame))
+    
     # Get journal entries for the past 7 days
     journals = get_user_journals_for_week(db, user_id)
     
@@ -42,62 +116,90 @@ async def get_weekly_analysis(
         )
     
     # Format journal data for the weekly analysis
+    digests_added = backfill_journal_digests(journals)
     formatted_data = format_journal_data_for_weekly_analysis(journals)
+    frame = EmotionFrame.from_journals(journals)
+    if digests_added:
+        db.commit()
     
     # Generate weekly analysis
-    analysis = generate_weekly_analysis(formatted_data)
+    try:
+        analysis = await asyncio.wait_for(
+            shared_weekly_analysis(user_id, formatted_data, frame, timeout=WEEKLY_ANALYSIS_LLM_TIMEOUT),
+            timeout=WEEKLY_ANALYSIS_LLM_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        fallback_reason = f"LLM analysis timed out after {WEEKLY_ANALYSIS_LLM_TIMEOUT:g}s"
+    except Exception as e:
+        fallback_reason = f"LLM analysis failed: {str(e)}"
+    else:
+        return analysis
     
-    return analysis
+    logger.warning(f"Weekly analysis for user {user_id} fell back to fast mode: {fallback_reason}")
+    with time_stage("fast_weekly_analysis"):
+        fast_analysis = compute_fast_weekly_analysis(frame)
+    return FastWeeklyAnalysisResponse(**fast_analysis, fallback_reason=fallback_reason)
+
+
+def resolve_analytics_range(from_date: Optional[date], to_date: Optional[date], bucket: Optional[str]):
+    """
+    Default to the past 7 days and pick the bucket for the range, as a 400 on invalid input
+    """
+    to_date = to_date or datetime.utcnow().date()
+    from_date = from_date or to_date - timedelta(days=6)
+    if from_date > to_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="from_date must not be after to_date")
+    try:
+        bucket = choose_analytics_bucket(from_date, to_date, bucket)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return from_date, to_date, bucket
+
+
+@router.get("/series", response_model=ScoreSeries, status_code=status.HTTP_200_OK)
+async def get_score_series(
+    from_date: Optional[date] = Query(None, description="Defaults to 6 days before to_date"),
+    to_date: Optional[date] = Query(None, description="Defaults to today"),
+    bucket: Optional[str] = Query(None, pattern="^(day|week|month)$", description="Defaults to the finest bucket that fits"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Average sentiment and emotion scores of the authenticated user per day, week or month
+    """
+    from_date, to_date, bucket = resolve_analytics_range(from_date, to_date, bucket)
+    frame = EmotionFrame.load_buckets(db, current_user.id, from_date, to_date, bucket)
+    return {"bucket": bucket, **frame.to_raw_data()}
 
 
 @router.get("/weekly-visualizations", status_code=status.HTTP_200_OK) # Removed {user_id} from path
 async def get_weekly_visualizations(
+    from_date: Optional[date] = Query(None, description="Defaults to 6 days before to_date"),
+    to_date: Optional[date] = Query(None, description="Defaults to today"),
+    bucket: Optional[str] = Query(None, pattern="^(day|week|month)$", description="Defaults to the finest bucket that fits"),
+    charts: Optional[str] = Query(None, description="Comma separated chart names; defaults to all charts"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user) 
 ):
     """
-    Generate visualizations for the authenticated user's journal entries from the past 7 days
+    Generate visualizations of the authenticated user's journal entries, averaged per time bucket
+    (by default per day over the past 7 days). Only the requested charts are rendered.
     """
     user_id = current_user.id # Use the authenticated user's ID
+    from_date, to_date, bucket = resolve_analytics_range(from_date, to_date, bucket)
+    chart_names = resolve_chart_names(charts)
 
-    # Get journal entries for the past 7 days
-    journals = get_user_journals_for_week(db, user_id)
+    # One point per bucket, aggregated in SQL
+    frame = EmotionFrame.load_buckets(db, user_id, from_date, to_date, bucket)
     
-    if not journals:
+    if not len(frame):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="No journal entries found for the past week"
+            detail="No journal entries found for the selected period"
         )
     
-    # Format journal data for the weekly analysis
-    formatted_data = format_journal_data_for_weekly_analysis(journals)
-    
-    # Calculate cumulative scores for visualization
-    raw_data = {
-        "dates": [],
-        "emotions": {
-            "happiness": [], "sadness": [], "fear": [], "anger": [], 
-            "surprise": [], "joy": [], "love": [], "disgust": [], 
-            "relief": [], "gratitude": [], "confusion": []
-        },
-        "sentiments": {"positive": [], "negative": [], "neutral": []}
-    }
-    
-    for entry in formatted_data:
-        # Extract date (just the date part)
-        date_str = entry["journal_timing"].split()[0]
-        raw_data["dates"].append(date_str)
-        
-        # Extract emotion scores
-        for emotion in raw_data["emotions"].keys():
-            raw_data["emotions"][emotion].append(entry["emotion"][emotion])
-        
-        # Extract sentiment scores
-        for sentiment in raw_data["sentiments"].keys():
-            raw_data["sentiments"][sentiment].append(entry["sentiment"][sentiment])
-    
-    # Generate visualizations
-    visualizations = generate_visualizations(raw_data)
+    # Generate visualizations off the event loop
+    visualizations = await shared_visualizations(user_id, frame, chart_names)
     
     return JSONResponse(content=visualizations)
 
@@ -105,15 +207,18 @@ async def get_weekly_visualizations(
 @router.get("/combined-weekly-report", status_code=status.HTTP_200_OK) # Keep status_code for successful GET
 async def get_combined_weekly_report(
     # user_id: int,
+    charts: Optional[str] = Query(None, description="Comma separated chart names; defaults to all charts"),
     db: Session = Depends(get_db)
     # current_user: User = Depends(get_current_user)
 ):
     """
     Generate a combined weekly report with analysis and visualizations for the authenticated user
-    and save it to the database.
+    and save it to the database. Only the requested charts are rendered; the others are rendered
+    when they are first requested from /analytics/reports/{report_id}.
     """
     # user_id = current_user.id
     user_id = 1
+    chart_names = resolve_chart_names(charts)
     # Get journal entries for the past 7 days
     journals = get_user_journals_for_week(db, user_id)
     
@@ -123,44 +228,164 @@ async def get_combined_weekly_report(
             detail="No journal entries found for the past week to generate a report."
         )
     
+    digests_added = backfill_journal_digests(journals)
     formatted_data = format_journal_data_for_weekly_analysis(journals)
-    analysis = generate_weekly_analysis(formatted_data)
+    frame = EmotionFrame.from_journals(journals)
+    if digests_added:
+        db.commit()
     
-    if "raw_data" not in analysis:
-        # Handle case where analysis might have failed or not produced raw_data
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to generate raw data for visualizations from analysis."
+    today = datetime.utcnow().date()
+    seven_days_ago = today - timedelta(days=6) # from_date should be start of the 7-day period
+    
+    async def build_report() -> Dict[str, Any]:
+        # The charts only need the scores, so the LLM call and the rendering run side by side
+        # in worker threads; the report is saved once both have finished.
+        # Charts plot daily averages rather than one point per entry.
+        daily_frame = frame.daily()
+        with time_stage("report_fan_out"):
+            analysis, visualizations = await asyncio.gather(
+                shared_weekly_analysis(user_id, formatted_data, frame),
+                shared_visualizations(user_id, daily_frame, chart_names),
+            )
+        
+        # Create and save the weekly report
+        new_weekly_report = WeeklyReport(
+            user_id=user_id,
+            from_date=seven_days_ago,
+            to_date=today,
+            # The full analysis plus the exact (unrounded) daily scores the charts were drawn from,
+            # so charts left out now render identically when first requested later
+            report_response=json.dumps({**analysis, "chart_data": daily_frame.to_raw_data(decimals=None)}),
+            created_at=datetime.utcnow()
         )
+        # Charts are stored as compressed PNG bytes in their own table
+        new_weekly_report.charts = [
+            WeeklyReportChart.from_base64(chart_name, img_str)
+            for chart_name, img_str in visualizations.items()
+        ]
+        
+        # The flight outlives a caller that gives up, so it saves on its own session, not the request's
+        with time_stage("db_query", "insert_weekly_report"), SessionLocal() as report_db:
+            report_db.add(new_weekly_report)
+            report_db.commit()
+        
+        # Leave raw_data out of the response to keep it clean (the analysis dict itself is shared)
+        return {
+            "analysis": {key: value for key, value in analysis.items() if key != "raw_data"},
+            "visualizations": visualizations
+        }
     
-    visualizations = generate_visualizations(analysis["raw_data"])
+    # Concurrent requests for the same entries share one report instead of saving duplicates
+    response_payload = await analytics_flights.do(
+        (user_id, "combined_report", fingerprint_journals_data(formatted_data), tuple(chart_names)), build_report
+    )
     
-    # Prepare data for saving to WeeklyReport table
-    today = datetime.utcnow().date()
-    seven_days_ago = today - timedelta(days=6) # from_date should be start of the 7-day period
+    return JSONResponse(content=response_payload)
 
-    # Create and save the weekly report
-    new_weekly_report = WeeklyReport(
-        user_id=user_id,
-        from_date=seven_days_ago,
-        to_date=today,
-        report_response=json.dumps(analysis), # Save the full analysis object as JSON string
-        visualizations=json.dumps(visualizations), # Save visualizations as JSON string
-        created_at=datetime.utcnow()
-    )
+
+@router.get("/reports", response_model=WeeklyReportPage, status_code=status.HTTP_200_OK)
+async def list_weekly_reports(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor value from the previous page"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    List the authenticated user's past weekly reports, newest first.
+    Only summary fields are returned; use /analytics/reports/{report_id} for the full report.
+    """
+    try:
+        rows, next_cursor = get_user_reports_page(db, current_user.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    db.add(new_weekly_report)
-    db.commit()
-    # db.refresh(new_weekly_report) # Optional, if you need the ID immediately
+    return WeeklyReportPage(
+        reports=[
+            WeeklyReportSummary(id=row.id, from_date=row.from_date, to_date=row.to_date, created_at=row.created_at)
+            for row in rows
+        ],
+        next_cursor=next_cursor
+    )
+
 
-    # Prepare the response (as it was before)
-    # Remove raw_data from the analysis part of the response to keep it clean
-    if "raw_data" in analysis:
-        del analysis["raw_data"]
+@router.get("/reports/{report_id}", response_model=WeeklyReportDetail, status_code=status.HTTP_200_OK)
+async def get_weekly_report(
+    report_id: int,
+    include_analysis: bool = Query(True),
+    include_charts: bool = Query(False),
+    charts: Optional[str] = Query(None, description="Comma separated chart names; defaults to all charts"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get a single weekly report of the authenticated user.
+    The LLM analysis and the charts are only loaded when requested. Requested charts that the
+    report was saved without are rendered from its stored scores and saved on first access.
+    """
+    chart_names = resolve_chart_names(charts)
+    query = db.query(WeeklyReport).filter(
+        WeeklyReport.id == report_id,
+        WeeklyReport.user_id == current_user.id
+    )
+    if include_analysis:
+        query = query.options(undefer(WeeklyReport.report_response))
+    report = query.first()
+    
+    if not report:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly report not found")
+    
+    detail = WeeklyReportDetail(
+        id=report.id,
+        from_date=report.from_date,
+        to_date=report.to_date,
+        created_at=report.created_at
+    )
     
-    response_payload = {
-        "analysis": analysis,
-        "visualizations": visualizations
-    }
+    if include_analysis and report.report_response:
+        analysis = json.loads(report.report_response)
+        analysis.pop("raw_data", None)
+        analysis.pop("chart_data", None)
+        detail.analysis = analysis
+    
+    if include_charts:
+        stored_charts = db.query(WeeklyReportChart).options(undefer(WeeklyReportChart.image)).filter(
+            WeeklyReportChart.report_id == report.id,
+            WeeklyReportChart.chart_name.in_(chart_names)
+        ).all()
+        visualizations = {chart.chart_name: chart.to_base64() for chart in stored_charts}
+        
+        missing = [name for name in chart_names if name not in visualizations]
+        if missing:
+            visualizations.update(await render_missing_report_charts(db, report, missing))
+        
+        detail.visualizations = {name: visualizations[name] for name in chart_names if name in visualizations}
+    
+    return detail
+
+
+async def render_missing_report_charts(db: Session, report: WeeklyReport, chart_names: List[str]) -> Dict[str, str]:
+    """
+    Render charts a saved report does not have yet from the daily scores stored with it
+    (the same data its own charts were drawn from), and store them with the report.
+    Reports saved before chart_data was stored fall back to the rounded raw_data.
+    """
+    report_response = db.query(WeeklyReport.report_response).filter(WeeklyReport.id == report.id).scalar()
+    stored = json.loads(report_response) if report_response else {}
+    if stored.get("chart_data"):
+        frame = EmotionFrame.from_raw_data(stored["chart_data"])
+    elif stored.get("raw_data"):
+        frame = EmotionFrame.from_raw_data(stored["raw_data"]).daily()
+    else:
+        return {}
+
+    visualizations = await shared_visualizations(report.user_id, frame, chart_names)
     
-    return JSONResponse(content=response_payload)
\ No newline at end of file
+    # Another request may have stored the same chart in the meantime; its copy is kept
+    rows = [
+        {"report_id": report.id, "chart_name": chart.chart_name, "image": chart.image}
+        for chart in (WeeklyReportChart.from_base64(name, img_str) for name, img_str in visualizations.items())
+    ]
+    with time_stage("db_query", "insert_weekly_report_charts"):
+        db.execute(insert(WeeklyReportChart).values(rows).on_conflict_do_nothing(index_elements=["report_id", "chart_name"]))
+        db.commit()
+    return visualizations
@@ -0,0 +1,175 @@
+import io
+import csv
+import json
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from db.database import SessionLocal
+from db.db_enum import RecommendationType
+from db.models import Recommendation, RecommendationTypeModel, CatalogueVersion
+from schemas.recommendations import RecommendationCreate
+from utils.metrics import record_cache, time_stage
+
+logger = logging.getLogger(__name__)
+
+# How often a worker checks the shared catalogue version for changes made by other workers
+CATALOGUE_VERSION_CHECK_SECONDS = 30
+CATALOGUE_LOAD_BATCH_SIZE = 500
+CATALOGUE_VERSION_ID = 1
+
+
+def get_catalogue_version(db: Session) -> int:
+    """Read the shared catalogue version"""
+    version = db.query(CatalogueVersion.version).filter(CatalogueVersion.id == CATALOGUE_VERSION_ID).scalar()
+    return version or 0
+
+
+def bump_catalogue_version(db: Session) -> Optional[int]:
+    """Increment the shared catalogue version as part of the caller's transaction and return the new version"""
+    return db.execute(
+        update(CatalogueVersion).where(CatalogueVersion.id == CATALOGUE_VERSION_ID).values(
+            version=CatalogueVersion.version + 1
+        ).returning(CatalogueVersion.version)
+    ).scalar()
+
+
+class CatalogueCache:
+    """
+    In-process snapshot of the recommendation catalogue, grouped by category.
+    
+    The snapshot is tagged with the catalogue version it was built from and is
+    only rebuilt when that version changes, so listings are served from memory
+    without touching the recommendations tables.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._by_type: Dict[Optional[RecommendationType], List[Dict[str, Any]]] = {}
+        self._checked_at = 0.0
+
+    def _rebuild(self, db: Session, version: int):
+        rows = db.query(Recommendation, RecommendationTypeModel.recommendation_type).join(
+            RecommendationTypeModel, Recommendation.recco_category == RecommendationTypeModel.id
+        ).order_by(Recommendation.id).all()
+
+        by_type: Dict[Optional[RecommendationType], List[Dict[str, Any]]] = {None: []}
+        for recco_type in RecommendationType:
+            by_type[recco_type] = []
+        for recommendation, recommendation_type in rows:
+            item = {
+                "id": recommendation.id,
+                "title": recommendation.title,
+                "ref_url": recommendation.ref_url,
+                "recommendation_type": recommendation_type,
+                "description": recommendation.description,
+            }
+            by_type[None].append(item)
+            by_type[recommendation_type].append(item)
+
+        self._by_type = by_type
+        self._version = version
+
+    def snapshot(self) -> Tuple[int, Dict[Optional[RecommendationType], List[Dict[str, Any]]]]:
+        """
+        Return (version, items by category), rebuilding first if the catalogue changed.
+        The shared version is read at most every CATALOGUE_VERSION_CHECK_SECONDS.
+        """
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < CATALOGUE_VERSION_CHECK_SECONDS:
+            record_cache("catalogue", True)
+            return self._version, self._by_type
+
+        with self._lock:
+            with SessionLocal() as db:
+                version = get_catalogue_version(db)
+                hit = version == self._version
+                if not hit:
+                    with time_stage("db_query", "catalogue_snapshot"):
+                        self._rebuild(db, version)
+            self._checked_at = now
+            record_cache("catalogue", hit)
+            return self._version, self._by_type
+
+    def invalidate(self):
+        """Force a version check on the next access (after a local catalogue change)"""
+        self._checked_at = 0.0
+
+
+catalogue_cache = CatalogueCache()
+
+
+def parse_catalogue_upload(content: str, upload_format: str) -> Iterable[Tuple[int, Any]]:
+    """
+    Yield (line number, raw record) pairs from a CSV or NDJSON catalogue upload.
+    CSV columns: title, ref_url, recommendation_type, description, emotion_profile (JSON object).
+    Records are decoded by bulk_load_catalogue so a bad line only fails that line.
+    """
+    if upload_format == "csv":
+        yield from enumerate(csv.DictReader(io.StringIO(content)), start=2)
+    else:
+        for line_number, line in enumerate(content.splitlines(), start=1):
+            if line.strip():
+                yield line_number, line
+
+
+def _decode_catalogue_record(raw: Any) -> RecommendationCreate:
+    if isinstance(raw, str):
+        return RecommendationCreate(**json.loads(raw))
+    record = dict(raw)
+    record["emotion_profile"] = json.loads(record["emotion_profile"]) if record.get("emotion_profile") else None
+    record["description"] = record.get("description") or None
+    return RecommendationCreate(**record)
+
+
+def bulk_load_catalogue(db: Session, records: Iterable[Tuple[int, Any]], score_names: List[str]) -> Dict[str, Any]:
+    """
+    Validate catalogue records and insert them in batches, then bump the catalogue version.
+    Returns the number of inserted items and the per-line errors.
+    """
+    type_ids = dict(db.query(RecommendationTypeModel.recommendation_type, RecommendationTypeModel.id).all())
+    errors = []
+    batch = []
+    inserted = 0
+
+    def flush():
+        nonlocal inserted
+        if batch:
+            db.execute(insert(Recommendation), batch)
+            inserted += len(batch)
+            batch.clear()
+
+    for line_number, raw in records:
+        try:
+            item = _decode_catalogue_record(raw)
+        except (ValidationError, ValueError, TypeError) as e:
+            errors.append({"line": line_number, "error": str(e)})
+            continue
+        unknown = [name for name in (item.emotion_profile or {}) if name not in score_names]
+        if unknown:
+            errors.append({"line": line_number, "error": f"Unknown emotion profile keys: {', '.join(unknown)}"})
+            continue
+
+        batch.append({
+            "title": item.title,
+            "ref_url": item.ref_url,
+            "description": item.description,
+            "recco_category": type_ids[item.recommendation_type],
+            "emotion_profile": item.emotion_profile,
+        })
+        if len(batch) >= CATALOGUE_LOAD_BATCH_SIZE:
+            flush()
+
+    flush()
+    if inserted:
+        bump_catalogue_version(db)
+    db.commit()
+    catalogue_cache.invalidate()
+
+    return {"inserted": inserted, "failed": len(errors), "errors": errors[:100]}
@@ -0,0 +1,179 @@
+import hashlib
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, Optional, Sequence
+
+from sqlalchemy import func, literal_column, DateTime
+from sqlalchemy.orm import Session
+
+from db.models import Journal
+from db.db_enum import AnalysisStatus
+from utils.metrics import time_stage
+
+EMOTION_NAMES = [
+    "happiness", "sadness", "fear", "anger", "surprise", "joy",
+    "love", "disgust", "relief", "gratitude", "confusion"
+]
+SENTIMENT_NAMES = ["positive", "negative", "neutral"]
+# Order of the 14-dimensional score vector used by similarity features and EmotionFrame columns
+SCORE_NAMES = SENTIMENT_NAMES + EMOTION_NAMES
+SCORE_COLUMNS = [f"{name}_score" for name in SCORE_NAMES]
+# Entries whose score columns hold usable values: final LLM scores or provisional lexicon scores
+SCORED_STATUSES = (AnalysisStatus.PROVISIONAL, AnalysisStatus.COMPLETED)
+# Time buckets accepted by the analytics series, finest first (PostgreSQL date_trunc fields)
+ANALYTICS_BUCKETS = ("day", "week", "month")
+
+POSITIVE_EMOTIONS = ["happiness", "joy", "love", "relief", "gratitude"]
+NEGATIVE_EMOTIONS = ["sadness", "fear", "anger", "disgust"]
+OTHER_EMOTIONS = ["surprise", "confusion"]
+
+
+def get_numpy():
+    """
+    Import numpy on first use. The routers' numeric code (score frames, similarity indexes,
+    near-duplicate signatures, charts) goes through this instead of a module-level import,
+    so that importing the routers, and booting a worker, does not pay for numpy.
+    """
+    import numpy
+    return numpy
+
+
+class EmotionFrame:
+    """
+    Columnar score data: one row per journal entry, or per time bucket for aggregated frames.
+
+    dates is a datetime64[s] array, scores a float64 (rows x 14) matrix in SCORE_NAMES order,
+    counts the number of entries behind each row and ids the journal ids (entry frames only).
+    """
+
+    __slots__ = ("dates", "scores", "counts", "ids")
+
+    def __init__(self, dates, scores, counts=None, ids=None):
+        np = get_numpy()
+        self.dates = np.asarray(dates, dtype="datetime64[s]")
+        self.scores = np.nan_to_num(np.asarray(scores, dtype=np.float64).reshape(len(self.dates), len(SCORE_NAMES)))
+        self.counts = np.ones(len(self.dates), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.ids = None if ids is None else np.asarray(ids, dtype=np.int64)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Any]]) -> "EmotionFrame":
+        """Build an entry frame from (id, created_at, *scores) rows"""
+        return cls(
+            [row[1] for row in rows],
+            [[value if value is not None else 0 for value in row[2:]] for row in rows],
+            ids=[row[0] for row in rows],
+        )
+
+    @classmethod
+    def from_journals(cls, journals: Sequence[Journal]) -> "EmotionFrame":
+        """Build an entry frame from already loaded Journal objects"""
+        return cls.from_rows([
+            (journal.id, journal.created_at, *[getattr(journal, column) for column in SCORE_COLUMNS])
+            for journal in journals
+        ])
+
+    @classmethod
+    def from_raw_data(cls, raw_data: Dict[str, Any]) -> "EmotionFrame":
+        """Rebuild a frame from to_raw_data output, such as the raw_data stored with a weekly report"""
+        columns = {**raw_data["sentiments"], **raw_data["emotions"]}
+        return cls(
+            raw_data["dates"],
+            [list(row) for row in zip(*[columns[name] for name in SCORE_NAMES])],
+            counts=raw_data.get("entries"),
+        )
+
+    @classmethod
+    def load(cls, db: Session, user_id: int, since: datetime, until: Optional[datetime] = None) -> "EmotionFrame":
+        """Load the user's scored entries in [since, until) with a column-only query"""
+        query = db.query(Journal.id, Journal.created_at, *[getattr(Journal, column) for column in SCORE_COLUMNS]).filter(
+            Journal.user_id == user_id,
+            Journal.created_at >= since,
+            Journal.analysis_status.in_(SCORED_STATUSES)
+        )
+        if until is not None:
+            query = query.filter(Journal.created_at < until)
+        with time_stage("db_query", "emotion_frame"):
+            rows = query.order_by(Journal.created_at, Journal.id).all()
+        return cls.from_rows(rows)
+
+    @classmethod
+    def load_buckets(cls, db: Session, user_id: int, from_date: date, to_date: date, bucket: str) -> "EmotionFrame":
+        """
+        Average the user's scores per time bucket in SQL (date_trunc + GROUP BY).
+        Buckets without entries are omitted, so the frame never has more rows than buckets in the range.
+        """
+        if bucket not in ANALYTICS_BUCKETS:
+            raise ValueError(f"Unknown bucket '{bucket}'")
+        # The field is inlined (it is validated above) so the SELECT and GROUP BY expressions are identical
+        bucket_start = func.date_trunc(literal_column(f"'{bucket}'"), Journal.created_at, type_=DateTime).label("bucket_start")
+        averages = [func.avg(getattr(Journal, column)) for column in SCORE_COLUMNS]
+
+        with time_stage("db_query", f"score_series_{bucket}"):
+            rows = db.query(bucket_start, func.count(Journal.id), *averages).filter(
+                Journal.user_id == user_id,
+                Journal.created_at >= datetime.combine(from_date, datetime.min.time()),
+                Journal.created_at < datetime.combine(to_date + timedelta(days=1), datetime.min.time()),
+                Journal.analysis_status.in_(SCORED_STATUSES)
+            ).group_by(bucket_start).order_by(bucket_start).all()
+
+        return cls(
+            [row[0] for row in rows],
+            [[float(value) if value is not None else 0 for value in row[2:]] for row in rows],
+            counts=[row[1] for row in rows],
+        )
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def column(self, name: str):
+        """Scores of one sentiment or emotion"""
+        return self.scores[:, SCORE_NAMES.index(name)]
+
+    def columns(self, names: Sequence[str]):
+        """Scores of several sentiments or emotions as a (rows x len(names)) matrix"""
+        return self.scores[:, [SCORE_NAMES.index(name) for name in names]]
+
+    @property
+    def sentiments(self):
+        return self.scores[:, :len(SENTIMENT_NAMES)]
+
+    @property
+    def emotions(self):
+        return self.scores[:, len(SENTIMENT_NAMES):]
+
+    @property
+    def days(self):
+        return self.dates.astype("datetime64[D]")
+
+    def day_labels(self) -> List[str]:
+        return self.days.astype(str).tolist()
+
+    def daily(self) -> "EmotionFrame":
+        """
+        Entry-weighted average per calendar day.
+        Rows must be time ordered, which load and from_rows guarantee for query results.
+        """
+        np = get_numpy()
+        if not len(self):
+            return EmotionFrame(self.dates, self.scores, counts=self.counts)
+        unique_days, starts = np.unique(self.days, return_index=True)
+        counts = np.add.reduceat(self.counts, starts)
+        sums = np.add.reduceat(self.scores * self.counts[:, None], starts, axis=0)
+        return EmotionFrame(unique_days, sums / counts[:, None], counts=counts)
+
+    def fingerprint(self) -> str:
+        """Digest of the frame's contents, equal for frames holding the same data"""
+        digest = hashlib.sha1(self.dates.tobytes())
+        digest.update(self.scores.tobytes())
+        digest.update(self.counts.tobytes())
+        return digest.hexdigest()
+
+    def to_raw_data(self, decimals: Optional[int] = 2) -> Dict[str, Any]:
+        """Plain lists for JSON payloads (API responses and stored reports), rounded unless decimals is None"""
+        np = get_numpy()
+        rounded = (self.scores if decimals is None else np.round(self.scores, decimals)).T.tolist()
+        return {
+            "dates": self.day_labels(),
+            "entries": self.counts.tolist(),
+            "emotions": {name: rounded[SCORE_NAMES.index(name)] for name in EMOTION_NAMES},
+            "sentiments": {name: rounded[SCORE_NAMES.index(name)] for name in SENTIMENT_NAMES},
+        }
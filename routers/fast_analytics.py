@@ -0,0 +1,107 @@
+from typing import List, Dict, Any
+
+from .emotion_frame import EmotionFrame, EMOTION_NAMES, SENTIMENT_NAMES, SCORE_NAMES, get_numpy
+
+# Days (with entries) averaged by the rolling mean
+ROLLING_WINDOW_DAYS = 3
+# Day-over-day change of a daily average, in score points, reported as a shift
+SHIFT_THRESHOLD = 3.0
+# Entries whose score is this many standard deviations from the week's mean are anomalies
+ANOMALY_Z_THRESHOLD = 2.0
+# Emotions listed for the dominant emotions and for each highlighted day
+TOP_EMOTIONS = 3
+
+
+def _top_emotions(averages, limit: int = TOP_EMOTIONS) -> List[str]:
+    """Names of the highest non-zero emotions in a SCORE_NAMES ordered vector"""
+    np = get_numpy()
+    emotions = averages[len(SENTIMENT_NAMES):]
+    order = np.argsort(-emotions, kind="stable")[:limit]
+    return [EMOTION_NAMES[i] for i in order if emotions[i] > 0]
+
+
+def compute_fast_weekly_analysis(frame: EmotionFrame) -> Dict[str, Any]:
+    """
+    Compute weekly statistics from an entry EmotionFrame without calling the LLM.
+
+    The result has the shape of FastWeeklyAnalysisResponse: the numeric parts of the
+    LLM weekly analysis plus daily and rolling averages, day-over-day shifts and
+    z-score anomalies.
+    """
+    np = get_numpy()
+
+    matrix = frame.scores
+    daily_frame = frame.daily()
+    daily, counts = daily_frame.scores, daily_frame.counts
+    day_labels = daily_frame.day_labels()
+
+    # Rolling mean over the last ROLLING_WINDOW_DAYS days with entries
+    cumulative = np.vstack([np.zeros(matrix.shape[1]), np.cumsum(daily, axis=0)])
+    ends = np.arange(1, len(daily) + 1)
+    window_starts = np.maximum(ends - ROLLING_WINDOW_DAYS, 0)
+    rolling = (cumulative[ends] - cumulative[window_starts]) / (ends - window_starts)[:, None]
+
+    # Day-over-day shifts of the daily averages
+    changes = np.diff(daily, axis=0)
+    shift_days, shift_scores = np.nonzero(np.abs(changes) >= SHIFT_THRESHOLD)
+    shifts = [
+        {
+            "from_day": day_labels[day],
+            "to_day": day_labels[day + 1],
+            "score": SCORE_NAMES[score],
+            "change": round(float(changes[day, score]), 2),
+        }
+        for day, score in zip(shift_days, shift_scores)
+    ]
+    sentiment_shift_days = sorted({
+        shift["to_day"] for shift in shifts if shift["score"] in SENTIMENT_NAMES
+    })
+
+    # Per-entry z-scores against the week's mean; constant columns have no anomalies
+    std = matrix.std(axis=0)
+    z_scores = np.divide(matrix - matrix.mean(axis=0), std, out=np.zeros_like(matrix), where=std > 0)
+    anomaly_rows, anomaly_scores = np.nonzero(np.abs(z_scores) >= ANOMALY_Z_THRESHOLD)
+    anomalies = [
+        {
+            "journal_id": int(frame.ids[row]),
+            "journal_timing": str(frame.dates[row]).replace("T", " "),
+            "score": SCORE_NAMES[score],
+            "value": int(matrix[row, score]),
+            "z_score": round(float(z_scores[row, score]), 2),
+        }
+        for row, score in zip(anomaly_rows, anomaly_scores)
+    ]
+
+    weekly_average = matrix.mean(axis=0)
+    positive_day = int(np.argmax(daily[:, SCORE_NAMES.index("positive")]))
+    negative_day = int(np.argmax(daily[:, SCORE_NAMES.index("negative")]))
+    sentiment_average = weekly_average[:len(SENTIMENT_NAMES)]
+    totals = np.rint(matrix.sum(axis=0)).astype(int)
+
+    return {
+        "mode": "fast",
+        "weekly_emotion_analysis": {
+            "dominant_emotions": _top_emotions(weekly_average),
+            "highest_positive_day": {"day": day_labels[positive_day], "emotions": _top_emotions(daily[positive_day])},
+            "highest_negative_day": {"day": day_labels[negative_day], "emotions": _top_emotions(daily[negative_day])},
+        },
+        "weekly_sentiment_analysis": {
+            "overall_sentiment": SENTIMENT_NAMES[int(np.argmax(sentiment_average))],
+            "significant_shifts": sentiment_shift_days,
+        },
+        "cumulative_scores": {
+            "emotion": {name: int(totals[SCORE_NAMES.index(name)]) for name in EMOTION_NAMES},
+            "sentiment": {name: int(totals[SCORE_NAMES.index(name)]) for name in SENTIMENT_NAMES},
+        },
+        "daily_scores": [
+            {
+                "day": day_labels[day],
+                "entries": int(counts[day]),
+                "averages": dict(zip(SCORE_NAMES, np.round(daily[day], 2).tolist())),
+                "rolling_averages": dict(zip(SCORE_NAMES, np.round(rolling[day], 2).tolist())),
+            }
+            for day in range(len(daily))
+        ],
+        "shifts": shifts,
+        "anomalies": anomalies,
+    }
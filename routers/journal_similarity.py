@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from db.models import Journal
+from utils.metrics import record_cache, time_stage
+from .emotion_frame import SCORE_COLUMNS, SCORED_STATUSES, get_numpy
+
+# Number of per-user indexes kept in memory
+JOURNAL_INDEX_CACHE_SIZE = int(os.environ.get('JOURNAL_INDEX_CACHE_SIZE', '256'))
+# Cached indexes are rebuilt after this long, picking up entries scored on other workers
+JOURNAL_INDEX_TTL_SECONDS = float(os.environ.get('JOURNAL_INDEX_TTL_SECONDS', '300'))
+
+
+class UserJournalIndex:
+    """
+    Score vectors of one user's analyzed journal entries.
+    Rows live in preallocated arrays that double in size when full, so inserts are amortized O(1).
+    """
+
+    def __init__(self, ids: Sequence[int], created_at: Sequence[datetime], scores: Sequence[Sequence[float]]):
+        np = get_numpy()
+        self._lock = threading.Lock()
+        self.built_at = time.monotonic()
+        capacity = max(16, len(ids))
+        self.size = len(ids)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.created_at = np.zeros(capacity, dtype="datetime64[s]")
+        self.matrix = np.zeros((capacity, len(SCORE_COLUMNS)), dtype=np.float32)
+        self.positions: Dict[int, int] = {}
+        if self.size:
+            self.ids[:self.size] = ids
+            self.created_at[:self.size] = np.array(created_at, dtype="datetime64[s]")
+            self.matrix[:self.size] = np.asarray(scores, dtype=np.float32)
+            self.positions = {int(journal_id): position for position, journal_id in enumerate(ids)}
+
+    def upsert(self, journal_id: int, created_at: datetime, scores: Sequence[float]):
+        """Add an entry, or replace its scores if it is already indexed"""
+        with self._lock:
+            self._upsert(journal_id, created_at, scores)
+
+    def _upsert(self, journal_id: int, created_at: datetime, scores: Sequence[float]):
+        np = get_numpy()
+        position = self.positions.get(journal_id)
+        if position is None:
+            if self.size == len(self.ids):
+                capacity = len(self.ids) * 2
+                self.ids = np.resize(self.ids, capacity)
+                self.created_at = np.resize(self.created_at, capacity)
+                self.matrix = np.resize(self.matrix, (capacity, self.matrix.shape[1]))
+            position = self.size
+            self.size += 1
+            self.positions[journal_id] = position
+            self.ids[position] = journal_id
+            self.created_at[position] = np.datetime64(created_at, "s")
+        self.matrix[position] = np.asarray(scores, dtype=np.float32)
+
+    def vector_of(self, journal_id: int):
+        with self._lock:
+            position = self.positions.get(journal_id)
+            return None if position is None else self.matrix[position].copy()
+
+    def nearest(self, vector: Sequence[float], k: int, exclude_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the k entries closest (Euclidean distance over the 14 scores) to the vector"""
+        np = get_numpy()
+        with self._lock:
+            size = self.size
+            ids, created_at, matrix = self.ids[:size], self.created_at[:size], self.matrix[:size]
+            excluded = self.positions.get(exclude_id) if exclude_id is not None else None
+            distances = np.linalg.norm(matrix - np.asarray(vector, dtype=np.float32), axis=1)
+
+        if excluded is not None:
+            distances[excluded] = np.inf
+            size -= 1
+        k = min(k, size)
+        if k <= 0:
+            return []
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [
+            {
+                "id": int(ids[i]),
+                "created_at": created_at[i].item(),
+                "distance": float(distances[i]),
+            }
+            for i in top
+        ]
+
+
+class JournalIndexCache:
+    """
+    LRU cache of per-user journal indexes, built lazily from the score columns.
+    Indexes are updated in place for entries scored on this worker and rebuilt once
+    older than JOURNAL_INDEX_TTL_SECONDS for those scored elsewhere.
+    """
+
+    def __init__(self, max_users: int = JOURNAL_INDEX_CACHE_SIZE):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[int, UserJournalIndex]" = OrderedDict()
+
+    def get(self, db: Session, user_id: int) -> UserJournalIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and time.monotonic() - index.built_at >= JOURNAL_INDEX_TTL_SECONDS:
+                index = None
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+        record_cache("journal_index", index is not None)
+        if index is not None:
+            return index
+
+        columns = [getattr(Journal, column) for column in SCORE_COLUMNS]
+        with time_stage("db_query", "journal_index_build"):
+            rows = db.query(Journal.id, Journal.created_at, *columns).filter(
+                Journal.user_id == user_id,
+                Journal.analysis_status.in_(SCORED_STATUSES)
+            ).order_by(Journal.id).all()
+        index = UserJournalIndex(
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            [[value or 0 for value in row[2:]] for row in rows],
+        )
+
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def on_journal_scored(self, journal: Journal):
+        """
+        Keep a cached index current after an entry has been analyzed; uncached users are built on demand.
+        Call before the session commits (or on a refreshed instance) to avoid reloading expired attributes.
+        """
+        with self._lock:
+            index = self._indexes.get(journal.user_id)
+        if index is not None:
+            index.upsert(journal.id, journal.created_at, [getattr(journal, column) or 0 for column in SCORE_COLUMNS])
+
+
+journal_index_cache = JournalIndexCache()
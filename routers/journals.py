@@ -1,10 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, BackgroundTasks, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date, datetime
 
-from db.database import get_db
+from db.database import get_db, SessionLocal
 from db.models import User, Journal
-from .utils import generate_analyze_journal
+from db.db_enum import AnalysisStatus
+from schemas.journals import SimilarJournalsRequest, SimilarJournalsResponse
+from .utils import (
+    journal_scores_from_analysis,
+    JOURNAL_EXPORT_COLUMNS,
+    iter_user_journal_batches,
+    stream_journal_export,
+    IMPORT_BATCH_SIZE,
+    parse_import_line,
+    bulk_insert_journals,
+    queue_journal_analysis,
+)
+from .emotion_frame import SCORE_NAMES
+from .journal_similarity import journal_index_cache
+from .lexicon import score_journal_locally
+from .near_duplicates import near_duplicate_detector, load_analysis, DUPLICATE_ANALYSIS_STATUS
 from utils.security import get_current_user
+from utils.metrics import time_stage
+from utils.idempotency import run_idempotent, fingerprint_request, purge_expired_idempotency_keys
+from utils.write_behind import journal_write_buffer
 
 
 router = APIRouter(
@@ -16,35 +38,234 @@ router = APIRouter(
 async def analyze_journal_entry(
     # user_id: int,
     entry: str, 
-    db: Session = Depends(get_db), 
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     # current_user: User = Depends(get_current_user)
 ):
+    """
+    Save a journal entry with provisional scores from the local lexicon and refine them
+    with the LLM analysis in the background. An entry that nearly duplicates a recent
+    analyzed entry reuses its scores instead and is not sent to the LLM, unless
+    NEAR_DUPLICATE_MARK_PROVISIONAL asks for the reused scores to be refined as well.
+    Retries sent with the same Idempotency-Key get the original response instead of a second entry.
     
+    No session is held for the whole request: the duplicate lookup and the insert each use
+    a short-lived one, and with JOURNAL_WRITE_BEHIND the insert joins a micro-batch.
+    With an Idempotency-Key the entry is inserted in the transaction that stores the response.
+    """
     if not entry:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Entry cannot be empty")
     
-    analysis_result = generate_analyze_journal(entry)
-    
-    # Save the analysis result to the database
-    db.add(Journal(
-        # user_id=current_user.id,
-        user_id=1,
-        journal_content=entry,
-        positive_score=analysis_result['sentiment']['positive'],
-        negative_score=analysis_result['sentiment']['negative'],
-        neutral_score=analysis_result['sentiment']['neutral'],
-        happiness_score=analysis_result['emotion']['happiness'],
-        sadness_score=analysis_result['emotion']['sadness'],
-        fear_score=analysis_result['emotion']['fear'],
-        anger_score=analysis_result['emotion']['anger'],
-        surprise_score=analysis_result['emotion']['surprise'],
-        joy_score=analysis_result['emotion']['joy'],
-        love_score=analysis_result['emotion']['love'],
-        disgust_score=analysis_result['emotion']['disgust'],
-        relief_score=analysis_result['emotion']['relief'],
-        gratitude_score=analysis_result['emotion']['gratitude'],
-        confusion_score=analysis_result['emotion']['confusion']
-    ))
-    db.commit()
-    
-    return analysis_result
\ No newline at end of file
+    # user_id = current_user.id
+    user_id = 1
+    
+    async def save_entry(key_db: Optional[Session] = None):
+        with time_stage("near_duplicate_check"), SessionLocal() as db:
+            duplicate_of = near_duplicate_detector.find(db, user_id, entry)
+            analysis_result = load_analysis(db, duplicate_of) if duplicate_of is not None else None
+        
+        if analysis_result is None:
+            duplicate_of = None
+            analysis_status = AnalysisStatus.PROVISIONAL
+            with time_stage("lexicon_score"):
+                analysis_result = score_journal_locally(entry)
+        else:
+            analysis_status = DUPLICATE_ANALYSIS_STATUS
+            # Same response shape as the lexicon and LLM results
+            analysis_result["journal_content"] = entry
+        
+        # Save the provisional (or reused) analysis to the database
+        row = dict(
+            user_id=user_id,
+            journal_content=entry,
+            created_at=datetime.utcnow(),
+            analysis_status=analysis_status,
+            digest=analysis_result.get("digest"),
+            **journal_scores_from_analysis(analysis_result)
+        )
+        if key_db is None:
+            journal_id = await journal_write_buffer.write(row)
+        else:
+            # Left uncommitted: run_idempotent commits it together with the stored response
+            with time_stage("db_query", "insert_journal"):
+                journal = Journal(**row)
+                key_db.add(journal)
+                key_db.flush()
+                journal_id = journal.id
+        journal_index_cache.on_journal_scored(Journal(id=journal_id, **row))
+        
+        # The final scores overwrite the provisional (lexicon or reused) ones once the LLM answers
+        if analysis_status == AnalysisStatus.PROVISIONAL:
+            background_tasks.add_task(queue_journal_analysis, SessionLocal, [journal_id])
+        
+        return status.HTTP_200_OK, {
+            **analysis_result,
+            "id": journal_id,
+            "digest": row["digest"],
+            "analysis_status": analysis_status.value,
+            "duplicate_of": duplicate_of,
+        }
+    
+    if idempotency_key is None:
+        return (await save_entry())[1]
+    
+    background_tasks.add_task(purge_expired_idempotency_keys, SessionLocal)
+    # The session only holds a connection while claiming or polling the key and from the insert to the final commit
+    with SessionLocal() as db:
+        return await run_idempotent(
+            db, user_id, "journals.analyze", idempotency_key, fingerprint_request(entry), save_entry
+        )
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_journals(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    from_date: Optional[date] = Query(None),
+    to_date: Optional[date] = Query(None),
+    columns: Optional[str] = Query(None, description="Comma separated list of columns to export"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream the authenticated user's journal history as NDJSON or CSV.
+    Rows are read in small keyset batches, so the export runs in constant memory.
+    """
+    # db is the session get_current_user authenticated with. get_db only closes it once the
+    # response has finished, so release its connection now rather than for the whole stream.
+    user_id = current_user.id
+    db.close()
+    
+    selected_columns = JOURNAL_EXPORT_COLUMNS
+    if columns:
+        selected_columns = [name.strip() for name in columns.split(",") if name.strip()]
+        invalid = [name for name in selected_columns if name not in JOURNAL_EXPORT_COLUMNS]
+        if invalid or not selected_columns:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid columns: {', '.join(invalid)}. Allowed: {', '.join(JOURNAL_EXPORT_COLUMNS)}"
+            )
+    
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="from_date must not be after to_date")
+    
+    # Batches open their own short sessions instead of holding one for the whole stream
+    batches = iter_user_journal_batches(SessionLocal, user_id, selected_columns, from_date, to_date)
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    
+    return StreamingResponse(
+        stream_journal_export(batches, selected_columns, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=journals.{export_format}"}
+    )
+
+
+@router.post("/import", status_code=status.HTTP_202_ACCEPTED)
+async def import_journals(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Bulk import journal entries from an NDJSON upload.
+    
+    Each line is a JSON object with "journal_content" and an optional ISO "created_at".
+    Entries are inserted in large batches as pending and analyzed in the background;
+    progress can be followed on /journals/import/status.
+    """
+    imported_ids = []
+    errors = []
+    batch = []
+    buffer = b""
+    line_number = 0
+    
+    def handle_line(raw_line: bytes):
+        nonlocal line_number
+        line_number += 1
+        try:
+            line = raw_line.decode("utf-8").strip()
+            if not line:
+                return
+            batch.append(parse_import_line(line))
+        except ValueError as e:  # Includes UnicodeDecodeError and json.JSONDecodeError
+            errors.append({"line": line_number, "error": str(e)})
+    
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw_line in lines:
+            handle_line(raw_line)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            imported_ids.extend(bulk_insert_journals(db, current_user.id, batch))
+            batch.clear()
+    
+    if buffer:
+        handle_line(buffer)
+    if batch:
+        imported_ids.extend(bulk_insert_journals(db, current_user.id, batch))
+    
+    background_tasks.add_task(queue_journal_analysis, SessionLocal, imported_ids)
+    
+    return {
+        "imported": len(imported_ids),
+        "failed": len(errors),
+        "errors": errors[:100],
+    }
+
+
+@router.get("/import/status", status_code=status.HTTP_200_OK)
+async def get_import_status(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Count the authenticated user's journal entries by analysis status
+    """
+    counts = db.query(Journal.analysis_status, func.count(Journal.id)).filter(
+        Journal.user_id == current_user.id
+    ).group_by(Journal.analysis_status).all()
+    
+    return {analysis_status.value: count for analysis_status, count in counts}
+
+
+@router.post("/similar", response_model=SimilarJournalsResponse, status_code=status.HTTP_200_OK)
+async def find_similar_journals(
+    request_in: SimilarJournalsRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Find the authenticated user's past entries whose sentiment and emotion scores are
+    closest to a given journal entry or score vector ("days when I felt like this")
+    """
+    if (request_in.journal_id is None) == (request_in.scores is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either journal_id or scores"
+        )
+    
+    index = journal_index_cache.get(db, current_user.id)
+    
+    if request_in.journal_id is not None:
+        vector = index.vector_of(request_in.journal_id)
+        if vector is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Analyzed journal entry not found")
+    else:
+        unknown = [name for name in request_in.scores if name not in SCORE_NAMES]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown score names: {', '.join(unknown)}. Allowed: {', '.join(SCORE_NAMES)}"
+            )
+        vector = [request_in.scores.get(name, 0) for name in SCORE_NAMES]
+    
+    with time_stage("journal_similarity_search"):
+        matches = index.nearest(vector, request_in.k, exclude_id=request_in.journal_id)
+    
+    # Only the k matches need their text
+    contents = dict(db.query(Journal.id, Journal.journal_content).filter(
+        Journal.id.in_([match["id"] for match in matches])
+    ).all()) if matches else {}
+    
+    return SimilarJournalsResponse(results=[
+        {**match, "journal_content": contents.get(match["id"], "")} for match in matches
+    ])
\ No newline at end of file
@@ -0,0 +1,115 @@
+import math
+import re
+from typing import Dict, Any
+
+from .emotion_frame import EMOTION_NAMES, SENTIMENT_NAMES
+# Cues of these emotions also count towards the positive or negative sentiment
+from .emotion_frame import POSITIVE_EMOTIONS, NEGATIVE_EMOTIONS
+
+# Emotion cue words. Matching is on lower-cased word tokens, so common inflections are listed explicitly.
+EMOTION_LEXICON: Dict[str, set] = {
+    "happiness": {
+        "happy", "happier", "happiest", "happiness", "glad", "cheerful", "content", "pleased",
+        "smile", "smiled", "smiling", "laugh", "laughed", "laughing", "fun", "good", "great", "nice",
+    },
+    "sadness": {
+        "sad", "sadder", "sadness", "unhappy", "down", "depressed", "depressing", "cry", "cried",
+        "crying", "tears", "lonely", "alone", "miss", "missed", "missing", "grief", "hopeless", "empty",
+    },
+    "fear": {
+        "afraid", "scared", "scary", "fear", "feared", "anxious", "anxiety", "worried", "worry",
+        "worrying", "nervous", "panic", "panicked", "terrified", "dread", "frightened", "stressed", "stress",
+    },
+    "anger": {
+        "angry", "anger", "mad", "furious", "annoyed", "annoying", "irritated", "frustrated",
+        "frustrating", "frustration", "hate", "hated", "rage", "resent", "resentful", "pissed",
+    },
+    "surprise": {
+        "surprised", "surprise", "surprising", "unexpected", "unexpectedly", "shocked", "shock",
+        "amazed", "astonished", "suddenly", "wow",
+    },
+    "joy": {
+        "joy", "joyful", "excited", "exciting", "excitement", "thrilled", "delighted", "wonderful",
+        "amazing", "awesome", "fantastic", "celebrate", "celebrated", "ecstatic", "proud",
+    },
+    "love": {
+        "love", "loved", "loving", "adore", "adored", "affection", "care", "cared", "caring",
+        "hug", "hugged", "romantic", "close", "friend", "friends", "family",
+    },
+    "disgust": {
+        "disgust", "disgusted", "disgusting", "gross", "awful", "nasty", "sick", "revolting",
+        "repulsive", "horrible",
+    },
+    "relief": {
+        "relief", "relieved", "calm", "calmer", "relaxed", "relaxing", "peaceful", "finally",
+        "rested", "safe", "better",
+    },
+    "gratitude": {
+        "grateful", "gratitude", "thankful", "thanks", "thank", "appreciate", "appreciated",
+        "appreciative", "blessed", "lucky",
+    },
+    "confusion": {
+        "confused", "confusing", "confusion", "unsure", "uncertain", "lost", "puzzled", "unclear",
+        "why", "wonder", "wondering", "doubt", "torn",
+    },
+}
+
+NEGATIONS = {"not", "no", "never", "don't", "didn't", "isn't", "wasn't", "can't", "couldn't", "won't", "nothing", "hardly"}
+INTENSIFIERS = {"very": 1.5, "really": 1.5, "so": 1.4, "extremely": 2.0, "super": 1.5, "incredibly": 2.0, "totally": 1.5}
+# A negation or intensifier applies to cue words at most this many tokens after it
+MODIFIER_WINDOW = 3
+# Cue weight at which a score reaches ~6/10; scores saturate towards 10
+SATURATION = 2.0
+
+TOKEN_PATTERN = re.compile(r"[a-z']+")
+
+
+def _scale(weight: float) -> int:
+    """Map an accumulated cue weight onto the 0-10 score range"""
+    return int(round(10 * (1 - math.exp(-weight / SATURATION))))
+
+
+def score_journal_locally(journal_content: str) -> Dict[str, Any]:
+    """
+    Provisional sentiment and emotion scores from a keyword lexicon, without any network call.
+
+    Returns the same shape as generate_analyze_journal so the result can be stored with
+    journal_scores_from_analysis and later replaced by the LLM analysis.
+    """
+    emotion_weights = dict.fromkeys(EMOTION_NAMES, 0.0)
+    positive = negative = 0.0
+    negated_until = boosted_until = -1
+    boost = 1.0
+
+    for position, token in enumerate(TOKEN_PATTERN.findall(journal_content.lower())):
+        if token in NEGATIONS:
+            negated_until = position + MODIFIER_WINDOW
+            continue
+        if token in INTENSIFIERS:
+            boost, boosted_until = INTENSIFIERS[token], position + MODIFIER_WINDOW
+            continue
+        weight = boost if position <= boosted_until else 1.0
+        negated = position <= negated_until
+        for emotion, words in EMOTION_LEXICON.items():
+            if token not in words:
+                continue
+            if negated:
+                # "not happy" reads as negative, "not sad" as mildly positive, neither as the emotion itself
+                if emotion in POSITIVE_EMOTIONS:
+                    negative += weight
+                elif emotion in NEGATIVE_EMOTIONS:
+                    positive += 0.5 * weight
+                continue
+            emotion_weights[emotion] += weight
+            if emotion in POSITIVE_EMOTIONS:
+                positive += weight
+            elif emotion in NEGATIVE_EMOTIONS:
+                negative += weight
+
+    sentiment = {"positive": _scale(positive), "negative": _scale(negative)}
+    sentiment["neutral"] = 10 - max(sentiment["positive"], sentiment["negative"])
+    return {
+        "emotion": {emotion: _scale(weight) for emotion, weight in emotion_weights.items()},
+        "sentiment": {name: sentiment[name] for name in SENTIMENT_NAMES},
+        "journal_content": journal_content,
+    }
@@ -0,0 +1,161 @@
+import logging
+import os
+import threading
+import time
+from typing import List, Dict, Callable, Any, Optional
+
+from utils.metrics import record_llm_call
+
+logger = logging.getLogger(__name__)
+
+# Prompts up to this many estimated tokens are single-entry sized and go to the fast tier
+FAST_TIER_MAX_PROMPT_TOKENS = int(os.environ.get('LLM_FAST_TIER_MAX_PROMPT_TOKENS', '1500'))
+# Consecutive failures that take a tier out of rotation, and for how long.
+# A tier demoted for being slow gets a fresh latency sample once it has gone this long without one.
+TIER_FAILURE_THRESHOLD = 3
+TIER_COOLDOWN_SECONDS = 30.0
+# Weight of the newest sample in a tier's moving average latency
+LATENCY_SMOOTHING = 0.2
+
+
+class ModelTier:
+    """
+    A model the router can send prompts to, with its own timeout, latency target and price
+    """
+
+    def __init__(self, name: str, model: str, timeout: float, latency_target: float,
+                 input_cost_per_million: float, output_cost_per_million: float):
+        self.name = name
+        self.model = model
+        self.timeout = timeout
+        self.latency_target = latency_target
+        self.input_cost_per_million = input_cost_per_million
+        self.output_cost_per_million = output_cost_per_million
+        self._lock = threading.Lock()
+        self.avg_latency = None
+        self.last_sample_at = 0.0
+        self.consecutive_failures = 0
+        self.unavailable_until = 0.0
+
+    def cost(self, prompt_tokens: int, response_tokens: int) -> float:
+        """Price of one call in USD"""
+        return (prompt_tokens * self.input_cost_per_million + response_tokens * self.output_cost_per_million) / 1_000_000
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.last_sample_at = time.monotonic()
+            self.avg_latency = latency if self.avg_latency is None else (
+                LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * self.avg_latency
+            )
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= TIER_FAILURE_THRESHOLD:
+                self.unavailable_until = time.monotonic() + TIER_COOLDOWN_SECONDS
+
+    def is_healthy(self) -> bool:
+        """
+        Not cooling down after repeated failures and not slower than its latency target.
+        A slow tier that has not been called for TIER_COOLDOWN_SECONDS forgets its average,
+        so its next call measures it afresh instead of it staying demoted for good.
+        """
+        now = time.monotonic()
+        if now < self.unavailable_until:
+            return False
+        with self._lock:
+            if self.avg_latency is not None and self.avg_latency > self.latency_target:
+                if now - self.last_sample_at < TIER_COOLDOWN_SECONDS:
+                    return False
+                self.avg_latency = None
+        return True
+
+
+def _tier(name: str, default_model: str, timeout: float, latency_target: float, input_cost: float, output_cost: float) -> ModelTier:
+    prefix = f"LLM_{name.upper()}_TIER"
+    return ModelTier(
+        name,
+        os.environ.get(f"{prefix}_MODEL", default_model),
+        float(os.environ.get(f"{prefix}_TIMEOUT", str(timeout))),
+        latency_target,
+        input_cost,
+        output_cost,
+    )
+
+
+MODEL_TIERS: Dict[str, ModelTier] = {
+    tier.name: tier for tier in (
+        _tier("fast", "gemini-2.0-flash-lite-001", timeout=10, latency_target=3, input_cost=0.075, output_cost=0.30),
+        _tier("standard", "gemini-2.0-flash-001", timeout=30, latency_target=10, input_cost=0.10, output_cost=0.40),
+        _tier("quality", "gemini-2.5-flash", timeout=60, latency_target=30, input_cost=0.30, output_cost=2.50),
+    )
+}
+
+# Preferred tier order per task; the tiers after the first are fallbacks
+TASK_ROUTES: Dict[str, List[str]] = {
+    "journal_analyze": ["fast", "standard"],
+    "journal_batch_analyze": ["standard", "fast"],
+    "weekly_analysis": ["quality", "standard"],
+}
+
+
+class ModelRouter:
+    """
+    Picks the model tiers for a prompt and calls them in order until one succeeds
+    """
+
+    def __init__(self, tiers: Dict[str, ModelTier], routes: Dict[str, List[str]]):
+        self.tiers = tiers
+        self.routes = routes
+
+    def plan(self, task: str, prompt_tokens: int) -> List[ModelTier]:
+        """
+        Tiers to try for a task, best first.
+        Single-entry analysis larger than FAST_TIER_MAX_PROMPT_TOKENS skips the fast tier,
+        and tiers that are failing or slower than their target move behind the healthy ones.
+        """
+        names = self.routes.get(task, ["standard"])
+        if task == "journal_analyze" and prompt_tokens > FAST_TIER_MAX_PROMPT_TOKENS:
+            names = [name for name in names if name != "fast"] or names
+        tiers = [self.tiers[name] for name in names]
+        return sorted(tiers, key=lambda tier: not tier.is_healthy())
+
+    def call(self, task: str, prompt_tokens: int, send: Callable[[ModelTier, float], Any],
+             deadline: Optional[float] = None) -> Any:
+        """
+        Run send(tier, timeout) on the planned tiers until one returns.
+        send raises to signal a failed call (error, timeout or unusable output); the last error is re-raised.
+
+        With a deadline (time.monotonic() value) the timeouts are capped at the time left, and a tier
+        with a fallback after it gets at most the time left minus the fallback's share, which is
+        the fallback's own timeout or half the time left, whichever is smaller.
+        """
+        tiers = self.plan(task, prompt_tokens)
+        last_error = None
+        for position, tier in enumerate(tiers):
+            timeout = tier.timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    last_error = last_error or TimeoutError(f"No time left for the LLM call for {task}")
+                    break
+                reserve = min(tiers[position + 1].timeout, remaining / 2) if position + 1 < len(tiers) else 0
+                timeout = min(timeout, remaining - reserve)
+            start = time.perf_counter()
+            try:
+                result = send(tier, timeout)
+            except Exception as e:
+                tier.record_failure()
+                record_llm_call(task, tier.name, "error", time.perf_counter() - start)
+                logger.warning(f"LLM call for {task} on tier '{tier.name}' ({tier.model}) failed: {str(e)}")
+                last_error = e
+                continue
+            latency = time.perf_counter() - start
+            tier.record_success(latency)
+            record_llm_call(task, tier.name, "success", latency)
+            return result
+        raise last_error
+
+
+model_router = ModelRouter(MODEL_TIERS, TASK_ROUTES)
@@ -0,0 +1,203 @@
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from db.models import Journal
+from db.db_enum import AnalysisStatus
+from utils.metrics import record_cache, time_stage
+from .emotion_frame import SCORE_COLUMNS, SCORE_NAMES, SENTIMENT_NAMES, EMOTION_NAMES, get_numpy
+
+# Estimated Jaccard similarity of word shingles above which an entry reuses an earlier analysis
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', '0.8'))
+# When set, reused scores are stored as PROVISIONAL and still refined by the LLM in the background;
+# they only serve as a better first answer than the lexicon. Unset, reused scores are final.
+NEAR_DUPLICATE_MARK_PROVISIONAL = os.environ.get('NEAR_DUPLICATE_MARK_PROVISIONAL', '').lower() in ('1', 'true', 'yes')
+DUPLICATE_ANALYSIS_STATUS = AnalysisStatus.PROVISIONAL if NEAR_DUPLICATE_MARK_PROVISIONAL else AnalysisStatus.COMPLETED
+# Only this recent history is compared, which bounds each user's index
+NEAR_DUPLICATE_WINDOW_DAYS = 30
+NEAR_DUPLICATE_MAX_ENTRIES = 200
+NEAR_DUPLICATE_CACHE_SIZE = int(os.environ.get('NEAR_DUPLICATE_CACHE_SIZE', '256'))
+# Cached indexes are rebuilt after this long, picking up entries analyzed on other workers
+# and dropping entries that left the window
+NEAR_DUPLICATE_INDEX_TTL_SECONDS = float(os.environ.get('NEAR_DUPLICATE_INDEX_TTL_SECONDS', '60'))
+
+SHINGLE_SIZE = 3
+# 16 LSH bands of 4 rows: pairs above ~0.5 similarity share a band with high probability
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+_MERSENNE_PRIME = (1 << 31) - 1
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+_permutations = None
+
+
+def _get_permutations():
+    """Fixed random (a, b) pairs of the universal hash functions, shared by all signatures"""
+    global _permutations
+    if _permutations is None:
+        np = get_numpy()
+        generator = np.random.default_rng(20261018)
+        _permutations = (
+            generator.integers(1, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64),
+            generator.integers(0, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64),
+        )
+    return _permutations
+
+
+def shingles(text: str) -> Set[str]:
+    """Word 3-grams of the lower-cased text without punctuation; short texts yield a single shingle"""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text: str):
+    """MinHash signature (NUM_PERMUTATIONS uint32 values) of the text's shingles, or None for empty text"""
+    np = get_numpy()
+    tokens = shingles(text)
+    if not tokens:
+        return None
+    hashes = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in tokens), dtype=np.uint64, count=len(tokens))
+    a, b = _get_permutations()
+    permuted = (a[:, None] * hashes[None, :] + b[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def _band_keys(signature) -> List[Tuple[int, bytes]]:
+    return [(band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()) for band in range(LSH_BANDS)]
+
+
+class UserDuplicateIndex:
+    """
+    MinHash signatures of one user's recent analyzed entries, bucketed by LSH band.
+    Holds at most NEAR_DUPLICATE_MAX_ENTRIES entries; the oldest are dropped first.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.built_at = time.monotonic()
+        self.signatures: "OrderedDict[int, object]" = OrderedDict()
+        self.buckets: Dict[Tuple[int, bytes], Set[int]] = {}
+
+    def add(self, journal_id: int, signature):
+        with self._lock:
+            if journal_id in self.signatures:
+                return
+            self.signatures[journal_id] = signature
+            for band_key in _band_keys(signature):
+                self.buckets.setdefault(band_key, set()).add(journal_id)
+            while len(self.signatures) > NEAR_DUPLICATE_MAX_ENTRIES:
+                self._remove(next(iter(self.signatures)))
+
+    def _remove(self, journal_id: int):
+        signature = self.signatures.pop(journal_id)
+        for band_key in _band_keys(signature):
+            bucket = self.buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(journal_id)
+                if not bucket:
+                    del self.buckets[band_key]
+
+    def best_match(self, signature, exclude_id: Optional[int] = None) -> Optional[Tuple[int, float]]:
+        """The most similar indexed entry sharing an LSH band, with its estimated Jaccard similarity"""
+        np = get_numpy()
+        with self._lock:
+            candidates = set()
+            for band_key in _band_keys(signature):
+                candidates |= self.buckets.get(band_key, set())
+            candidates.discard(exclude_id)
+            best = None
+            for journal_id in candidates:
+                similarity = float(np.mean(self.signatures[journal_id] == signature))
+                if best is None or similarity > best[1]:
+                    best = (journal_id, similarity)
+        return best
+
+
+class NearDuplicateDetector:
+    """
+    Per-user near-duplicate indexes in an LRU cache, rebuilt from the journals table on a miss
+    or once older than NEAR_DUPLICATE_INDEX_TTL_SECONDS
+    """
+
+    def __init__(self, max_users: int = NEAR_DUPLICATE_CACHE_SIZE):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[int, UserDuplicateIndex]" = OrderedDict()
+
+    def get(self, db: Session, user_id: int) -> UserDuplicateIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and time.monotonic() - index.built_at < NEAR_DUPLICATE_INDEX_TTL_SECONDS:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        since = datetime.utcnow() - timedelta(days=NEAR_DUPLICATE_WINDOW_DAYS)
+        with time_stage("db_query", "near_duplicate_index_build"):
+            rows = db.query(Journal.id, Journal.journal_content).filter(
+                Journal.user_id == user_id,
+                Journal.created_at >= since,
+                Journal.analysis_status == AnalysisStatus.COMPLETED
+            ).order_by(Journal.created_at.desc(), Journal.id.desc()).limit(NEAR_DUPLICATE_MAX_ENTRIES).all()
+        index = UserDuplicateIndex()
+        # Oldest first, so eviction order matches insertion order
+        for journal_id, content in reversed(rows):
+            signature = minhash_signature(content)
+            if signature is not None:
+                index.add(journal_id, signature)
+
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def find(self, db: Session, user_id: int, journal_content: str, exclude_id: Optional[int] = None) -> Optional[int]:
+        """Id of an earlier analyzed entry that the content nearly duplicates, or None"""
+        signature = minhash_signature(journal_content)
+        if signature is None:
+            return None
+        match = self.get(db, user_id).best_match(signature, exclude_id)
+        found = match is not None and match[1] >= NEAR_DUPLICATE_THRESHOLD
+        record_cache("near_duplicate", found)
+        return match[0] if found else None
+
+    def on_journal_analyzed(self, journal: Journal):
+        """Add a freshly analyzed entry to its user's index if that index is cached"""
+        with self._lock:
+            index = self._indexes.get(journal.user_id)
+        if index is not None:
+            signature = minhash_signature(journal.journal_content)
+            if signature is not None:
+                index.add(journal.id, signature)
+
+
+def load_analysis(db: Session, journal_id: int) -> Optional[Dict[str, Any]]:
+    """
+    The stored scores and digest of an entry in the shape of generate_analyze_journal,
+    or None if the entry no longer exists
+    """
+    row = db.query(Journal.digest, *[getattr(Journal, column) for column in SCORE_COLUMNS]).filter(
+        Journal.id == journal_id
+    ).first()
+    if row is None:
+        return None
+    scores = dict(zip(SCORE_NAMES, row[1:]))
+    return {
+        "sentiment": {name: scores[name] for name in SENTIMENT_NAMES},
+        "emotion": {name: scores[name] for name in EMOTION_NAMES},
+        "digest": row[0],
+    }
+
+
+near_duplicate_detector = NearDuplicateDetector()
@@ -0,0 +1,151 @@
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy.orm import Session
+
+from db.models import Recommendation, RecommendationTypeModel
+from db.db_enum import RecommendationType
+from .emotion_frame import SCORE_NAMES, get_numpy
+
+RECOMMENDATION_TYPES = list(RecommendationType)
+
+
+class RecommendationIndex:
+    """
+    In-memory similarity index over the recommendation catalogue.
+    
+    Every recommendation with an emotion profile is one row of a normalized
+    float32 matrix, so top-k for a user's score vector is a single matrix-vector
+    product. Queries read an immutable snapshot; updates build a new snapshot
+    under a lock and swap it in, so queries never wait on them.
+    
+    The index remembers the shared catalogue version it was loaded at and reloads
+    when another worker has changed the catalogue since (see ensure_current).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: Dict[int, Dict[str, Any]] = {}
+        self._vectors: Dict[int, Any] = {}
+        self._snapshot = None  # (ids, type codes, matrix, items)
+        self.version: Optional[int] = None
+        self._checked_at = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    @staticmethod
+    def _profile_vector(profile: Dict[str, Any]):
+        np = get_numpy()
+        vector = np.array([float(profile.get(name, 0) or 0) for name in SCORE_NAMES], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _item(recommendation: Recommendation, recommendation_type: RecommendationType) -> Dict[str, Any]:
+        return {
+            "id": recommendation.id,
+            "title": recommendation.title,
+            "description": recommendation.description,
+            "ref_url": recommendation.ref_url,
+            "recommendation_type": recommendation_type,
+        }
+
+    def _swap(self, items: Dict[int, Dict[str, Any]], vectors: Dict[int, Any]):
+        """Build a new snapshot from items and vectors and publish it (caller holds the lock)"""
+        np = get_numpy()
+        ids = np.fromiter(items.keys(), dtype=np.int64, count=len(items))
+        codes = np.array(
+            [RECOMMENDATION_TYPES.index(items[item_id]["recommendation_type"]) for item_id in items],
+            dtype=np.int8,
+        )
+        if items:
+            matrix = np.vstack([vectors[item_id] for item_id in items])
+        else:
+            matrix = np.zeros((0, len(SCORE_NAMES)), dtype=np.float32)
+        self._items, self._vectors = items, vectors
+        self._snapshot = (ids, codes, matrix, items)
+
+    def load(self, db: Session):
+        """(Re)build the index from the whole catalogue"""
+        from .catalogue import get_catalogue_version
+        # Read before the rows, so a change made in between triggers another reload rather than being missed
+        version = get_catalogue_version(db)
+        rows = db.query(Recommendation, RecommendationTypeModel.recommendation_type).join(
+            RecommendationTypeModel, Recommendation.recco_category == RecommendationTypeModel.id
+        ).filter(Recommendation.emotion_profile.isnot(None)).all()
+
+        items = {}
+        vectors = {}
+        for recommendation, recommendation_type in rows:
+            items[recommendation.id] = self._item(recommendation, recommendation_type)
+            vectors[recommendation.id] = self._profile_vector(recommendation.emotion_profile)
+
+        with self._lock:
+            self._swap(items, vectors)
+            self.version = version
+        self._checked_at = time.monotonic()
+
+    def ensure_current(self, db: Session):
+        """
+        Load the index on first use and reload it when the shared catalogue version has changed.
+        The version is read at most every CATALOGUE_VERSION_CHECK_SECONDS.
+        """
+        from .catalogue import get_catalogue_version, CATALOGUE_VERSION_CHECK_SECONDS
+        if self.loaded and time.monotonic() - self._checked_at < CATALOGUE_VERSION_CHECK_SECONDS:
+            return
+        if not self.loaded or get_catalogue_version(db) != self.version:
+            self.load(db)
+        else:
+            self._checked_at = time.monotonic()
+
+    def upsert(self, recommendation: Recommendation, recommendation_type: RecommendationType,
+               version: Optional[int] = None):
+        """
+        Add or replace one catalogue item without reloading the catalogue.
+        version is the catalogue version the change produced. If it directly follows the
+        index's version, no other change can be missing and the index moves up to it;
+        otherwise ensure_current still reloads to pick up the changes in between.
+        """
+        if not self.loaded:
+            return  # Picked up by the first load
+        with self._lock:
+            items = dict(self._items)
+            vectors = dict(self._vectors)
+            items.pop(recommendation.id, None)
+            vectors.pop(recommendation.id, None)
+            if recommendation.emotion_profile:
+                items[recommendation.id] = self._item(recommendation, recommendation_type)
+                vectors[recommendation.id] = self._profile_vector(recommendation.emotion_profile)
+            self._swap(items, vectors)
+            if version is not None and self.version is not None and version == self.version + 1:
+                self.version = version
+
+    def top_k(
+        self, vector: List[float], k: int = 5, recommendation_type: Optional[RecommendationType] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the k items whose emotion profile is most similar (cosine) to the vector
+        """
+        np = get_numpy()
+        ids, codes, matrix, items = self._snapshot
+
+        if recommendation_type is not None:
+            mask = codes == RECOMMENDATION_TYPES.index(recommendation_type)
+            ids, matrix = ids[mask], matrix[mask]
+        if not len(ids):
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = matrix @ (query / norm if norm else query)
+
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{**items[int(ids[i])], "score": float(scores[i])} for i in top]
+
+
+recommendation_index = RecommendationIndex()
@@ -1,14 +1,162 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import csv
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import Optional, List
 
 from db.database import get_db
 from db.db_enum import RecommendationType
-from db.models import User
-from utils.security import get_current_user
+from db.models import User, Recommendation, RecommendationTypeModel
+from schemas.recommendations import RecommendationCreate, RecommendationOut, RecommendationList, CataloguePage
+from utils.security import get_current_user, get_current_admin_user
+from utils.metrics import time_stage
+from .utils import get_user_emotion_vector
+from .emotion_frame import SCORE_NAMES
+from .recommendation_index import recommendation_index
+from .catalogue import catalogue_cache, bump_catalogue_version, parse_catalogue_upload, bulk_load_catalogue
 
 # Create router with prefix and tags defined here
 router = APIRouter(
     prefix="/recommendations",
     tags=["Recommendations"]
 )
+
+
+
+@router.get("", response_model=RecommendationList, status_code=status.HTTP_200_OK)
+async def get_recommendations(
+    source: str = Query("weekly", pattern="^(latest|weekly)$", description="Use the latest entry or the weekly average"),
+    k: int = Query(5, ge=1, le=50),
+    recommendation_type: Optional[RecommendationType] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Recommend catalogue items whose emotion profile best matches the authenticated user's
+    latest journal entry or weekly average scores
+    """
+    vector = get_user_emotion_vector(db, current_user.id, source)
+    if vector is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No analyzed journal entries found to base recommendations on"
+        )
+    
+    recommendation_index.ensure_current(db)
+    with time_stage("recommendation_top_k"):
+        recommendations = recommendation_index.top_k(vector, k, recommendation_type)
+    
+    return RecommendationList(source=source, recommendations=recommendations)
+
+
+@router.post("", response_model=RecommendationOut, status_code=status.HTTP_201_CREATED)
+async def create_recommendation(
+    recommendation_in: RecommendationCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Add a catalogue item (admin only). The recommendation index is updated in place.
+    """
+    if recommendation_in.emotion_profile:
+        unknown = [name for name in recommendation_in.emotion_profile if name not in SCORE_NAMES]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown emotion profile keys: {', '.join(unknown)}. Allowed: {', '.join(SCORE_NAMES)}"
+            )
+    
+    recommendation_type = db.query(RecommendationTypeModel).filter(
+        RecommendationTypeModel.recommendation_type == recommendation_in.recommendation_type
+    ).first()
+    if not recommendation_type:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown recommendation type")
+    
+    recommendation = Recommendation(
+        title=recommendation_in.title,
+        ref_url=recommendation_in.ref_url,
+        description=recommendation_in.description,
+        recco_category=recommendation_type.id,
+        emotion_profile=recommendation_in.emotion_profile,
+    )
+    db.add(recommendation)
+    version = bump_catalogue_version(db)
+    db.commit()
+    db.refresh(recommendation)
+    
+    recommendation_index.upsert(recommendation, recommendation_in.recommendation_type, version)
+    catalogue_cache.invalidate()
+    
+    return RecommendationOut(
+        id=recommendation.id,
+        title=recommendation.title,
+        ref_url=recommendation.ref_url,
+        recommendation_type=recommendation_in.recommendation_type,
+        description=recommendation.description,
+    )
+
+
+@router.get("/catalogue", response_model=CataloguePage, status_code=status.HTTP_200_OK)
+async def list_catalogue(
+    request: Request,
+    response: Response,
+    recommendation_type: Optional[RecommendationType] = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+):
+    """
+    List the recommendation catalogue, optionally for one category.
+    
+    Served from an in-process snapshot that is rebuilt only when the catalogue version
+    changes. Responses carry an ETag; clients sending it back in If-None-Match get a
+    304 until the catalogue changes.
+    """
+    version, by_type = catalogue_cache.snapshot()
+    
+    type_key = recommendation_type.value if recommendation_type else "all"
+    etag = f'"catalogue-{version}-{type_key}-{page}-{page_size}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    items = by_type[recommendation_type]
+    start = (page - 1) * page_size
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return CataloguePage(
+        version=version,
+        recommendation_type=recommendation_type,
+        page=page,
+        page_size=page_size,
+        total=len(items),
+        items=items[start:start + page_size],
+    )
+
+
+@router.post("/catalogue/bulk", status_code=status.HTTP_201_CREATED)
+async def bulk_load_recommendations(
+    request: Request,
+    upload_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Bulk load catalogue items from a CSV or NDJSON body (admin only).
+    Items are inserted in batches and the catalogue version is bumped once.
+    A body that is not UTF-8 or not parsable as CSV is rejected as a whole with 400.
+    """
+    try:
+        content = (await request.body()).decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Upload is not valid UTF-8: {str(e)}")
+    try:
+        result = bulk_load_catalogue(db, parse_catalogue_upload(content, upload_format), SCORE_NAMES)
+    except csv.Error as e:
+        # Nothing is committed before the whole upload has been read
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed CSV upload: {str(e)}")
+    
+    # Bulk changes rebuild the similarity index in one go
+    if result["inserted"] and recommendation_index.loaded:
+        recommendation_index.load(db)
+    
+    return result
\ No newline at end of file
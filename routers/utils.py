@@ -1,49 +1,108 @@
 import json
-from google import genai
-from google.genai.types import HttpOptions
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import os
 from jinja2 import Environment, FileSystemLoader
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
+from datetime import datetime, timedelta, date, timezone
 import io
+import csv
 import base64
+from sqlalchemy import tuple_, insert, func
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-import numpy as np
-from db.models import Journal
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Callable, Sequence
+from db.models import Journal, WeeklyReport
+from db.db_enum import AnalysisStatus
+from utils.metrics import time_stage, record_llm_usage
+from .model_router import model_router, ModelTier
+from .emotion_frame import (
+    EmotionFrame,
+    EMOTION_NAMES,
+    SENTIMENT_NAMES,
+    SCORE_COLUMNS,
+    SCORED_STATUSES,
+    ANALYTICS_BUCKETS,
+    POSITIVE_EMOTIONS,
+    NEGATIVE_EMOTIONS,
+    OTHER_EMOTIONS,
+    get_numpy,
+)
 import pathlib
-import glob
-import matplotlib.dates as mdates
-import seaborn as sns
-from matplotlib.colors import LinearSegmentedColormap
 
-client = genai.Client(http_options=HttpOptions(api_version="v1"), api_key=os.environ.get('GOOGLE_GENAI_API_KEY')) 
+# matplotlib, seaborn, numpy and google-genai are imported on first use
+# so that importing the routers (and booting a worker) stays fast.
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+# Shared template environment; Jinja caches each template after its first compilation
+prompt_env = Environment(loader=FileSystemLoader("./routers"))
+PROMPT_TEMPLATES = ['journal_analyze.j2', 'journal_batch_analyze.j2', 'weekly_analyze.j2']
 
 # Create directory for visualizations if it doesn't exist
 VISUALIZATION_DIR = './visualizations'
 pathlib.Path(VISUALIZATION_DIR).mkdir(parents=True, exist_ok=True)
 
 
-def create_chat():
-    return client.chats.create(
-        model="gemini-2.0-flash-001",
+def get_client():
+    """
+    Return the shared Gemini client, creating it on first use
+    """
+    global _client
+    if _client is None:
+        from google import genai
+        from google.genai.types import HttpOptions
+        _client = genai.Client(http_options=HttpOptions(api_version="v1"), api_key=os.environ.get('GOOGLE_GENAI_API_KEY'))
+    return _client
+
+
+def get_pyplot():
+    """
+    Import matplotlib.pyplot on first use, with the non-interactive Agg backend
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def create_chat(model: str = "gemini-2.0-flash-001"):
+    return get_client().chats.create(
+        model=model,
     )
 
 
-def generate_struct_model_response(user_input: str) -> dict | str:
-    chat = create_chat()
+def generate_struct_model_response(user_input: str, task: str = "journal_analyze", deadline: Optional[float] = None) -> dict | str:
+    """
+    Send a prompt to the model tier the router picks for the task and parse the JSON block of the answer.
+    A call that errors, times out or returns no parsable JSON falls back to the task's next tier.
+    deadline (a time.monotonic() value) caps the tier timeouts at the caller's remaining budget.
+    """
+    from google.genai.types import GenerateContentConfig, HttpOptions
 
-    llm_response = chat.send_message(user_input)
+    def send(tier: ModelTier, timeout: float) -> dict:
+        chat = create_chat(tier.model)
+        config = GenerateContentConfig(http_options=HttpOptions(timeout=int(timeout * 1000)))
 
-    json_text = llm_response.text.split("```json")[1].split("```")[0]
-    data_dict = json.loads(json_text)
-    
-    return data_dict
+        with time_stage("llm_call", tier.model):
+            llm_response = chat.send_message(user_input, config=config)
+        usage_metadata = getattr(llm_response, "usage_metadata", None)
+        prompt_tokens = getattr(usage_metadata, "prompt_token_count", None) or 0
+        response_tokens = getattr(usage_metadata, "candidates_token_count", None) or 0
+        record_llm_usage(tier.name, prompt_tokens, response_tokens, tier.cost(prompt_tokens, response_tokens))
+
+        with time_stage("json_parse"):
+            json_text = llm_response.text.split("```json")[1].split("```")[0]
+            return json.loads(json_text)
+
+    return model_router.call(task, estimate_tokens(user_input), send, deadline=deadline)
 
 
 def generate_analyze_journal(journal_content: str) -> dict:
-    env = Environment(loader=FileSystemLoader("./routers")) 
-    template = env.get_template('journal_analyze.j2')
+    template = prompt_env.get_template('journal_analyze.j2')
 
     variables = { "journal_content": journal_content }
     input_prompt = template.render(variables)
@@ -54,26 +113,586 @@ def generate_analyze_journal(journal_content: str) -> dict:
     return response
 
 
+# Prompt size budget for one batched analysis call, in estimated tokens
+ANALYSIS_BATCH_TOKEN_BUDGET = int(os.environ.get('JOURNAL_ANALYSIS_BATCH_TOKENS', '6000'))
+ANALYSIS_BATCH_MAX_ENTRIES = 25
+# Fixed prompt cost of the batch template plus the JSON result each entry adds
+ANALYSIS_BATCH_PROMPT_TOKENS = 400
+ANALYSIS_RESULT_TOKENS = 120
+
+
+def journal_scores_from_analysis(analysis_result: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Map an analysis result from generate_analyze_journal to Journal score column values
+    """
+    scores = {
+        f"{sentiment}_score": analysis_result['sentiment'][sentiment]
+        for sentiment in SENTIMENT_NAMES
+    }
+    scores.update({
+        f"{emotion}_score": analysis_result['emotion'][emotion]
+        for emotion in EMOTION_NAMES
+    })
+    return scores
+
+
+def is_valid_analysis(analysis_result: Any) -> bool:
+    """
+    Check that an analysis result carries an integer 0-10 score for every emotion and sentiment
+    """
+    if not isinstance(analysis_result, dict):
+        return False
+    for group, names in (("emotion", EMOTION_NAMES), ("sentiment", SENTIMENT_NAMES)):
+        scores = analysis_result.get(group)
+        if not isinstance(scores, dict):
+            return False
+        for name in names:
+            value = scores.get(name)
+            if not isinstance(value, (int, float)) or not 0 <= value <= 10:
+                return False
+    return True
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate (about 4 characters per token) used for prompt budgeting
+    """
+    return len(text) // 4 + 1
+
+
+def plan_analysis_batches(
+    entries: List[Dict[str, Any]],
+    token_budget: int = ANALYSIS_BATCH_TOKEN_BUDGET,
+    max_entries: int = ANALYSIS_BATCH_MAX_ENTRIES,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Greedily pack entries into batches that fit the token budget.
+    An entry that exceeds the budget on its own gets a batch of its own.
+    """
+    batches = []
+    current = []
+    current_tokens = ANALYSIS_BATCH_PROMPT_TOKENS
+    
+    for entry in entries:
+        entry_tokens = estimate_tokens(entry["journal_content"]) + ANALYSIS_RESULT_TOKENS
+        if current and (current_tokens + entry_tokens > token_budget or len(current) >= max_entries):
+            batches.append(current)
+            current = []
+            current_tokens = ANALYSIS_BATCH_PROMPT_TOKENS
+        current.append(entry)
+        current_tokens += entry_tokens
+    
+    if current:
+        batches.append(current)
+    return batches
+
+
+def generate_analyze_journal_batch(entries: List[Dict[str, Any]]) -> Dict[int, dict]:
+    """
+    Analyze several journal entries with a single LLM call.
+    
+    Args:
+        entries: dicts with "id" and "journal_content"
+        
+    Returns:
+        Valid analysis results keyed by entry id. Entries missing from the
+        response or with malformed scores are left out.
+    """
+    template = prompt_env.get_template('journal_batch_analyze.j2')
+    
+    input_prompt = template.render({"entries": entries})
+    response = generate_struct_model_response(input_prompt, task="journal_batch_analyze")
+    
+    contents = {entry["id"]: entry["journal_content"] for entry in entries}
+    results = {}
+    for item in response.get("results", []) if isinstance(response, dict) else []:
+        try:
+            entry_id = int(item.get("id"))
+        except (TypeError, ValueError, AttributeError):
+            continue
+        if entry_id in contents and is_valid_analysis(item):
+            results[entry_id] = {
+                "emotion": item["emotion"],
+                "sentiment": item["sentiment"],
+                "digest": item.get("digest"),
+                "journal_content": contents[entry_id],
+            }
+    
+    return results
+
+
+def analyze_journals_in_batches(entries: List[Dict[str, Any]]) -> Dict[int, Optional[dict]]:
+    """
+    Analyze many journal entries using as few LLM calls as the token budget allows.
+    
+    Entries missing or malformed in a batch response are retried one by one with
+    generate_analyze_journal. When the batch call itself fails (e.g. the LLM is down)
+    its entries are not retried, which would multiply the load on a failing service;
+    they map to None like entries that still fail individually.
+    """
+    results: Dict[int, Optional[dict]] = {}
+    
+    for batch in plan_analysis_batches(entries):
+        batch_results = {}
+        if len(batch) > 1:
+            try:
+                batch_results = generate_analyze_journal_batch(batch)
+            except Exception as e:
+                logger.error(f"Batched analysis of {len(batch)} entries failed: {str(e)}")
+                results.update({entry["id"]: None for entry in batch})
+                continue
+        results.update(batch_results)
+        
+        for entry in batch:
+            if entry["id"] in batch_results:
+                continue
+            try:
+                analysis_result = generate_analyze_journal(entry["journal_content"])
+                results[entry["id"]] = analysis_result if is_valid_analysis(analysis_result) else None
+            except Exception as e:
+                logger.error(f"Analysis failed for journal {entry['id']}: {str(e)}")
+                results[entry["id"]] = None
+    
+    return results
+
+
 def get_user_journals_for_week(db: Session, user_id: int) -> List[Journal]:
     """
     Retrieve journal entries for the past 7 days for a specific user
     """
     seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    return db.query(Journal).filter(
+    with time_stage("db_query", "journals_for_week"):
+        return db.query(Journal).filter(
+            Journal.user_id == user_id,
+            Journal.created_at >= seven_days_ago,
+            Journal.analysis_status.in_(SCORED_STATUSES)
+        ).order_by(Journal.created_at).all()
+
+
+# Upper bound on points in one series; an unspecified bucket is widened until the range fits
+ANALYTICS_MAX_POINTS = int(os.environ.get('ANALYTICS_MAX_POINTS', '120'))
+_BUCKET_DAYS = {"day": 1, "week": 7, "month": 28}
+
+
+def choose_analytics_bucket(from_date: date, to_date: date, bucket: Optional[str] = None) -> str:
+    """
+    Return the bucket for a series over [from_date, to_date].
+    Without a bucket the finest one that stays within ANALYTICS_MAX_POINTS is chosen;
+    raises ValueError for an unknown bucket or one that would exceed the limit, and for
+    a range too long even for the widest bucket, whether or not the bucket was given.
+    """
+    days = (to_date - from_date).days + 1
+    if bucket is None:
+        for candidate in ANALYTICS_BUCKETS:
+            if -(-days // _BUCKET_DAYS[candidate]) <= ANALYTICS_MAX_POINTS:
+                return candidate
+        raise ValueError(
+            f"Range of {days} days has more than {ANALYTICS_MAX_POINTS} {ANALYTICS_BUCKETS[-1]} buckets, use a shorter range"
+        )
+    if bucket not in ANALYTICS_BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}'. Allowed: {', '.join(ANALYTICS_BUCKETS)}")
+    if -(-days // _BUCKET_DAYS[bucket]) > ANALYTICS_MAX_POINTS:
+        advice = "use a shorter range" if bucket == ANALYTICS_BUCKETS[-1] else "use a wider bucket"
+        raise ValueError(f"Range of {days} days has more than {ANALYTICS_MAX_POINTS} {bucket} buckets, {advice}")
+    return bucket
+
+
+def get_user_emotion_vector(db: Session, user_id: int, source: str = "weekly") -> Optional[List[float]]:
+    """
+    Return the user's score vector in SCORE_COLUMNS order, or None without analyzed entries.
+    
+    source="latest" uses the most recent analyzed entry, source="weekly" averages
+    the past 7 days in SQL so only one row comes back.
+    """
+    columns = [getattr(Journal, column) for column in SCORE_COLUMNS]
+    query = db.query(Journal).filter(
         Journal.user_id == user_id,
-        Journal.created_at >= seven_days_ago
-    ).order_by(Journal.created_at).all()
+        Journal.analysis_status.in_(SCORED_STATUSES)
+    )
+    
+    with time_stage("db_query", f"emotion_vector_{source}"):
+        if source == "latest":
+            row = query.with_entities(*columns).order_by(Journal.created_at.desc(), Journal.id.desc()).first()
+        else:
+            seven_days_ago = datetime.utcnow() - timedelta(days=7)
+            row = query.filter(Journal.created_at >= seven_days_ago).with_entities(
+                *[func.avg(column) for column in columns]
+            ).first()
+    
+    if row is None or row[0] is None:
+        return None
+    return [float(value or 0) for value in row]
+
+
+def encode_report_cursor(created_at: datetime, report_id: int) -> str:
+    """
+    Encode the (created_at, id) position of a weekly report into an opaque cursor
+    """
+    raw = f"{created_at.isoformat()}|{report_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('utf-8')
+
+
+def decode_report_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_report_cursor.
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('utf-8')).decode('utf-8')
+        created_at, report_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(report_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def get_user_reports_page(
+    db: Session, user_id: int, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Retrieve one page of a user's weekly reports, newest first.
+
+    Uses keyset pagination on (user_id, created_at, id) so every page costs the
+    same index range scan regardless of how many reports precede it. Only the
+    summary columns are selected; analysis text and charts are never read.
+
+    Returns the rows and the cursor for the next page (None on the last page).
+    """
+    query = db.query(
+        WeeklyReport.id,
+        WeeklyReport.from_date,
+        WeeklyReport.to_date,
+        WeeklyReport.created_at,
+    ).filter(WeeklyReport.user_id == user_id)
+    
+    if cursor:
+        created_at, report_id = decode_report_cursor(cursor)
+        query = query.filter(tuple_(WeeklyReport.created_at, WeeklyReport.id) < (created_at, report_id))
+    
+    # Fetch one extra row to know whether another page exists
+    with time_stage("db_query", "weekly_reports_page"):
+        rows = query.order_by(WeeklyReport.created_at.desc(), WeeklyReport.id.desc()).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_report_cursor(rows[-1].created_at, rows[-1].id)
+    
+    return rows, next_cursor
+
+
+# Journal columns that may be selected for export, in default output order
+JOURNAL_EXPORT_COLUMNS = [
+    "id", "created_at", "journal_content", "analysis_status",
+    "positive_score", "negative_score", "neutral_score",
+    "happiness_score", "sadness_score", "fear_score", "anger_score",
+    "surprise_score", "joy_score", "love_score", "disgust_score",
+    "relief_score", "gratitude_score", "confusion_score",
+]
+
+
+def iter_user_journal_batches(
+    session_factory,
+    user_id: int,
+    columns: List[str],
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    batch_size: int = 1000,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield a user's journal entries in batches of plain dicts, oldest first.
+
+    Each batch is read with its own short-lived session using keyset pagination
+    on (created_at, id), so memory stays constant and no transaction is held
+    open between batches while the client consumes the stream.
+    """
+    selected = [getattr(Journal, name) for name in columns]
+    # The keyset columns are always needed to position the next batch
+    keyset = [Journal.created_at, Journal.id]
+    
+    last_position = None
+    while True:
+        db = session_factory()
+        try:
+            query = db.query(*keyset, *selected).filter(Journal.user_id == user_id)
+            if from_date:
+                query = query.filter(Journal.created_at >= datetime.combine(from_date, datetime.min.time()))
+            if to_date:
+                query = query.filter(Journal.created_at < datetime.combine(to_date + timedelta(days=1), datetime.min.time()))
+            if last_position:
+                query = query.filter(tuple_(*keyset) > last_position)
+            rows = query.order_by(*keyset).limit(batch_size).all()
+        finally:
+            db.close()
+        
+        if not rows:
+            return
+        
+        last_position = (rows[-1][0], rows[-1][1])
+        yield [dict(zip(columns, row[2:])) for row in rows]
+        
+        if len(rows) < batch_size:
+            return
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, AnalysisStatus):
+        return value.value
+    return value
+
+
+def stream_journal_export(batches: Iterator[List[Dict[str, Any]]], columns: List[str], export_format: str) -> Iterator[str]:
+    """
+    Serialize journal batches as NDJSON lines or CSV rows, one chunk per batch
+    """
+    if export_format == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(columns)
+        yield buf.getvalue()
+        for batch in batches:
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows([[_export_value(entry[name]) for name in columns] for entry in batch])
+            yield buf.getvalue()
+    else:
+        for batch in batches:
+            yield "".join(
+                json.dumps({name: _export_value(value) for name, value in entry.items()}) + "\n"
+                for entry in batch
+            )
+
+
+# Number of rows sent per multi-row INSERT during bulk imports
+IMPORT_BATCH_SIZE = 1000
+
+# Upper bound on LLM analysis calls running at the same time for imported entries
+ANALYSIS_MAX_CONCURRENCY = int(os.environ.get('JOURNAL_ANALYSIS_CONCURRENCY', '4'))
+
+analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_MAX_CONCURRENCY, thread_name_prefix="journal-analysis")
+
+
+def parse_import_line(line: str) -> Dict[str, Any]:
+    """
+    Parse one NDJSON import line into Journal column values.
+    Timestamps with an offset are converted to naive UTC, like the utcnow() values stored elsewhere.
+    Raises ValueError if the line is not a valid entry.
+    """
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("Entry must be a JSON object")
+    
+    content = record.get("journal_content")
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError("journal_content must be a non-empty string")
+    
+    created_at = record.get("created_at")
+    if created_at is not None and not isinstance(created_at, str):
+        raise ValueError("created_at must be an ISO 8601 string")
+    if created_at:
+        created_at = datetime.fromisoformat(created_at)
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return {
+        "journal_content": content,
+        "created_at": created_at or datetime.utcnow(),
+    }
+
+
+def bulk_insert_journals(db: Session, user_id: int, entries: List[Dict[str, Any]]) -> List[int]:
+    """
+    Insert raw journal entries in one executemany round-trip, marked as pending analysis.
+    Returns the ids of the inserted rows.
+    """
+    rows = [
+        {**entry, "user_id": user_id, "analysis_status": AnalysisStatus.PENDING}
+        for entry in entries
+    ]
+    with time_stage("db_query", "bulk_insert_journals"):
+        result = db.execute(insert(Journal).returning(Journal.id), rows)
+        journal_ids = list(result.scalars())
+        db.commit()
+    return journal_ids
+
+
+def analyze_pending_journals(session_factory, journal_ids: List[int]) -> None:
+    """
+    Run batched LLM analysis for pending or provisionally scored journal entries and store the final scores.
+    Pending entries that nearly duplicate an analyzed entry reuse its scores without an LLM call
+    (or, with NEAR_DUPLICATE_MARK_PROVISIONAL, as provisional scores the LLM then refines).
+    Provisional entries keep their lexicon (or reused) scores if the LLM analysis fails.
+    
+    No session is held during the LLM calls: the entries are read into plain values first
+    and the results are written with a new short-lived session, skipping entries whose
+    status changed in the meantime.
+    """
+    from .journal_similarity import journal_index_cache
+    from .near_duplicates import near_duplicate_detector, load_analysis, DUPLICATE_ANALYSIS_STATUS
+    
+    to_analyze = []
+    with session_factory() as db:
+        journals = db.query(Journal).filter(
+            Journal.id.in_(journal_ids),
+            Journal.analysis_status.in_((AnalysisStatus.PENDING, AnalysisStatus.PROVISIONAL))
+        ).all()
+        
+        for journal in journals:
+            # Provisional entries were checked when they were saved and are queued for the LLM on purpose
+            if journal.analysis_status == AnalysisStatus.PENDING:
+                duplicate_of = near_duplicate_detector.find(db, journal.user_id, journal.journal_content, exclude_id=journal.id)
+                analysis_result = load_analysis(db, duplicate_of) if duplicate_of is not None else None
+                if analysis_result is not None:
+                    for column, value in journal_scores_from_analysis(analysis_result).items():
+                        setattr(journal, column, value)
+                    journal.digest = analysis_result["digest"]
+                    journal.analysis_status = DUPLICATE_ANALYSIS_STATUS
+                    journal_index_cache.on_journal_scored(journal)
+                    if journal.analysis_status == AnalysisStatus.COMPLETED:
+                        continue
+            to_analyze.append({
+                "id": journal.id,
+                "journal_content": journal.journal_content,
+                "analysis_status": journal.analysis_status,
+            })
+        db.commit()
+    
+    if not to_analyze:
+        return
+    results = analyze_journals_in_batches([
+        {"id": entry["id"], "journal_content": entry["journal_content"]} for entry in to_analyze
+    ])
+    
+    read_statuses = {entry["id"]: entry["analysis_status"] for entry in to_analyze}
+    with session_factory() as db:
+        with time_stage("db_query", "store_journal_analysis"):
+            journals = db.query(Journal).filter(Journal.id.in_(list(read_statuses))).all()
+        for journal in journals:
+            # Deleted, re-analyzed or refined elsewhere while the LLM was running
+            if journal.analysis_status != read_statuses[journal.id]:
+                continue
+            analysis_result = results.get(journal.id)
+            if analysis_result is None:
+                if journal.analysis_status == AnalysisStatus.PENDING:
+                    journal.analysis_status = AnalysisStatus.FAILED
+                continue
+            for column, value in journal_scores_from_analysis(analysis_result).items():
+                setattr(journal, column, value)
+            journal.digest = digest_from_analysis(analysis_result)
+            journal.analysis_status = AnalysisStatus.COMPLETED
+            journal_index_cache.on_journal_scored(journal)
+            near_duplicate_detector.on_journal_analyzed(journal)
+        db.commit()
+
+
+def queue_journal_analysis(session_factory, journal_ids: List[int]) -> None:
+    """
+    Queue pending or provisional journal entries for analysis on the bounded analysis executor.
+    Each task covers up to ANALYSIS_BATCH_MAX_ENTRIES entries, analyzed in as few LLM calls as possible.
+    """
+    for start in range(0, len(journal_ids), ANALYSIS_BATCH_MAX_ENTRIES):
+        analysis_executor.submit(
+            analyze_pending_journals, session_factory, journal_ids[start:start + ANALYSIS_BATCH_MAX_ENTRIES]
+        )
+
+
+# Digests longer than this are cut; entries shorter than this are used verbatim
+DIGEST_MAX_TOKENS = 60
+# Upper bound on the rendered weekly analysis prompt, in estimated tokens
+WEEKLY_PROMPT_TOKEN_BUDGET = int(os.environ.get('WEEKLY_PROMPT_TOKEN_BUDGET', '8000'))
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text to about max_tokens estimated tokens at a word boundary
+    """
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(' ', 1)[0]
+    return cut.rstrip(' ,;:') + '...'
+
+
+def extract_digest(journal_content: str, max_tokens: int = DIGEST_MAX_TOKENS) -> str:
+    """
+    Local fallback digest: the leading sentences of the entry that fit max_tokens
+    """
+    content = ' '.join(journal_content.split())
+    digest = ''
+    for sentence in _SENTENCE_END.split(content):
+        candidate = f"{digest} {sentence}".strip()
+        if estimate_tokens(candidate) > max_tokens:
+            break
+        digest = candidate
+    return digest or truncate_to_tokens(content, max_tokens)
+
+
+def digest_from_analysis(analysis_result: Dict[str, Any]) -> Optional[str]:
+    """
+    The LLM digest of an analysis result, capped at DIGEST_MAX_TOKENS, or None if it has none
+    """
+    digest = analysis_result.get("digest")
+    if not isinstance(digest, str) or not digest.strip():
+        return None
+    return truncate_to_tokens(' '.join(digest.split()), DIGEST_MAX_TOKENS)
+
+
+def backfill_journal_digests(journals: List[Journal]) -> int:
+    """
+    Give long entries that have no digest yet (imported or analyzed before digests existed)
+    a local digest, so each entry is condensed at most once. The caller's next commit stores them;
+    returns the number of entries updated.
+    """
+    missing = [
+        journal for journal in journals
+        if journal.digest is None and estimate_tokens(journal.journal_content) > DIGEST_MAX_TOKENS
+    ]
+    for journal in missing:
+        journal.digest = extract_digest(journal.journal_content)
+    return len(missing)
+
+
+def fit_journals_to_token_budget(journals_data: List[Dict[str, Any]], token_budget: int) -> List[Dict[str, Any]]:
+    """
+    Shorten the journal_content of formatted entries so that their JSON fits token_budget.
+    
+    Scores and timings are always kept. The text budget left over is shared evenly,
+    with short entries passing their unused share on to longer ones; when nothing is
+    left the entries are sent without text.
+    """
+    text_tokens = [estimate_tokens(entry["journal_content"]) for entry in journals_data]
+    fixed_tokens = sum(
+        estimate_tokens(json.dumps({**entry, "journal_content": ""})) for entry in journals_data
+    )
+    remaining = token_budget - fixed_tokens
+    if sum(text_tokens) <= remaining:
+        return journals_data
+    
+    allowances = [0] * len(journals_data)
+    order = sorted(range(len(journals_data)), key=lambda index: text_tokens[index])
+    for position, index in enumerate(order):
+        share = max(remaining, 0) // (len(order) - position)
+        allowances[index] = min(text_tokens[index], share)
+        remaining -= allowances[index]
+    
+    return [
+        {**entry, "journal_content": truncate_to_tokens(entry["journal_content"], allowance) if allowance > 0 else ""}
+        for entry, allowance in zip(journals_data, allowances)
+    ]
 
 
 def format_journal_data_for_weekly_analysis(journals: List[Journal]) -> List[Dict[str, Any]]:
     """
-    Format journal data for the weekly analysis prompt
+    Format journal data for the weekly analysis prompt.
+    Entries are represented by their digest when they have one.
     """
     formatted_data = []
     
     for journal in journals:
         entry = {
-            "journal_content": journal.journal_content,
+            "journal_content": journal.digest or journal.journal_content,
             "emotion": {
                 "happiness": journal.happiness_score,
                 "sadness": journal.sadness_score,
@@ -99,57 +718,61 @@ def format_journal_data_for_weekly_analysis(journals: List[Journal]) -> List[Dic
     return formatted_data
 
 
-def generate_weekly_analysis(journals_data: List[Dict[str, Any]]) -> dict:
+def generate_weekly_analysis(journals_data: List[Dict[str, Any]], frame: EmotionFrame, timeout: Optional[float] = None) -> dict:
     """
-    Generate weekly analysis based on journal data from the past 7 days
+    Generate weekly analysis based on journal data from the past 7 days.
+    frame holds the same entries' scores and is returned as raw_data for visualization.
+    timeout is the caller's overall budget in seconds for the LLM calls, fallbacks included.
     """
+    deadline = None if timeout is None else time.monotonic() + timeout
     if not journals_data:
         return {"error": "No journal entries found for the past week"}
     
-    env = Environment(loader=FileSystemLoader("./routers"))
-    template = env.get_template('weekly_analyze.j2')
+    template = prompt_env.get_template('weekly_analyze.j2')
+    
+    # Whatever the template itself costs comes out of the budget first
+    with time_stage("prompt_budget"):
+        journals_data = fit_journals_to_token_budget(
+            journals_data,
+            WEEKLY_PROMPT_TOKEN_BUDGET - estimate_tokens(template.render({"journals_data": ""}))
+        )
     
     variables = {"journals_data": json.dumps(journals_data)}
     input_prompt = template.render(variables)
     
-    response = generate_struct_model_response(input_prompt)
+    response = generate_struct_model_response(input_prompt, task="weekly_analysis", deadline=deadline)
     
-    # Calculate cumulative scores for visualization
-    response["raw_data"] = calculate_cumulative_scores(journals_data)
+    response["raw_data"] = frame.to_raw_data()
     
     return response
 
 
-def calculate_cumulative_scores(journals_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+# Chart name -> renderer taking an EmotionFrame and returning a base64 PNG, in display order
+CHART_REGISTRY: Dict[str, Callable[[EmotionFrame], str]] = {}
+
+
+def register_chart(name: str):
     """
-    Calculate cumulative scores from journal data for visualization
+    Decorator adding a chart renderer to CHART_REGISTRY, which makes it available to every chart endpoint
     """
-    dates = []
-    emotions = {
-        "happiness": [], "sadness": [], "fear": [], "anger": [], 
-        "surprise": [], "joy": [], "love": [], "disgust": [], 
-        "relief": [], "gratitude": [], "confusion": []
-    }
-    sentiments = {"positive": [], "negative": [], "neutral": []}
-    
-    for entry in journals_data:
-        # Extract date (just the date part)
-        date_obj = datetime.strptime(entry["journal_timing"], "%Y-%m-%d %H:%M:%S")
-        dates.append(date_obj.strftime("%Y-%m-%d"))
-        
-        # Extract emotion scores
-        for emotion in emotions.keys():
-            emotions[emotion].append(entry["emotion"][emotion])
-        
-        # Extract sentiment scores
-        for sentiment in sentiments.keys():
-            sentiments[sentiment].append(entry["sentiment"][sentiment])
-    
-    return {
-        "dates": dates,
-        "emotions": emotions,
-        "sentiments": sentiments
-    }
+    def decorator(generate_chart: Callable[[EmotionFrame], str]) -> Callable[[EmotionFrame], str]:
+        CHART_REGISTRY[name] = generate_chart
+        return generate_chart
+    return decorator
+
+
+def parse_chart_names(charts: Optional[str]) -> List[str]:
+    """
+    Registered chart names from a comma separated list, all charts if none is given.
+    Raises ValueError on unknown names.
+    """
+    if not charts:
+        return list(CHART_REGISTRY)
+    names = list(dict.fromkeys(name.strip() for name in charts.split(",") if name.strip()))
+    invalid = [name for name in names if name not in CHART_REGISTRY]
+    if invalid or not names:
+        raise ValueError(f"Invalid charts: {', '.join(invalid)}. Allowed: {', '.join(CHART_REGISTRY)}")
+    return names
 
 
 def save_and_encode_plot(fig, filename, format='png'):
@@ -174,22 +797,26 @@ def save_and_encode_plot(fig, filename, format='png'):
     buf.seek(0)
     
     # Encode to base64
-    img_str = base64.b64encode(buf.read()).decode('utf-8')
+    with time_stage("base64_encode"):
+        img_str = base64.b64encode(buf.read()).decode('utf-8')
     
     return img_str
 
 
-def generate_emotion_plot(data: Dict[str, Any]) -> str:
+@register_chart("emotion_line_plot")
+def generate_emotion_plot(frame: EmotionFrame) -> str:
     """
     Generate a line plot for emotion scores over time
     Returns base64 encoded image
     """
+    plt = get_pyplot()
     plt.figure(figsize=(12, 8))
-    dates = data["dates"]
+    dates = frame.days
     
     # Plot emotions with more than zero values
-    for emotion, values in data["emotions"].items():
-        if any(values):  # Only plot emotions that have non-zero values
+    for emotion in EMOTION_NAMES:
+        values = frame.column(emotion)
+        if values.any():  # Only plot emotions that have non-zero values
             plt.plot(dates, values, marker='o', label=emotion.capitalize())
     
     plt.title('Weekly Emotion Trends')
@@ -211,62 +838,39 @@ def generate_emotion_plot(data: Dict[str, Any]) -> str:
     return img_str
 
 
-def generate_emotion_grouped_plot(data: Dict[str, Any]) -> str:
+@register_chart("emotion_grouped_plot")
+def generate_emotion_grouped_plot(frame: EmotionFrame) -> str:
     """
     Generate a grouped plot with positive, negative and other emotions separated
     Returns base64 encoded image
     """
-    # Define emotion groups
-    positive_emotions = ["happiness", "joy", "love", "relief", "gratitude"]
-    negative_emotions = ["sadness", "fear", "anger", "disgust"]
-    other_emotions = ["surprise", "confusion"]
-    
-    dates = data["dates"]
+    plt = get_pyplot()
+    dates = frame.days
     
     # Create figure with subplots
     fig, axes = plt.subplots(3, 1, figsize=(12, 15), sharex=True)
     
-    # Plot positive emotions
-    for emotion in positive_emotions:
-        values = data["emotions"][emotion]
-        if any(values):  # Only plot emotions with non-zero values
-            axes[0].plot(dates, values, marker='o', label=emotion.capitalize())
-    
-    axes[0].set_title('Positive Emotions')
-    axes[0].set_ylabel('Score (0-10)')
-    axes[0].grid(True, linestyle='--', alpha=0.7)
-    axes[0].legend(loc='best')
-    axes[0].set_ylim(0, 10)
-    
-    # Plot negative emotions
-    for emotion in negative_emotions:
-        values = data["emotions"][emotion]
-        if any(values):  # Only plot emotions with non-zero values
-            axes[1].plot(dates, values, marker='o', label=emotion.capitalize())
-    
-    axes[1].set_title('Negative Emotions')
-    axes[1].set_ylabel('Score (0-10)')
-    axes[1].grid(True, linestyle='--', alpha=0.7)
-    axes[1].legend(loc='best')
-    axes[1].set_ylim(0, 10)
-    
-    # Plot other emotions
-    for emotion in other_emotions:
-        values = data["emotions"][emotion]
-        if any(values):  # Only plot emotions with non-zero values
-            axes[2].plot(dates, values, marker='o', label=emotion.capitalize())
-    
-    axes[2].set_title('Other Emotions')
-    axes[2].set_xlabel('Date')
-    axes[2].set_ylabel('Score (0-10)')
-    axes[2].grid(True, linestyle='--', alpha=0.7)
-    axes[2].legend(loc='best')
-    axes[2].set_ylim(0, 10)
-    
-    # Format x-axis for all subplots
-    for ax in axes:
+    emotion_groups = [
+        ('Positive Emotions', POSITIVE_EMOTIONS),
+        ('Negative Emotions', NEGATIVE_EMOTIONS),
+        ('Other Emotions', OTHER_EMOTIONS),
+    ]
+    for ax, (title, emotions) in zip(axes, emotion_groups):
+        for emotion in emotions:
+            values = frame.column(emotion)
+            if values.any():  # Only plot emotions with non-zero values
+                ax.plot(dates, values, marker='o', label=emotion.capitalize())
+        
+        ax.set_title(title)
+        ax.set_ylabel('Score (0-10)')
+        ax.grid(True, linestyle='--', alpha=0.7)
+        ax.legend(loc='best')
+        ax.set_ylim(0, 10)
+        # Format x-axis for all subplots
         ax.tick_params(axis='x', rotation=45)
     
+    axes[2].set_xlabel('Date')
+    
     plt.tight_layout()
     
     # Get timestamp for unique filename
@@ -280,23 +884,20 @@ def generate_emotion_grouped_plot(data: Dict[str, Any]) -> str:
     return img_str
 
 
-def generate_emotion_heatmap(data: Dict[str, Any]) -> str:
+@register_chart("emotion_heatmap")
+def generate_emotion_heatmap(frame: EmotionFrame) -> str:
     """
     Generate a heatmap of emotions over time
     Returns base64 encoded image
     """
-    # Prepare data for heatmap
-    dates = data["dates"]
-    emotions = []
-    emotion_values = []
-    
-    for emotion, values in data["emotions"].items():
-        if any(values):  # Only include emotions with non-zero values
-            emotions.append(emotion.capitalize())
-            emotion_values.append(values)
-    
-    # Create a matrix for the heatmap
-    heatmap_data = np.array(emotion_values)
+    import seaborn as sns
+    from matplotlib.colors import LinearSegmentedColormap
+    plt = get_pyplot()
+    # Only include emotions with non-zero values, one row per emotion
+    emotions = frame.emotions
+    present = emotions.any(axis=0)
+    heatmap_data = emotions[:, present].T
+    labels = [emotion.capitalize() for emotion, shown in zip(EMOTION_NAMES, present) if shown]
     
     # Create figure
     plt.figure(figsize=(12, 8))
@@ -306,7 +907,7 @@ def generate_emotion_heatmap(data: Dict[str, Any]) -> str:
     
     # Plot heatmap
     ax = sns.heatmap(heatmap_data, cmap=cmap, linewidths=0.5, 
-                     yticklabels=emotions, xticklabels=dates, 
+                     yticklabels=labels, xticklabels=frame.day_labels(), 
                      vmin=0, vmax=10, annot=True, fmt=".1f")
     
     plt.title('Emotion Intensity Heatmap')
@@ -326,30 +927,33 @@ def generate_emotion_heatmap(data: Dict[str, Any]) -> str:
     return img_str
 
 
-def generate_dominant_emotions_plot(data: Dict[str, Any]) -> str:
+@register_chart("dominant_emotions_plot")
+def generate_dominant_emotions_plot(frame: EmotionFrame) -> str:
     """
     Generate a plot showing only the top 3 emotions for each day
     Returns base64 encoded image
     """
-    dates = data["dates"]
-    emotions_data = data["emotions"]
+    np = get_numpy()
+    plt = get_pyplot()
+    dates = frame.days
+    emotions = frame.emotions
+    
+    # Top 3 emotions of every row at once; the remaining emotions are masked out
+    top = np.zeros(emotions.shape, dtype=bool)
+    top_indices = np.argsort(-emotions, axis=1, kind="stable")[:, :3]
+    np.put_along_axis(top, top_indices, True, axis=1)
+    top &= emotions > 0  # Only plot non-zero values
     
     # Create a figure
     plt.figure(figsize=(12, 8))
     
-    # Process each date
-    for i, date in enumerate(dates):
-        # Get emotions values for this date
-        day_emotions = {emotion: emotions_data[emotion][i] for emotion in emotions_data}
-        
-        # Sort emotions by value and get top 3
-        top_emotions = sorted(day_emotions.items(), key=lambda x: x[1], reverse=True)[:3]
-        
-        # Plot only the top 3 emotions for each day
-        for emotion, value in top_emotions:
-            if value > 0:  # Only plot non-zero values
-                plt.scatter(date, value, s=100, label=f"{date} - {emotion.capitalize()}")
-                plt.plot([date, date], [0, value], alpha=0.5, linestyle='--')
+    for index, emotion in enumerate(EMOTION_NAMES):
+        rows = top[:, index]
+        if not rows.any():
+            continue
+        values = emotions[rows, index]
+        points = plt.scatter(dates[rows], values, s=100, label=emotion.capitalize())
+        plt.vlines(dates[rows], 0, values, colors=points.get_facecolor(), alpha=0.5, linestyle='--')
     
     plt.title('Dominant Emotions Each Day')
     plt.xlabel('Date')
@@ -358,11 +962,7 @@ def generate_dominant_emotions_plot(data: Dict[str, Any]) -> str:
     plt.ylim(0, 10)
     plt.xticks(rotation=45)
     
-    # Create a custom legend that doesn't repeat
-    handles, labels = plt.gca().get_legend_handles_labels()
-    by_label = dict(zip(labels, handles))
-    plt.legend(by_label.values(), by_label.keys(), loc='upper right', 
-               bbox_to_anchor=(1.15, 1), title="Top Emotions")
+    plt.legend(loc='upper right', bbox_to_anchor=(1.15, 1), title="Top Emotions")
     
     plt.tight_layout()
     
@@ -377,28 +977,19 @@ def generate_dominant_emotions_plot(data: Dict[str, Any]) -> str:
     return img_str
 
 
-def generate_emotion_area_plot(data: Dict[str, Any]) -> str:
+@register_chart("emotion_balance_plot")
+def generate_emotion_area_plot(frame: EmotionFrame) -> str:
     """
     Generate a stacked area plot for emotion scores over time
     Returns base64 encoded image
     """
-    # Define emotion groups
-    positive_emotions = ["happiness", "joy", "love", "relief", "gratitude"]
-    negative_emotions = ["sadness", "fear", "anger", "disgust"]
-    
-    dates = data["dates"]
+    np = get_numpy()
+    plt = get_pyplot()
+    dates = frame.days
     
     # Calculate aggregated values for emotion groups
-    positive_values = np.zeros(len(dates))
-    negative_values = np.zeros(len(dates))
-    
-    for emotion in positive_emotions:
-        for i, val in enumerate(data["emotions"][emotion]):
-            positive_values[i] += val
-            
-    for emotion in negative_emotions:
-        for i, val in enumerate(data["emotions"][emotion]):
-            negative_values[i] += val
+    positive_values = frame.columns(POSITIVE_EMOTIONS).sum(axis=1)
+    negative_values = frame.columns(NEGATIVE_EMOTIONS).sum(axis=1)
     
     # Normalize values (optional)
     # This makes the graph show the relative proportion rather than absolute values
@@ -435,17 +1026,19 @@ def generate_emotion_area_plot(data: Dict[str, Any]) -> str:
     return img_str
 
 
-def generate_sentiment_plot(data: Dict[str, Any]) -> str:
+@register_chart("sentiment_line_plot")
+def generate_sentiment_plot(frame: EmotionFrame) -> str:
     """
     Generate a line plot for sentiment scores over time
     Returns base64 encoded image
     """
+    plt = get_pyplot()
     plt.figure(figsize=(10, 6))
-    dates = data["dates"]
+    dates = frame.days
     
     # Plot sentiments
-    for sentiment, values in data["sentiments"].items():
-        plt.plot(dates, values, marker='o', linewidth=2, label=sentiment.capitalize())
+    for sentiment in SENTIMENT_NAMES:
+        plt.plot(dates, frame.column(sentiment), marker='o', linewidth=2, label=sentiment.capitalize())
     
     plt.title('Weekly Sentiment Analysis')
     plt.xlabel('Date')
@@ -466,33 +1059,29 @@ def generate_sentiment_plot(data: Dict[str, Any]) -> str:
     return img_str
 
 
-def generate_emotion_radar_chart(data: Dict[str, Any]) -> str:
+@register_chart("emotion_radar_chart")
+def generate_emotion_radar_chart(frame: EmotionFrame) -> str:
     """
     Generate a radar chart for average emotion scores
     Returns base64 encoded image
     """
-    # Calculate averages for each emotion
-    emotion_avgs = {}
-    for emotion, values in data["emotions"].items():
-        if values:  # Check if the list is not empty
-            emotion_avgs[emotion] = sum(values) / len(values)
-        else:
-            emotion_avgs[emotion] = 0
-    
-    # Prepare data for radar chart
-    emotions = list(emotion_avgs.keys())
-    values = list(emotion_avgs.values())
+    np = get_numpy()
+    plt = get_pyplot()
+    # Average each emotion over the entries behind the rows
+    if len(frame):
+        emotion_avgs = np.average(frame.emotions, axis=0, weights=frame.counts)
+    else:
+        emotion_avgs = np.zeros(len(EMOTION_NAMES))
     
     # Number of variables
-    N = len(emotions)
+    N = len(EMOTION_NAMES)
     
     # Repeat the first value to close the circular graph
-    values += values[:1]
-    emotions += emotions[:1]
+    values = np.append(emotion_avgs, emotion_avgs[:1])
     
     # Calculate angle for each emotion
-    angles = [n / float(N) * 2 * np.pi for n in range(N)]
-    angles += angles[:1]  # Close the loop
+    angles = np.linspace(0, 2 * np.pi, N, endpoint=False)
+    angles = np.append(angles, angles[:1])  # Close the loop
     
     # Create the plot
     fig, ax = plt.subplots(figsize=(10, 10), subplot_kw=dict(polar=True))
@@ -502,7 +1091,7 @@ def generate_emotion_radar_chart(data: Dict[str, Any]) -> str:
     ax.fill(angles, values, alpha=0.25)
     
     # Set labels
-    plt.xticks(angles[:-1], [e.capitalize() for e in emotions[:-1]], size=12)
+    plt.xticks(angles[:-1], [e.capitalize() for e in EMOTION_NAMES], size=12)
     
     # Draw y-axis labels (0-10)
     ax.set_rlabel_position(0)
@@ -522,16 +1111,19 @@ def generate_emotion_radar_chart(data: Dict[str, Any]) -> str:
     return img_str
 
 
-def generate_visualizations(data: Dict[str, Any]) -> Dict[str, str]:
+_chart_lock = threading.Lock()
+
+
+def generate_visualizations(frame: EmotionFrame, chart_names: Optional[Sequence[str]] = None) -> Dict[str, str]:
     """
-    Generate all visualizations for weekly analysis
+    Render the named charts (all registered charts by default) for weekly analysis
     """
-    return {
-        "emotion_line_plot": generate_emotion_plot(data),
-        "emotion_grouped_plot": generate_emotion_grouped_plot(data),
-        "emotion_heatmap": generate_emotion_heatmap(data),
-        "dominant_emotions_plot": generate_dominant_emotions_plot(data),
-        "emotion_balance_plot": generate_emotion_area_plot(data),
-        "sentiment_line_plot": generate_sentiment_plot(data),
-        "emotion_radar_chart": generate_emotion_radar_chart(data)
-    }
\ No newline at end of file
+    chart_names = list(CHART_REGISTRY) if chart_names is None else chart_names
+    
+    visualizations = {}
+    # pyplot keeps global figure state, so only one thread renders at a time
+    with _chart_lock:
+        for chart_name in chart_names:
+            with time_stage("chart_render", chart_name):
+                visualizations[chart_name] = CHART_REGISTRY[chart_name](frame)
+    return visualizations
\ No newline at end of file
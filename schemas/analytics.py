@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+from datetime import date, datetime
 
 
 class EmotionScores(BaseModel):
@@ -80,3 +81,71 @@ class CombinedWeeklyReport(BaseModel):
     analysis: WeeklyAnalysisResponse
     visualizations: Visualizations
 
+
+class WeeklyReportSummary(BaseModel):
+    id: int
+    from_date: date
+    to_date: date
+    created_at: datetime
+
+
+class WeeklyReportPage(BaseModel):
+    reports: List[WeeklyReportSummary]
+    next_cursor: Optional[str] = None
+
+
+class WeeklyReportDetail(WeeklyReportSummary):
+    analysis: Optional[Dict[str, Any]] = None
+    visualizations: Optional[Dict[str, str]] = None
+
+
+class FastWeeklyEmotionAnalysis(BaseModel):
+    dominant_emotions: List[str]
+    highest_positive_day: DominantDay
+    highest_negative_day: DominantDay
+
+
+class FastWeeklySentimentAnalysis(BaseModel):
+    overall_sentiment: str
+    significant_shifts: List[str]
+
+
+class DailyScores(BaseModel):
+    day: str
+    entries: int
+    averages: Dict[str, float]
+    rolling_averages: Dict[str, float]
+
+
+class ScoreShift(BaseModel):
+    from_day: str
+    to_day: str
+    score: str
+    change: float
+
+
+class ScoreAnomaly(BaseModel):
+    journal_id: int
+    journal_timing: str
+    score: str
+    value: int
+    z_score: float
+
+
+class FastWeeklyAnalysisResponse(BaseModel):
+    mode: str = "fast"
+    fallback_reason: Optional[str] = None
+    weekly_emotion_analysis: FastWeeklyEmotionAnalysis
+    weekly_sentiment_analysis: FastWeeklySentimentAnalysis
+    cumulative_scores: CumulativeScores
+    daily_scores: List[DailyScores]
+    shifts: List[ScoreShift]
+    anomalies: List[ScoreAnomaly]
+
+
+class ScoreSeries(BaseModel):
+    bucket: str
+    dates: List[str]
+    entries: List[int]
+    emotions: Dict[str, List[float]]
+    sentiments: Dict[str, List[float]]
@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from typing import List, Dict, Optional
+from datetime import datetime
+
+
+class SimilarJournalsRequest(BaseModel):
+    journal_id: Optional[int] = Field(None, description="Find entries similar to this journal entry")
+    scores: Optional[Dict[str, float]] = Field(None, description="Or to these sentiment/emotion scores (0-10)")
+    k: int = Field(5, ge=1, le=50)
+
+
+class SimilarJournal(BaseModel):
+    id: int
+    created_at: datetime
+    distance: float
+    journal_content: str
+
+
+class SimilarJournalsResponse(BaseModel):
+    results: List[SimilarJournal]
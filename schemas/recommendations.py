@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+from db.db_enum import RecommendationType
+
+
+class RecommendationCreate(BaseModel):
+    title: str
+    ref_url: str
+    recommendation_type: RecommendationType
+    description: Optional[str] = None
+    # Target sentiment/emotion scores (0-10), e.g. {"sadness": 8, "joy": 2}
+    emotion_profile: Optional[Dict[str, float]] = None
+
+
+class RecommendationOut(BaseModel):
+    id: int
+    title: str
+    ref_url: str
+    recommendation_type: RecommendationType
+    description: Optional[str] = None
+
+
+class ScoredRecommendation(RecommendationOut):
+    score: float = Field(description="Cosine similarity between the user's scores and the item's emotion profile")
+
+
+class RecommendationList(BaseModel):
+    source: str
+    recommendations: List[ScoredRecommendation]
+
+
+class CataloguePage(BaseModel):
+    version: int
+    recommendation_type: Optional[RecommendationType] = None
+    page: int
+    page_size: int
+    total: int
+    items: List[RecommendationOut]
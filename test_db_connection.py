@@ -7,7 +7,7 @@ for manual testing. It performs the following:
 
 1. Connects to the PostgreSQL database using SQLAlchemy
 2. Executes a simple query to verify connectivity
-3. Creates all database tables defined in the models
+3. Applies the Alembic schema migrations
 4. Seeds the database with initial reference data
 
 Usage:
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.database import Base
+from db import models
+from db.db_enum import RecommendationType, UserRole
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Sessions on a fresh SQLite database with the full schema, one user and the seeded lookup rows"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with factory() as db:
+        db.add(models.Role(id=1, role_type=UserRole.STUDENT))
+        db.add(models.User(id=1, name="user", email="user@example.com", password="x", role_id=1))
+        db.add_all([models.RecommendationTypeModel(recommendation_type=recco_type) for recco_type in RecommendationType])
+        db.add(models.CatalogueVersion(id=1, version=1))
+        db.commit()
+    yield factory
+    engine.dispose()
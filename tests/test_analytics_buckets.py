@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+
+import pytest
+
+from routers.utils import ANALYTICS_MAX_POINTS, choose_analytics_bucket
+
+START = date(2026, 1, 1)
+
+
+def days_later(days: int) -> date:
+    return START + timedelta(days=days - 1)
+
+
+def test_auto_picks_finest_bucket_within_limit():
+    assert choose_analytics_bucket(START, days_later(ANALYTICS_MAX_POINTS)) == "day"
+    assert choose_analytics_bucket(START, days_later(ANALYTICS_MAX_POINTS + 1)) == "week"
+    assert choose_analytics_bucket(START, days_later(7 * ANALYTICS_MAX_POINTS + 1)) == "month"
+
+
+def test_explicit_bucket_is_kept():
+    assert choose_analytics_bucket(START, days_later(10), "month") == "month"
+
+
+def test_unknown_bucket_is_rejected():
+    with pytest.raises(ValueError, match="Unknown bucket"):
+        choose_analytics_bucket(START, days_later(10), "year")
+
+
+def test_too_many_points_for_explicit_bucket():
+    with pytest.raises(ValueError, match="use a wider bucket"):
+        choose_analytics_bucket(START, days_later(ANALYTICS_MAX_POINTS + 1), "day")
+
+
+@pytest.mark.parametrize("bucket", [None, "month"])
+def test_range_too_long_for_widest_bucket(bucket):
+    with pytest.raises(ValueError, match="use a shorter range"):
+        choose_analytics_bucket(START, days_later(28 * ANALYTICS_MAX_POINTS + 1), bucket)
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+
+from db.db_enum import AnalysisStatus
+from db.models import Journal
+from routers import utils
+from routers.emotion_frame import EMOTION_NAMES, SENTIMENT_NAMES
+
+
+def analysis(score: float):
+    return {
+        "sentiment": {name: score for name in SENTIMENT_NAMES},
+        "emotion": {name: score for name in EMOTION_NAMES},
+        "digest": "digest",
+    }
+
+
+def add_journals(session_factory, *contents, status=AnalysisStatus.PENDING):
+    with session_factory() as db:
+        journals = [
+            Journal(journal_content=content, user_id=1, analysis_status=status, created_at=datetime.utcnow())
+            for content in contents
+        ]
+        db.add_all(journals)
+        db.commit()
+        return [journal.id for journal in journals]
+
+
+def statuses(session_factory):
+    with session_factory() as db:
+        return dict(db.query(Journal.id, Journal.analysis_status).all())
+
+
+class FakeAnalysis:
+    """Stands in for analyze_journals_in_batches; results(entries) decides what the LLM returns"""
+
+    def __init__(self):
+        self.calls = []
+        self.results = lambda entries: {entry["id"]: analysis(0.5) for entry in entries}
+
+    def __call__(self, entries):
+        self.calls.append(entries)
+        return self.results(entries)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fake = FakeAnalysis()
+    monkeypatch.setattr(utils, "analyze_journals_in_batches", fake)
+    return fake
+
+
+def test_no_connection_is_held_during_the_llm_call(session_factory, llm):
+    ids = add_journals(session_factory, "a calm walk by the river", "a stressful deadline at work")
+    pool = session_factory.kw["bind"].pool
+
+    def results(entries):
+        assert pool.checkedout() == 0
+        return {entry["id"]: analysis(0.5) for entry in entries}
+
+    llm.results = results
+    utils.analyze_pending_journals(session_factory, ids)
+
+    assert len(llm.calls) == 1
+    assert set(statuses(session_factory).values()) == {AnalysisStatus.COMPLETED}
+
+
+def test_unanalyzed_pending_entries_fail_and_provisional_ones_keep_their_scores(session_factory, llm):
+    pending = add_journals(session_factory, "a calm walk by the river")
+    provisional = add_journals(session_factory, "a stressful deadline at work", status=AnalysisStatus.PROVISIONAL)
+    llm.results = lambda entries: {}
+
+    utils.analyze_pending_journals(session_factory, pending + provisional)
+
+    assert statuses(session_factory) == {pending[0]: AnalysisStatus.FAILED, provisional[0]: AnalysisStatus.PROVISIONAL}
+
+
+def test_entries_changed_during_the_llm_call_are_not_overwritten(session_factory, llm):
+    ids = add_journals(session_factory, "a calm walk by the river")
+
+    def results(entries):
+        with session_factory() as db:
+            db.get(Journal, ids[0]).analysis_status = AnalysisStatus.FAILED
+            db.commit()
+        return {entry["id"]: analysis(0.5) for entry in entries}
+
+    llm.results = results
+    utils.analyze_pending_journals(session_factory, ids)
+
+    assert statuses(session_factory) == {ids[0]: AnalysisStatus.FAILED}
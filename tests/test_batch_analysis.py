@@ -0,0 +1,98 @@
+import pytest
+
+from routers import utils
+from routers.emotion_frame import EMOTION_NAMES, SENTIMENT_NAMES
+from routers.utils import (
+    ANALYSIS_BATCH_PROMPT_TOKENS,
+    ANALYSIS_RESULT_TOKENS,
+    analyze_journals_in_batches,
+    estimate_tokens,
+    generate_analyze_journal_batch,
+    plan_analysis_batches,
+)
+
+
+def scores(value=5):
+    return {
+        "sentiment": {name: value for name in SENTIMENT_NAMES},
+        "emotion": {name: value for name in EMOTION_NAMES},
+    }
+
+
+def entries(count, content="a short entry"):
+    return [{"id": i, "journal_content": content} for i in range(1, count + 1)]
+
+
+def test_batches_respect_max_entries():
+    batches = plan_analysis_batches(entries(30), token_budget=100_000, max_entries=25)
+    assert [len(batch) for batch in batches] == [25, 5]
+
+
+def test_batches_respect_token_budget():
+    entry_tokens = estimate_tokens("a short entry") + ANALYSIS_RESULT_TOKENS
+    budget = ANALYSIS_BATCH_PROMPT_TOKENS + 3 * entry_tokens
+    batches = plan_analysis_batches(entries(7), token_budget=budget, max_entries=25)
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+
+
+def test_oversized_entry_gets_a_batch_of_its_own():
+    batch_entries = entries(3)
+    batch_entries[1]["journal_content"] = "x" * 40_000
+    batches = plan_analysis_batches(batch_entries, token_budget=2_000)
+    assert [[entry["id"] for entry in batch] for batch in batches] == [[1], [2], [3]]
+
+
+def test_batch_response_keeps_only_valid_known_entries(monkeypatch):
+    response = {"results": [
+        {"id": 1, **scores(), "digest": "short"},
+        {"id": "2", **scores()},
+        {"id": 3, **scores(11)},
+        {"id": 99, **scores()},
+        {"id": None, **scores()},
+        "not an object",
+    ]}
+    monkeypatch.setattr(utils, "generate_struct_model_response", lambda prompt, task=None: response)
+
+    results = generate_analyze_journal_batch(entries(3))
+
+    assert sorted(results) == [1, 2]
+    assert results[1]["digest"] == "short"
+    assert results[2]["journal_content"] == "a short entry"
+
+
+def test_batch_response_without_results_is_empty(monkeypatch):
+    monkeypatch.setattr(utils, "generate_struct_model_response", lambda prompt, task=None: ["unexpected"])
+    assert generate_analyze_journal_batch(entries(2)) == {}
+
+
+@pytest.fixture
+def individual_calls(monkeypatch):
+    calls = []
+
+    def analyze(journal_content):
+        calls.append(journal_content)
+        return {**scores(), "journal_content": journal_content}
+
+    monkeypatch.setattr(utils, "generate_analyze_journal", analyze)
+    return calls
+
+
+def test_missing_entries_are_retried_individually(monkeypatch, individual_calls):
+    monkeypatch.setattr(utils, "generate_analyze_journal_batch", lambda batch: {1: {**scores(), "journal_content": "a"}})
+
+    results = analyze_journals_in_batches(entries(3))
+
+    assert len(individual_calls) == 2
+    assert all(results[entry_id] is not None for entry_id in (1, 2, 3))
+
+
+def test_failed_batch_call_is_not_retried_per_entry(monkeypatch, individual_calls):
+    def fail(batch):
+        raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(utils, "generate_analyze_journal_batch", fail)
+
+    results = analyze_journals_in_batches(entries(30))
+
+    assert individual_calls == []
+    assert results == {entry_id: None for entry_id in range(1, 31)}
@@ -0,0 +1,67 @@
+import csv
+import json
+
+import pytest
+
+from db.models import Recommendation
+from routers.catalogue import bulk_load_catalogue, get_catalogue_version, parse_catalogue_upload
+from routers.emotion_frame import SCORE_NAMES
+
+CSV_UPLOAD = (
+    "title,ref_url,recommendation_type,description,emotion_profile\n"
+    'Calm playlist,https://example.com/calm,music,,"{""relief"": 8}"\n'
+    "Soup,https://example.com/soup,food,Warm soup,\n"
+    'Bad type,https://example.com/bad,painting,,\n'
+    'Bad profile,https://example.com/profile,music,,"{""boredom"": 3}"\n'
+)
+
+
+def ndjson(*records):
+    return "\n".join(record if isinstance(record, str) else json.dumps(record) for record in records)
+
+
+def test_csv_records_are_numbered_by_file_line():
+    records = list(parse_catalogue_upload(CSV_UPLOAD, "csv"))
+    assert [line for line, _ in records] == [2, 3, 4, 5]
+    assert records[0][1]["title"] == "Calm playlist"
+
+
+def test_ndjson_skips_blank_lines_but_keeps_numbering():
+    upload = ndjson({"title": "a"}, "", {"title": "b"})
+    assert [line for line, _ in parse_catalogue_upload(upload, "ndjson")] == [1, 3]
+
+
+def test_malformed_csv_raises_csv_error():
+    oversized_field = "x" * (csv.field_size_limit() + 1)
+    with pytest.raises(csv.Error):
+        list(parse_catalogue_upload(f"title,ref_url\n{oversized_field},x\n", "csv"))
+
+
+def test_bulk_load_inserts_valid_rows_and_reports_bad_lines(session_factory):
+    with session_factory() as db:
+        result = bulk_load_catalogue(db, parse_catalogue_upload(CSV_UPLOAD, "csv"), SCORE_NAMES)
+
+        assert result["inserted"] == 2
+        assert [error["line"] for error in result["errors"]] == [4, 5]
+        assert "boredom" in result["errors"][1]["error"]
+        rows = dict(db.query(Recommendation.title, Recommendation.emotion_profile).all())
+        assert rows == {"Calm playlist": {"relief": 8}, "Soup": None}
+        assert get_catalogue_version(db) == 2
+
+
+def test_bulk_load_of_ndjson_with_bad_json(session_factory):
+    upload = ndjson(
+        {"title": "Run", "ref_url": "https://example.com/run", "recommendation_type": "exercise"},
+        "{not json",
+    )
+    with session_factory() as db:
+        result = bulk_load_catalogue(db, parse_catalogue_upload(upload, "ndjson"), SCORE_NAMES)
+    assert result["inserted"] == 1
+    assert result["errors"][0]["line"] == 2
+
+
+def test_bulk_load_without_valid_rows_keeps_the_version(session_factory):
+    with session_factory() as db:
+        result = bulk_load_catalogue(db, parse_catalogue_upload("{}", "ndjson"), SCORE_NAMES)
+        assert result["inserted"] == 0
+        assert get_catalogue_version(db) == 1
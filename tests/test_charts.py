@@ -0,0 +1,32 @@
+import base64
+
+import pytest
+
+from routers.emotion_frame import SCORE_NAMES, EmotionFrame
+from routers.utils import CHART_REGISTRY, generate_visualizations, parse_chart_names
+
+
+def test_all_charts_by_default():
+    assert parse_chart_names(None) == list(CHART_REGISTRY)
+    assert parse_chart_names("") == list(CHART_REGISTRY)
+
+
+def test_named_charts_are_deduplicated_in_order():
+    first, second = list(CHART_REGISTRY)[:2]
+    assert parse_chart_names(f" {second}, {first},{second} ") == [second, first]
+
+
+@pytest.mark.parametrize("charts", ["no_such_chart", ",", "emotion_radar_chart,no_such_chart"])
+def test_unknown_chart_names_are_rejected(charts):
+    with pytest.raises(ValueError, match="Invalid charts"):
+        parse_chart_names(charts)
+
+
+def test_generate_visualizations_renders_only_the_named_charts():
+    frame = EmotionFrame(["2026-01-01", "2026-01-02"], [[3] * len(SCORE_NAMES), [6] * len(SCORE_NAMES)])
+    chart_name = list(CHART_REGISTRY)[0]
+
+    visualizations = generate_visualizations(frame, [chart_name])
+
+    assert list(visualizations) == [chart_name]
+    assert base64.b64decode(visualizations[chart_name]).startswith(b"\x89PNG")
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import pytest
+
+from routers.emotion_frame import SCORE_NAMES, EmotionFrame
+
+
+def row(journal_id, day, hour, **scores):
+    return (journal_id, datetime(2026, 1, day, hour), *[scores.get(name) for name in SCORE_NAMES])
+
+
+@pytest.fixture
+def frame():
+    return EmotionFrame.from_rows([
+        row(1, 1, 9, happiness=2, positive=4),
+        row(2, 1, 21, happiness=6, positive=8),
+        row(3, 3, 12, happiness=9),
+    ])
+
+
+def test_from_rows_fills_missing_scores_with_zero(frame):
+    assert frame.scores.shape == (3, len(SCORE_NAMES))
+    assert list(frame.column("fear")) == [0, 0, 0]
+    assert list(frame.ids) == [1, 2, 3]
+
+
+def test_daily_averages_each_calendar_day(frame):
+    daily = frame.daily()
+    assert daily.day_labels() == ["2026-01-01", "2026-01-03"]
+    assert list(daily.counts) == [2, 1]
+    assert list(daily.column("happiness")) == [4, 9]
+    assert list(daily.column("positive")) == [6, 0]
+
+
+def test_daily_weights_by_entry_count():
+    # Re-aggregating daily rows must weight each day by its entries, not count it once
+    merged = EmotionFrame(["2026-01-01", "2026-01-01"], [[1] * len(SCORE_NAMES), [4] * len(SCORE_NAMES)], counts=[1, 2])
+    assert list(merged.daily().column("happiness")) == [3]
+
+
+def test_daily_of_an_empty_frame():
+    daily = EmotionFrame([], []).daily()
+    assert len(daily) == 0
+
+
+def test_fingerprint_depends_on_the_data(frame):
+    same = EmotionFrame.from_rows([
+        row(1, 1, 9, happiness=2, positive=4),
+        row(2, 1, 21, happiness=6, positive=8),
+        row(3, 3, 12, happiness=9),
+    ])
+    assert frame.fingerprint() == same.fingerprint()
+    assert frame.fingerprint() != frame.daily().fingerprint()
+
+
+def test_raw_data_round_trip_keeps_unrounded_scores():
+    frame = EmotionFrame(["2026-01-01", "2026-01-02"], [[1 / 3] * len(SCORE_NAMES), [2 / 3] * len(SCORE_NAMES)], counts=[3, 1])
+
+    rebuilt = EmotionFrame.from_raw_data(frame.to_raw_data(decimals=None))
+
+    assert rebuilt.fingerprint() == frame.fingerprint()
+
+
+def test_raw_data_is_rounded_by_default():
+    frame = EmotionFrame(["2026-01-01"], [[1 / 3] * len(SCORE_NAMES)])
+    raw_data = frame.to_raw_data()
+    assert raw_data["emotions"]["happiness"] == [0.33]
+    assert raw_data["entries"] == [1]
+    assert raw_data["dates"] == ["2026-01-01"]
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+
+from routers.emotion_frame import SCORE_NAMES, EmotionFrame
+from routers.fast_analytics import compute_fast_weekly_analysis
+from schemas.analytics import FastWeeklyAnalysisResponse
+
+
+def row(journal_id, day, hour, **scores):
+    return (journal_id, datetime(2026, 1, day, hour), *[scores.get(name, 0) for name in SCORE_NAMES])
+
+
+@pytest.fixture
+def analysis():
+    frame = EmotionFrame.from_rows([
+        row(1, 1, 9, happiness=2, positive=2, neutral=5),
+        row(2, 2, 9, happiness=4, positive=4, neutral=5),
+        row(3, 2, 18, happiness=6, positive=6, neutral=5),
+        row(4, 3, 9, happiness=2, positive=2, neutral=5),
+        row(5, 4, 9, happiness=2, positive=1, neutral=5),
+        row(6, 5, 9, happiness=2, sadness=9, negative=9, neutral=5),
+    ])
+    return compute_fast_weekly_analysis(frame)
+
+
+def daily(analysis, day):
+    return next(entry for entry in analysis["daily_scores"] if entry["day"] == day)
+
+
+def test_matches_the_response_schema(analysis):
+    FastWeeklyAnalysisResponse(**analysis)
+
+
+def test_daily_and_rolling_averages(analysis):
+    assert [entry["entries"] for entry in analysis["daily_scores"]] == [1, 2, 1, 1, 1]
+    assert daily(analysis, "2026-01-02")["averages"]["happiness"] == 5
+    # Rolling over the last 3 days with entries: (2 + 5 + 2) / 3
+    assert daily(analysis, "2026-01-03")["rolling_averages"]["happiness"] == 3
+
+
+def test_cumulative_scores_and_dominant_emotions(analysis):
+    assert analysis["cumulative_scores"]["emotion"]["happiness"] == 18
+    assert analysis["weekly_emotion_analysis"]["dominant_emotions"] == ["happiness", "sadness"]
+    assert analysis["weekly_emotion_analysis"]["highest_positive_day"]["day"] == "2026-01-02"
+    assert analysis["weekly_emotion_analysis"]["highest_negative_day"] == {"day": "2026-01-05", "emotions": ["sadness", "happiness"]}
+
+
+def test_shifts_between_days(analysis):
+    shifts = {(shift["to_day"], shift["score"]): shift["change"] for shift in analysis["shifts"]}
+    assert shifts[("2026-01-02", "happiness")] == 3
+    assert shifts[("2026-01-05", "negative")] == 9
+    assert ("2026-01-04", "happiness") not in shifts
+    assert analysis["weekly_sentiment_analysis"]["significant_shifts"] == ["2026-01-02", "2026-01-03", "2026-01-05"]
+
+
+def test_anomalies_are_outlying_entries(analysis):
+    anomalies = {(anomaly["journal_id"], anomaly["score"]) for anomaly in analysis["anomalies"]}
+    assert (6, "sadness") in anomalies
+    assert (6, "negative") in anomalies
+    # Constant columns have no anomalies
+    assert not any(score == "neutral" for _, score in anomalies)
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from db.db_enum import AnalysisStatus
+from db.models import IdempotencyKey, Journal
+from utils import idempotency
+from utils.idempotency import fingerprint_request, run_idempotent
+
+ENDPOINT = "create_journal"
+
+
+def run(session_factory, key, request_hash, handler):
+    async def main():
+        with session_factory() as db:
+            return await run_idempotent(db, 1, ENDPOINT, key, request_hash, handler)
+    return asyncio.run(main())
+
+
+def journal_handler(calls):
+    async def handler(db):
+        calls.append(1)
+        journal = Journal(journal_content="entry", user_id=1, analysis_status=AnalysisStatus.PENDING)
+        db.add(journal)
+        db.flush()
+        return 201, {"id": journal.id}
+    return handler
+
+
+def stored_key(session_factory, key):
+    with session_factory() as db:
+        return db.query(IdempotencyKey).filter_by(key=key).first()
+
+
+def test_repeat_replays_stored_response(session_factory):
+    calls = []
+    request_hash = fingerprint_request("entry")
+
+    first = run(session_factory, "k1", request_hash, journal_handler(calls))
+    second = run(session_factory, "k1", request_hash, journal_handler(calls))
+
+    assert len(calls) == 1
+    assert first.status_code == second.status_code == 201
+    assert json.loads(second.body) == json.loads(first.body)
+    assert second.headers["Idempotent-Replayed"] == "true"
+    with session_factory() as db:
+        assert db.query(Journal).count() == 1
+
+
+def test_key_reused_for_different_request_is_rejected(session_factory):
+    run(session_factory, "k1", fingerprint_request("entry"), journal_handler([]))
+
+    with pytest.raises(HTTPException) as error:
+        run(session_factory, "k1", fingerprint_request("other entry"), journal_handler([]))
+    assert error.value.status_code == 422
+
+
+def test_in_progress_key_times_out_with_409(session_factory, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT_SECONDS", 0.2)
+    request_hash = fingerprint_request("entry")
+    with session_factory() as db:
+        now = datetime.utcnow()
+        db.add(IdempotencyKey(key="k1", user_id=1, endpoint=ENDPOINT, request_hash=request_hash,
+                              created_at=now, expires_at=now + timedelta(hours=1)))
+        db.commit()
+
+    calls = []
+    with pytest.raises(HTTPException) as error:
+        run(session_factory, "k1", request_hash, journal_handler(calls))
+    assert error.value.status_code == 409
+    assert calls == []
+
+
+def test_expired_lease_is_reclaimed(session_factory):
+    request_hash = fingerprint_request("entry")
+    with session_factory() as db:
+        claimed_at = datetime.utcnow() - timedelta(seconds=idempotency.IDEMPOTENCY_LEASE_SECONDS + 1)
+        db.add(IdempotencyKey(key="k1", user_id=1, endpoint=ENDPOINT, request_hash=request_hash,
+                              created_at=claimed_at, expires_at=claimed_at + timedelta(hours=1)))
+        db.commit()
+
+    calls = []
+    response = run(session_factory, "k1", request_hash, journal_handler(calls))
+    assert calls == [1]
+    assert response.status_code == 201
+    assert stored_key(session_factory, "k1").status_code == 201
+
+
+def test_handler_error_releases_key_and_discards_writes(session_factory):
+    async def fail(db):
+        db.add(Journal(journal_content="entry", user_id=1, analysis_status=AnalysisStatus.PENDING))
+        db.flush()
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        run(session_factory, "k1", fingerprint_request("entry"), fail)
+
+    assert stored_key(session_factory, "k1") is None
+    with session_factory() as db:
+        assert db.query(Journal).count() == 0
+
+
+def test_overlong_key_is_rejected(session_factory):
+    with pytest.raises(HTTPException) as error:
+        run(session_factory, "k" * (idempotency.IDEMPOTENCY_KEY_MAX_LENGTH + 1), "hash", journal_handler([]))
+    assert error.value.status_code == 400
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+import pytest
+
+from routers.utils import parse_import_line
+
+
+def test_parses_content_and_timestamp():
+    entry = parse_import_line('{"journal_content": "A good day", "created_at": "2026-03-01T08:30:00"}')
+    assert entry == {"journal_content": "A good day", "created_at": datetime(2026, 3, 1, 8, 30)}
+
+
+def test_missing_timestamp_defaults_to_now():
+    before = datetime.utcnow()
+    entry = parse_import_line('{"journal_content": "A good day"}')
+    assert before <= entry["created_at"] <= datetime.utcnow()
+
+
+@pytest.mark.parametrize("line", [
+    'not json',
+    '["journal_content"]',
+    '{"journal_content": ""}',
+    '{"journal_content": "   "}',
+    '{"journal_content": 5}',
+    '{"journal_content": "A good day", "created_at": 1700000000}',
+    '{"journal_content": "A good day", "created_at": "yesterday"}',
+])
+def test_invalid_lines_raise_value_error(line):
+    with pytest.raises(ValueError):
+        parse_import_line(line)
+
+
+@pytest.mark.parametrize("created_at", ["2026-01-01T10:00:00+05:00", "2026-01-01T05:00:00Z", "2026-01-01T05:00:00+00:00"])
+def test_timestamps_with_offset_are_stored_as_naive_utc(created_at):
+    entry = parse_import_line(f'{{"journal_content": "A good day", "created_at": "{created_at}"}}')
+    assert entry["created_at"] == datetime(2026, 1, 1, 5, 0)
+    assert entry["created_at"].tzinfo is None
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from routers.emotion_frame import SCORE_COLUMNS
+from routers.journal_similarity import UserJournalIndex
+
+START = datetime(2026, 1, 1)
+
+
+def vector(value):
+    return [value] * len(SCORE_COLUMNS)
+
+
+@pytest.fixture
+def index():
+    return UserJournalIndex([1, 2, 3], [START + timedelta(days=day) for day in range(3)], [vector(1), vector(5), vector(9)])
+
+
+def ids(results):
+    return [result["id"] for result in results]
+
+
+def test_nearest_orders_by_distance(index):
+    results = index.nearest(vector(6), k=2)
+    assert ids(results) == [2, 3]
+    assert results[0]["distance"] == pytest.approx(len(SCORE_COLUMNS) ** 0.5)
+    assert results[0]["created_at"] == START + timedelta(days=1)
+
+
+def test_nearest_excludes_the_entry_itself(index):
+    assert ids(index.nearest(vector(4), k=3, exclude_id=2)) == [1, 3]
+
+
+def test_nearest_on_an_empty_index():
+    assert UserJournalIndex([], [], []).nearest(vector(1), k=3) == []
+
+
+def test_upsert_replaces_scores_of_an_indexed_entry(index):
+    index.upsert(1, START, vector(8))
+    assert ids(index.nearest(vector(8), k=1)) == [1]
+    assert index.size == 3
+
+
+def test_upsert_grows_past_the_initial_capacity(index):
+    for journal_id in range(4, 40):
+        index.upsert(journal_id, START, vector(journal_id))
+    assert index.size == 39
+    assert ids(index.nearest(vector(39), k=1)) == [39]
+    assert list(index.vector_of(20)) == vector(20)
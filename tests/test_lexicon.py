@@ -0,0 +1,45 @@
+from routers.lexicon import score_journal_locally
+from routers.utils import is_valid_analysis
+
+
+def test_result_is_a_valid_analysis():
+    result = score_journal_locally("I was happy and grateful for the sunny walk.")
+    assert is_valid_analysis(result)
+    assert result["journal_content"] == "I was happy and grateful for the sunny walk."
+
+
+def test_positive_cues_raise_emotions_and_positive_sentiment():
+    result = score_journal_locally("I was happy and laughed a lot, so grateful for my friends.")
+    assert result["emotion"]["happiness"] > 0
+    assert result["emotion"]["gratitude"] > 0
+    assert result["sentiment"]["positive"] > result["sentiment"]["negative"]
+
+
+def test_negative_cues_raise_negative_sentiment():
+    result = score_journal_locally("I felt sad and afraid, and angry about everything.")
+    assert result["emotion"]["sadness"] > 0
+    assert result["sentiment"]["negative"] > result["sentiment"]["positive"]
+
+
+def test_negation_flips_the_cue():
+    result = score_journal_locally("I was not happy today.")
+    assert result["emotion"]["happiness"] == 0
+    assert result["sentiment"]["negative"] > 0
+
+
+def test_intensifier_raises_the_score():
+    plain = score_journal_locally("I was happy.")
+    boosted = score_journal_locally("I was extremely happy.")
+    assert boosted["emotion"]["happiness"] > plain["emotion"]["happiness"]
+
+
+def test_text_without_cues_is_neutral():
+    result = score_journal_locally("The train left at nine.")
+    assert set(result["emotion"].values()) == {0}
+    assert result["sentiment"] == {"positive": 0, "negative": 0, "neutral": 10}
+
+
+def test_scores_saturate_at_ten():
+    result = score_journal_locally(" ".join(["happy"] * 200))
+    assert result["emotion"]["happiness"] == 10
+    assert result["sentiment"]["neutral"] == 0
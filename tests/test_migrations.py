@@ -0,0 +1,31 @@
+from alembic.config import Config as AlembicConfig
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+
+from db import database
+
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(AlembicConfig(database.ALEMBIC_CONFIG_PATH)).get_current_head()
+
+
+def test_init_db_upgrades_a_fresh_database_to_head(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    monkeypatch.setattr(database, "engine", engine)
+
+    database.init_db()
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT version_num FROM alembic_version")).scalar() == head_revision()
+    assert "journals" in inspect(engine).get_table_names()
+
+
+def test_init_db_is_idempotent(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    monkeypatch.setattr(database, "engine", engine)
+
+    database.init_db()
+    database.init_db()
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM alembic_version")).scalar() == 1
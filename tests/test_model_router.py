@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from routers import model_router as mr
+from routers.model_router import ModelRouter, ModelTier
+
+
+def make_router():
+    tiers = {
+        "fast": ModelTier("fast", "fast-model", timeout=10, latency_target=3, input_cost_per_million=0, output_cost_per_million=0),
+        "standard": ModelTier("standard", "standard-model", timeout=30, latency_target=10, input_cost_per_million=0, output_cost_per_million=0),
+        "quality": ModelTier("quality", "quality-model", timeout=60, latency_target=30, input_cost_per_million=0, output_cost_per_million=0),
+    }
+    routes = {
+        "journal_analyze": ["fast", "standard"],
+        "weekly_analysis": ["quality", "standard"],
+    }
+    return ModelRouter(tiers, routes)
+
+
+def names(tiers):
+    return [tier.name for tier in tiers]
+
+
+def test_plan_follows_task_route():
+    router = make_router()
+    assert names(router.plan("journal_analyze", 100)) == ["fast", "standard"]
+    assert names(router.plan("weekly_analysis", 100)) == ["quality", "standard"]
+    assert names(router.plan("unknown_task", 100)) == ["standard"]
+
+
+def test_large_single_entry_skips_fast_tier():
+    router = make_router()
+    assert names(router.plan("journal_analyze", mr.FAST_TIER_MAX_PROMPT_TOKENS + 1)) == ["standard"]
+
+
+def test_failing_tier_moves_behind_healthy_ones():
+    router = make_router()
+    for _ in range(mr.TIER_FAILURE_THRESHOLD):
+        router.tiers["fast"].record_failure()
+    assert names(router.plan("journal_analyze", 100)) == ["standard", "fast"]
+
+
+def test_slow_tier_recovers_after_cooldown(monkeypatch):
+    router = make_router()
+    fast = router.tiers["fast"]
+    fast.record_success(fast.latency_target * 2)
+    assert names(router.plan("journal_analyze", 100)) == ["standard", "fast"]
+
+    now = time.monotonic()
+    monkeypatch.setattr(mr.time, "monotonic", lambda: now + mr.TIER_COOLDOWN_SECONDS + 1)
+    assert names(router.plan("journal_analyze", 100)) == ["fast", "standard"]
+    assert fast.avg_latency is None
+
+
+def test_call_falls_back_and_records_failure():
+    router = make_router()
+    sent = []
+
+    def send(tier, timeout):
+        sent.append(tier.name)
+        if tier.name == "fast":
+            raise RuntimeError("unusable output")
+        return "ok"
+
+    assert router.call("journal_analyze", 100, send) == "ok"
+    assert sent == ["fast", "standard"]
+    assert router.tiers["fast"].consecutive_failures == 1
+
+
+def test_call_reraises_last_error():
+    router = make_router()
+
+    def send(tier, timeout):
+        raise RuntimeError(tier.name)
+
+    with pytest.raises(RuntimeError, match="standard"):
+        router.call("journal_analyze", 100, send)
+
+
+def test_deadline_caps_timeouts_and_keeps_time_for_fallback():
+    router = make_router()
+    timeouts = {}
+
+    def send(tier, timeout):
+        timeouts[tier.name] = timeout
+        raise RuntimeError("timeout")
+
+    with pytest.raises(RuntimeError):
+        router.call("weekly_analysis", 100, send, deadline=time.monotonic() + 30)
+
+    # Half of the 30s budget is kept for the fallback, which then gets what is left
+    assert 14 < timeouts["quality"] <= 15
+    assert 14 < timeouts["standard"] <= 30
+
+
+def test_expired_deadline_raises_timeout():
+    router = make_router()
+
+    with pytest.raises(TimeoutError):
+        router.call("weekly_analysis", 100, lambda tier, timeout: "ok", deadline=time.monotonic() - 1)
@@ -0,0 +1,66 @@
+from routers.near_duplicates import (
+    NEAR_DUPLICATE_MAX_ENTRIES,
+    NEAR_DUPLICATE_THRESHOLD,
+    UserDuplicateIndex,
+    minhash_signature,
+    shingles,
+)
+
+ENTRY = (
+    "Today was a long day at work. The meeting ran late and I missed my train home, "
+    "so I walked in the rain and got back tired but somehow calm after a warm dinner with my sister."
+)
+NEAR_COPY = ENTRY.replace("my sister", "my brother") + " Going to sleep early."
+UNRELATED = (
+    "Finished the first draft of the garden plan: tomatoes along the fence, herbs near the door, "
+    "and a small bench under the old apple tree where the morning light is best."
+)
+
+
+def test_shingles_ignore_case_and_punctuation():
+    assert shingles("Hello, World! again today") == shingles("hello world again TODAY")
+    assert shingles("just two") == {"just two"}
+    assert shingles("...") == set()
+
+
+def test_empty_text_has_no_signature():
+    assert minhash_signature("  !? ") is None
+
+
+def test_signature_is_deterministic():
+    assert (minhash_signature(ENTRY) == minhash_signature(ENTRY)).all()
+
+
+def test_near_copy_matches_above_threshold():
+    index = UserDuplicateIndex()
+    index.add(1, minhash_signature(ENTRY))
+    index.add(2, minhash_signature(UNRELATED))
+
+    journal_id, similarity = index.best_match(minhash_signature(NEAR_COPY))
+    assert journal_id == 1
+    assert similarity >= NEAR_DUPLICATE_THRESHOLD
+
+
+def test_unrelated_text_stays_below_threshold():
+    index = UserDuplicateIndex()
+    index.add(1, minhash_signature(ENTRY))
+
+    match = index.best_match(minhash_signature(UNRELATED))
+    assert match is None or match[1] < NEAR_DUPLICATE_THRESHOLD
+
+
+def test_best_match_excludes_the_entry_itself():
+    index = UserDuplicateIndex()
+    index.add(1, minhash_signature(ENTRY))
+
+    assert index.best_match(minhash_signature(ENTRY), exclude_id=1) is None
+
+
+def test_index_drops_oldest_entries_beyond_limit():
+    index = UserDuplicateIndex()
+    for journal_id in range(NEAR_DUPLICATE_MAX_ENTRIES + 1):
+        index.add(journal_id, minhash_signature(f"entry number {journal_id} about something else entirely"))
+
+    assert len(index.signatures) == NEAR_DUPLICATE_MAX_ENTRIES
+    assert 0 not in index.signatures
+    assert all(0 not in bucket for bucket in index.buckets.values())
@@ -0,0 +1,89 @@
+import json
+
+from db.models import Journal
+from routers.utils import (
+    DIGEST_MAX_TOKENS,
+    backfill_journal_digests,
+    digest_from_analysis,
+    estimate_tokens,
+    extract_digest,
+    fit_journals_to_token_budget,
+)
+
+LONG_ENTRY = " ".join(f"Sentence number {i} says something about the day." for i in range(60))
+
+
+def formatted(content, **extra):
+    return {"date": "2026-01-01", "journal_content": content, "happiness_score": 5, **extra}
+
+
+def json_tokens(entries):
+    return sum(estimate_tokens(json.dumps(entry)) for entry in entries)
+
+
+def test_extract_digest_keeps_whole_leading_sentences():
+    digest = extract_digest(LONG_ENTRY)
+    assert digest.startswith("Sentence number 0 says something about the day.")
+    assert digest.endswith(".")
+    assert estimate_tokens(digest) <= DIGEST_MAX_TOKENS
+
+
+def test_extract_digest_cuts_a_single_long_sentence_at_a_word():
+    digest = extract_digest("word " * 500)
+    assert digest.endswith("...")
+    assert estimate_tokens(digest) <= DIGEST_MAX_TOKENS + 1
+
+
+def test_extract_digest_keeps_short_entries():
+    assert extract_digest("Short   entry.\nTwo lines.") == "Short entry. Two lines."
+
+
+def test_digest_from_analysis():
+    assert digest_from_analysis({"digest": "  A  calm day. "}) == "A calm day."
+    assert digest_from_analysis({"digest": ""}) is None
+    assert digest_from_analysis({}) is None
+    assert estimate_tokens(digest_from_analysis({"digest": "word " * 500})) <= DIGEST_MAX_TOKENS + 1
+
+
+def test_backfill_only_condenses_long_entries_without_digest():
+    long_entry = Journal(journal_content=LONG_ENTRY)
+    short_entry = Journal(journal_content="Short entry.")
+    digested = Journal(journal_content=LONG_ENTRY, digest="existing")
+
+    assert backfill_journal_digests([long_entry, short_entry, digested]) == 1
+    assert long_entry.digest == extract_digest(LONG_ENTRY)
+    assert short_entry.digest is None
+    assert digested.digest == "existing"
+
+
+def test_entries_within_budget_are_unchanged():
+    entries = [formatted("A short entry."), formatted("Another one.")]
+    assert fit_journals_to_token_budget(entries, 10_000) is entries
+
+
+def test_entries_are_shortened_to_fit_and_keep_their_fields():
+    entries = [formatted(LONG_ENTRY, id=i) for i in range(5)]
+    budget = json_tokens(entries) // 3
+
+    fitted = fit_journals_to_token_budget(entries, budget)
+
+    assert json_tokens(fitted) <= budget + len(entries)
+    assert [entry["id"] for entry in fitted] == list(range(5))
+    assert all(entry["happiness_score"] == 5 for entry in fitted)
+    assert all(entry["journal_content"] for entry in fitted)
+
+
+def test_short_entries_pass_their_share_on():
+    entries = [formatted("Short entry."), formatted(LONG_ENTRY)]
+    budget = json_tokens([formatted("")] * 2) + 200
+
+    short, long = fit_journals_to_token_budget(entries, budget)
+
+    assert short["journal_content"] == "Short entry."
+    assert estimate_tokens(long["journal_content"]) > 100
+
+
+def test_entries_lose_their_text_when_no_budget_is_left():
+    entries = [formatted(LONG_ENTRY), formatted(LONG_ENTRY)]
+    fitted = fit_journals_to_token_budget(entries, 1)
+    assert [entry["journal_content"] for entry in fitted] == ["", ""]
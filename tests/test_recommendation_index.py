@@ -0,0 +1,90 @@
+import pytest
+
+from db.db_enum import RecommendationType
+from db.models import Recommendation, RecommendationTypeModel
+from routers import catalogue
+from routers.catalogue import bump_catalogue_version, get_catalogue_version
+from routers.emotion_frame import SCORE_NAMES
+from routers.recommendation_index import RecommendationIndex
+
+
+def add_recommendation(db, title, profile, recommendation_type=RecommendationType.MUSIC):
+    type_id = db.query(RecommendationTypeModel.id).filter(
+        RecommendationTypeModel.recommendation_type == recommendation_type
+    ).scalar()
+    recommendation = Recommendation(title=title, ref_url=f"https://example.com/{title}", recco_category=type_id,
+                                    emotion_profile=profile)
+    db.add(recommendation)
+    db.flush()
+    return recommendation
+
+
+@pytest.fixture
+def index(session_factory):
+    with session_factory() as db:
+        add_recommendation(db, "upbeat", {"happiness": 9, "joy": 8})
+        add_recommendation(db, "soothing", {"sadness": 7, "relief": 9})
+        add_recommendation(db, "workout", {"anger": 8, "positive": 3}, RecommendationType.EXERCISE)
+        add_recommendation(db, "unprofiled", None)
+        db.commit()
+        index = RecommendationIndex()
+        index.load(db)
+    return index
+
+
+def vector(**scores):
+    return [scores.get(name, 0) for name in SCORE_NAMES]
+
+
+def titles(items):
+    return [item["title"] for item in items]
+
+
+def test_top_k_ranks_by_cosine_similarity(index):
+    assert titles(index.top_k(vector(happiness=1, joy=1), k=2)) == ["upbeat", "soothing"]
+    assert titles(index.top_k(vector(sadness=5, relief=4), k=1)) == ["soothing"]
+
+
+def test_top_k_skips_items_without_profile_and_caps_k(index):
+    assert sorted(titles(index.top_k(vector(happiness=1), k=10))) == ["soothing", "upbeat", "workout"]
+
+
+def test_top_k_filters_by_type(index):
+    assert titles(index.top_k(vector(happiness=1), k=5, recommendation_type=RecommendationType.EXERCISE)) == ["workout"]
+    assert index.top_k(vector(happiness=1), recommendation_type=RecommendationType.FOOD) == []
+
+
+def test_top_k_scores_are_cosines(index):
+    (item,) = index.top_k(vector(happiness=9, joy=8), k=1)
+    assert item["score"] == pytest.approx(1.0)
+
+
+def test_local_upsert_keeps_the_index_current(session_factory, index, monkeypatch):
+    monkeypatch.setattr(catalogue, "CATALOGUE_VERSION_CHECK_SECONDS", 0)
+    with session_factory() as db:
+        recommendation = add_recommendation(db, "calm", {"relief": 10})
+        version = bump_catalogue_version(db)
+        db.commit()
+        index.upsert(recommendation, RecommendationType.MUSIC, version)
+
+        assert index.version == version
+        monkeypatch.setattr(index, "load", lambda db: pytest.fail("reloaded after a local upsert"))
+        index.ensure_current(db)
+    assert titles(index.top_k(vector(relief=1), k=1)) == ["calm"]
+
+
+def test_upsert_after_a_missed_change_still_reloads(session_factory, index, monkeypatch):
+    monkeypatch.setattr(catalogue, "CATALOGUE_VERSION_CHECK_SECONDS", 0)
+    with session_factory() as db:
+        # A change made on another worker
+        add_recommendation(db, "remote", {"fear": 10})
+        bump_catalogue_version(db)
+        recommendation = add_recommendation(db, "calm", {"relief": 10})
+        version = bump_catalogue_version(db)
+        db.commit()
+        index.upsert(recommendation, RecommendationType.MUSIC, version)
+
+        assert index.version == version - 2
+        index.ensure_current(db)
+        assert index.version == get_catalogue_version(db)
+    assert titles(index.top_k(vector(fear=1), k=1)) == ["remote"]
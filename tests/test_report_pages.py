@@ -0,0 +1,53 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from db.models import WeeklyReport
+from routers.utils import decode_report_cursor, encode_report_cursor, get_user_reports_page
+
+START = datetime(2026, 1, 1, 12)
+
+
+def test_cursor_round_trip():
+    position = (datetime(2026, 1, 2, 3, 4, 5, 678), 42)
+    assert decode_report_cursor(encode_report_cursor(*position)) == position
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", encode_report_cursor(START, 1)[:-4], "MjAyNi0wMS0wMQ=="])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_report_cursor(cursor)
+
+
+def add_reports(session_factory, created_ats):
+    with session_factory() as db:
+        reports = [
+            WeeklyReport(user_id=1, from_date=date(2026, 1, 1), to_date=date(2026, 1, 7), report_response="{}", created_at=created_at)
+            for created_at in created_ats
+        ]
+        db.add_all(reports)
+        db.commit()
+        return [report.id for report in reports]
+
+
+def test_pages_walk_all_reports_newest_first(session_factory):
+    # Two reports share a timestamp, so the id breaks the tie
+    ids = add_reports(session_factory, [START, START + timedelta(days=1), START + timedelta(days=1), START + timedelta(days=2), START])
+
+    seen, cursor = [], None
+    with session_factory() as db:
+        while True:
+            rows, cursor = get_user_reports_page(db, 1, limit=2, cursor=cursor)
+            seen.extend(row.id for row in rows)
+            if cursor is None:
+                break
+
+    assert seen == [ids[3], ids[2], ids[1], ids[4], ids[0]]
+
+
+def test_last_full_page_has_no_cursor(session_factory):
+    add_reports(session_factory, [START, START + timedelta(days=1)])
+    with session_factory() as db:
+        rows, cursor = get_user_reports_page(db, 1, limit=2)
+    assert len(rows) == 2
+    assert cursor is None
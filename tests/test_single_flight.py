@@ -0,0 +1,146 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.models import SingleFlightResult
+from utils.single_flight import DatabaseResultBackend, SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": 42}
+
+    async def main():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*[flight.do("key", compute) for _ in range(5)])
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight._calls == {}
+
+
+def test_different_keys_compute_separately():
+    async def main():
+        flight = SingleFlight("test")
+        return await asyncio.gather(flight.do("a", _value("a")), flight.do("b", _value("b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+
+
+def test_exception_reaches_every_caller_and_key_is_released():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight._calls == {}
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def main():
+        flight = SingleFlight("test")
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", compute))
+        second = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def _value(value):
+    async def compute():
+        await asyncio.sleep(0)
+        return value
+    return compute
+
+
+def workers(session_factory, count=2, **backend_options):
+    """SingleFlight instances with their own backends, standing in for separate worker processes"""
+    return [SingleFlight("test", DatabaseResultBackend(session_factory, **backend_options)) for _ in range(count)]
+
+
+def counting(calls, value, delay=0.05):
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return value
+    return compute
+
+
+def test_backend_shares_one_result_between_workers(session_factory):
+    calls = []
+
+    async def main():
+        first, second = workers(session_factory)
+        return await asyncio.gather(
+            first.do("key", counting(calls, {"value": 1})),
+            second.do("key", counting(calls, {"value": 2})),
+        )
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results[0] == results[1]
+
+
+def test_backend_reuses_stored_result_until_it_expires(session_factory):
+    calls = []
+
+    async def main():
+        first, second = workers(session_factory)
+        await first.do("key", counting(calls, [1, 2], delay=0))
+        return await second.do("key", counting(calls, [3], delay=0))
+
+    assert asyncio.run(main()) == [1, 2]
+    assert len(calls) == 1
+
+    with session_factory() as db:
+        db.query(SingleFlightResult).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+    assert asyncio.run(workers(session_factory, 1)[0].do("key", counting(calls, [3], delay=0))) == [3]
+
+
+def test_backend_releases_the_claim_when_the_computation_fails(session_factory):
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def main():
+        (worker,) = workers(session_factory, 1)
+        with pytest.raises(RuntimeError):
+            await worker.do("key", fail)
+        return await worker.do("key", counting([], "retried", delay=0))
+
+    assert asyncio.run(main()) == "retried"
+
+
+def test_backend_takes_over_a_dead_claim(session_factory):
+    calls = []
+    claimed_at = datetime.utcnow() - timedelta(seconds=10)
+    with session_factory() as db:
+        db.add(SingleFlightResult(key_hash=DatabaseResultBackend.key_hash("test", "key"), created_at=claimed_at,
+                                  expires_at=claimed_at + timedelta(hours=1)))
+        db.commit()
+
+    (worker,) = workers(session_factory, 1, lease=5)
+    assert asyncio.run(worker.do("key", counting(calls, "computed", delay=0))) == "computed"
+    assert len(calls) == 1
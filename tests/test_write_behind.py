@@ -0,0 +1,97 @@
+import asyncio
+
+from db.db_enum import AnalysisStatus
+from db.models import Journal
+from utils.write_behind import JournalWriteBuffer
+
+
+def journal_row(content: str):
+    return {"journal_content": content, "user_id": 1, "analysis_status": AnalysisStatus.PENDING}
+
+
+def stored_contents(session_factory):
+    with session_factory() as db:
+        return dict(db.query(Journal.id, Journal.journal_content).all())
+
+
+def test_concurrent_writes_are_batched_and_get_their_own_ids(session_factory):
+    flushed = []
+
+    async def main():
+        buffer = JournalWriteBuffer(session_factory, batch_size=50, flush_interval=0.05)
+        original_flush = buffer._flush
+
+        async def record_flush(batch):
+            flushed.append(len(batch))
+            await original_flush(batch)
+
+        buffer._flush = record_flush
+        buffer.start()
+        ids = await asyncio.gather(*[buffer.write(journal_row(f"entry {i}")) for i in range(10)])
+        await buffer.stop()
+        return ids
+
+    ids = asyncio.run(main())
+    assert flushed == [10]
+    contents = stored_contents(session_factory)
+    assert [contents[journal_id] for journal_id in ids] == [f"entry {i}" for i in range(10)]
+
+
+def test_full_batch_is_flushed_without_waiting(session_factory):
+    flushed = []
+
+    async def main():
+        buffer = JournalWriteBuffer(session_factory, batch_size=3, flush_interval=60)
+        original_flush = buffer._flush
+
+        async def record_flush(batch):
+            flushed.append(len(batch))
+            await original_flush(batch)
+
+        buffer._flush = record_flush
+        buffer.start()
+        ids = await asyncio.wait_for(
+            asyncio.gather(*[buffer.write(journal_row(f"entry {i}")) for i in range(3)]), timeout=5
+        )
+        await buffer.stop()
+        return ids
+
+    assert len(asyncio.run(main())) == 3
+    assert flushed == [3]
+
+
+def test_stop_drains_queued_rows(session_factory):
+    async def main():
+        buffer = JournalWriteBuffer(session_factory, batch_size=2, flush_interval=60)
+        buffer.start()
+        writes = [asyncio.ensure_future(buffer.write(journal_row(f"entry {i}"))) for i in range(5)]
+        await asyncio.sleep(0)
+        await buffer.stop()
+        return await asyncio.gather(*writes)
+
+    ids = asyncio.run(main())
+    assert len(set(ids)) == 5
+    assert len(stored_contents(session_factory)) == 5
+
+
+def test_write_inserts_directly_when_not_running(session_factory):
+    async def main():
+        return await JournalWriteBuffer(session_factory).write(journal_row("direct"))
+
+    journal_id = asyncio.run(main())
+    assert stored_contents(session_factory) == {journal_id: "direct"}
+
+
+def test_failed_batch_fails_every_write(session_factory):
+    async def main():
+        buffer = JournalWriteBuffer(session_factory, batch_size=2, flush_interval=0.01)
+        buffer.start()
+        # Missing the non-nullable user_id
+        results = await asyncio.gather(
+            buffer.write({"journal_content": "a"}), buffer.write({"journal_content": "b"}), return_exceptions=True
+        )
+        await buffer.stop()
+        return results
+
+    assert all(isinstance(result, Exception) for result in asyncio.run(main()))
+    assert stored_contents(session_factory) == {}
@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from db.models import IdempotencyKey
+from utils.metrics import record_cache, time_stage
+
+logger = logging.getLogger(__name__)
+
+# How long a stored response is replayed for a repeated key
+IDEMPOTENCY_TTL = timedelta(hours=int(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24')))
+# How long a duplicate waits for the first request with its key before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '60'))
+# An in-progress key claimed longer ago than this is taken to belong to a dead worker and is claimed again.
+# Shorter than IDEMPOTENCY_WAIT_SECONDS so that a waiting retry takes over instead of failing with 409.
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', '30'))
+IDEMPOTENCY_POLL_SECONDS = 0.1
+# Expired keys are purged at most this often per worker
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = 600
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+_last_purge = 0.0
+
+
+def fingerprint_request(*parts: Any) -> str:
+    """Digest of the request fields that must match when a key is reused"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _claim(db: Session, user_id: int, endpoint: str, key: str, request_hash: str) -> Optional[Tuple[int, datetime]]:
+    """
+    Insert an in-progress row for the key. Returns its id and claim time, or None if the key is already taken.
+    The row is committed at once so duplicates in other workers see it.
+    """
+    now = datetime.utcnow()
+    result = db.execute(
+        insert(IdempotencyKey).values(
+            key=key, user_id=user_id, endpoint=endpoint, request_hash=request_hash,
+            created_at=now, expires_at=now + IDEMPOTENCY_TTL,
+        ).on_conflict_do_nothing(index_elements=["user_id", "endpoint", "key"]).returning(IdempotencyKey.id)
+    )
+    record_id = result.scalar()
+    db.commit()
+    return None if record_id is None else (record_id, now)
+
+
+def _reclaim(db: Session, record: IdempotencyKey) -> Optional[datetime]:
+    """
+    Take over an in-progress key whose lease has run out by renewing its claim time (created_at).
+    The update only matches the claim that was read, so of several retries exactly one wins.
+    Returns the new claim time, or None if another request took the key first.
+    """
+    now = datetime.utcnow()
+    updated = db.query(IdempotencyKey).filter(
+        IdempotencyKey.id == record.id,
+        IdempotencyKey.status_code.is_(None),
+        IdempotencyKey.created_at == record.created_at,
+    ).update({"created_at": now, "expires_at": now + IDEMPOTENCY_TTL}, synchronize_session=False)
+    db.commit()
+    return now if updated == 1 else None
+
+
+def _replay(record: IdempotencyKey) -> JSONResponse:
+    return JSONResponse(
+        content=json.loads(record.response_body),
+        status_code=record.status_code,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def purge_expired_idempotency_keys(session_factory) -> None:
+    """Delete expired keys, at most once per IDEMPOTENCY_PURGE_INTERVAL_SECONDS"""
+    global _last_purge
+    if time.monotonic() - _last_purge < IDEMPOTENCY_PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = time.monotonic()
+    db = session_factory()
+    try:
+        with time_stage("db_query", "purge_idempotency_keys"):
+            deleted = db.query(IdempotencyKey).filter(
+                IdempotencyKey.expires_at < datetime.utcnow()
+            ).delete(synchronize_session=False)
+            db.commit()
+        if deleted:
+            logger.info(f"Purged {deleted} expired idempotency key(s)")
+    finally:
+        db.close()
+
+
+async def run_idempotent(
+    db: Session,
+    user_id: int,
+    endpoint: str,
+    key: str,
+    request_hash: str,
+    handler: Callable[[Session], Awaitable[Tuple[int, Dict[str, Any]]]],
+) -> JSONResponse:
+    """
+    Run handler once per (user, endpoint, Idempotency-Key) and replay its stored response for repeats.
+
+    handler gets db and returns (status_code, JSON body). Its writes on db are left uncommitted and
+    are committed together with the stored response, so a crash can never leave the work done
+    without a response to replay. A duplicate that arrives while the first request is running
+    waits for its response, and takes the key over once the claim is older than
+    IDEMPOTENCY_LEASE_SECONDS; a key reused with a different request is rejected with 422.
+    If the handler raises, the key is released so that the client can retry.
+    """
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Idempotency-Key is too long")
+
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        claim = _claim(db, user_id, endpoint, key, request_hash)
+        if claim is not None:
+            record_id, claimed_at = claim
+            break
+
+        record = db.query(IdempotencyKey).filter_by(user_id=user_id, endpoint=endpoint, key=key).populate_existing().first()
+        if record is None:
+            # Released or purged between the insert and the lookup: claim it again
+            continue
+        if record.expires_at < datetime.utcnow():
+            db.delete(record)
+            db.commit()
+            continue
+        if record.request_hash != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+        if record.status_code is not None:
+            record_cache("idempotency", True)
+            return _replay(record)
+        if record.created_at < datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS):
+            claimed_at = _reclaim(db, record)
+            if claimed_at is not None:
+                logger.warning(f"Reclaimed idempotency key {record.id} after its lease ran out")
+                record_id = record.id
+                break
+            continue
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress"
+            )
+        # The first request is still running, possibly in another worker
+        db.rollback()
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+    record_cache("idempotency", False)
+    # Matches the key only while this request still holds the claim
+    own_claim = db.query(IdempotencyKey).filter(
+        IdempotencyKey.id == record_id,
+        IdempotencyKey.created_at == claimed_at,
+        IdempotencyKey.status_code.is_(None),
+    )
+    try:
+        status_code, body = await handler(db)
+    except BaseException:
+        db.rollback()
+        own_claim.delete(synchronize_session=False)
+        db.commit()
+        raise
+
+    stored = own_claim.update({"status_code": status_code, "response_body": json.dumps(body)}, synchronize_session=False)
+    if stored != 1:
+        # The lease ran out and a retry took the key over; drop this request's writes
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still in progress"
+        )
+    db.commit()
+    return JSONResponse(content=body, status_code=status_code)
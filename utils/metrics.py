@@ -0,0 +1,130 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from starlette.responses import Response
+
+# Request latency per route template (not the raw path, to keep label cardinality bounded)
+REQUEST_LATENCY = Histogram(
+    "stressbreak_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+)
+
+# Latency of the individual stages inside a request: llm_call, json_parse, db_query, chart_render, base64_encode
+STAGE_LATENCY = Histogram(
+    "stressbreak_stage_duration_seconds",
+    "Latency of a processing stage within a request",
+    ["stage", "name"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+LLM_TOKENS = Counter(
+    "stressbreak_llm_tokens_total",
+    "LLM tokens used",
+    ["kind", "tier"],
+)
+
+LLM_COST = Counter(
+    "stressbreak_llm_cost_usd_total",
+    "Estimated LLM spend in USD",
+    ["tier"],
+)
+
+# Latency of each attempt on a model tier, including failed ones that fell back to another tier
+LLM_CALL_LATENCY = Histogram(
+    "stressbreak_llm_call_duration_seconds",
+    "LLM call latency per task, model tier and outcome",
+    ["task", "tier", "outcome"],
+    buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+
+CACHE_REQUESTS = Counter(
+    "stressbreak_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result"],
+)
+
+ERRORS = Counter(
+    "stressbreak_errors_total",
+    "Errors by stage",
+    ["stage"],
+)
+
+
+@contextmanager
+def time_stage(stage: str, name: str = ""):
+    """
+    Record the duration of a block in the stage latency histogram.
+    An exception raised in the block is counted as an error of that stage and re-raised.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.labels(stage=stage).inc()
+        raise
+    finally:
+        STAGE_LATENCY.labels(stage=stage, name=name).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool):
+    """Count one lookup of the named cache"""
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_llm_usage(tier: str, prompt_tokens: int, response_tokens: int, cost: float):
+    """Count the prompt and response tokens and the cost of one LLM call on a model tier"""
+    if prompt_tokens:
+        LLM_TOKENS.labels(kind="prompt", tier=tier).inc(prompt_tokens)
+    if response_tokens:
+        LLM_TOKENS.labels(kind="response", tier=tier).inc(response_tokens)
+    if cost:
+        LLM_COST.labels(tier=tier).inc(cost)
+
+
+def record_llm_call(task: str, tier: str, outcome: str, seconds: float):
+    """Record one attempt of an LLM call on a model tier (outcome is success or error)"""
+    LLM_CALL_LATENCY.labels(task=task, tier=tier, outcome=outcome).observe(seconds)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route.
+    Written as plain ASGI (rather than BaseHTTPMiddleware) so it adds no extra task or body buffering.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            ERRORS.labels(stage="request").inc()
+            raise
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                method=scope["method"],
+                route=route.path if route is not None else "unmatched",
+                status=str(status_code),
+            ).observe(time.perf_counter() - start)
+
+
+def metrics_response() -> Response:
+    """Render all metrics in the Prometheus text exposition format"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,165 @@
+import os
+import sys
+import hmac
+import time
+import uuid
+import logging
+import threading
+from collections import Counter
+from typing import Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+# Profiling is only available when a token is configured; requests must present it
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', './profiles')
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL_MS', '5')) / 1000
+PROFILE_TOP_N = 30
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_QUERY_PARAM = "profile_token"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+
+# Innermost frames in these modules mean a worker thread is idle (waiting for work), not busy
+IDLE_WAIT_MODULES = ("threading.py", "queue.py", "selectors.py")
+
+
+class StackSampler:
+    """
+    Sampling profiler for the event loop thread and the worker threads.
+    Periodically records the Python stacks from a background thread and aggregates
+    identical stacks, which is exactly the folded flamegraph format. Each stack is
+    rooted at its thread's name; idle worker threads are left out, while the event
+    loop thread is always recorded so the time spent awaiting stays visible.
+    """
+
+    def __init__(self, loop_thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self._thread.ident:
+                    continue
+                if thread_id != self.loop_thread_id and os.path.basename(frame.f_code.co_filename) in IDLE_WAIT_MODULES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(f"thread {names.get(thread_id, thread_id)}")
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        """Stacks in folded format, usable with flamegraph.pl or speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, elapsed: float, top_n: int = PROFILE_TOP_N) -> str:
+        """Top functions by self and total (inclusive) sample counts"""
+        # Threads are sampled side by side, so percentages are of all samples, not of wall time
+        total_samples = sum(self.stacks.values()) or 1
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+
+        lines = [f"wall time: {elapsed * 1000:.1f} ms, samples: {sum(self.stacks.values())}, interval: {self.interval * 1000:.1f} ms", ""]
+        for title, counts in (("Top by self time", self_counts), ("Top by total time", total_counts)):
+            lines.append(title)
+            for frame, count in counts.most_common(top_n):
+                lines.append(f"  {count / total_samples * 100:6.2f}%  {count:6d}  {frame}")
+            lines.append("")
+        return "\n".join(lines)
+
+
+def _requested_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value.decode("latin-1")
+    if PROFILE_QUERY_PARAM.encode() in scope.get("query_string", b""):
+        values = parse_qs(scope["query_string"].decode("latin-1")).get(PROFILE_QUERY_PARAM)
+        if values:
+            return values[0]
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles a single request when it carries the profile token,
+    either as an X-Profile-Token header or a profile_token query parameter.
+
+    The profile is written to PROFILE_DIR as <id>.folded (flamegraph input) and
+    <id>.txt (top-N summary), and the id is returned in the X-Profile-Id header.
+    The event loop thread and all busy worker threads are sampled: Gemini calls and
+    chart rendering run in the threadpool (run_in_threadpool), so their time shows up
+    under the worker threads while the loop thread shows the awaiting handler.
+    Worker threads are shared, so work of concurrent requests appears as well;
+    profile on a quiet worker for a clean breakdown.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _requested_token(scope)
+        # Compared as bytes: compare_digest rejects str arguments with non-ASCII characters
+        if token is None or not hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident())
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            write_profile(profile_id, scope["path"], sampler, time.perf_counter() - start)
+
+
+def write_profile(profile_id: str, path: str, sampler: StackSampler, elapsed: float):
+    """Write the folded stacks and the summary of a profiled request to PROFILE_DIR"""
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w") as f:
+            f.write(sampler.folded())
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.txt"), "w") as f:
+            f.write(f"path: {path}\n")
+            f.write(sampler.summary(elapsed))
+        logger.info(f"Profile {profile_id} for {path} written to {PROFILE_DIR}")
+    except OSError as e:
+        logger.error(f"Could not write profile {profile_id}: {str(e)}")
+
+
+def profiling_enabled() -> bool:
+    """Whether the profiling middleware should be installed at all"""
+    return bool(PROFILE_TOKEN)
@@ -0,0 +1,122 @@
+import os
+import time
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from prometheus_client import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with their parameters redacted
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+# How often one statement shape may run within a request before it is reported as N+1
+N_PLUS_ONE_LIMIT = int(os.environ.get('N_PLUS_ONE_LIMIT', '10'))
+# In strict mode (tests) exceeding N_PLUS_ONE_LIMIT raises instead of logging a warning
+SQL_STRICT = os.environ.get('SQL_STRICT', 'false').lower() == 'true'
+
+REQUEST_DB_STATEMENTS = Histogram(
+    "stressbreak_request_db_statements",
+    "SQL statements issued per request",
+    ["route"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250),
+)
+REQUEST_DB_TIME = Histogram(
+    "stressbreak_request_db_seconds",
+    "Total time spent in SQL statements per request",
+    ["route"],
+)
+
+
+class NPlusOneError(Exception):
+    """Raised in strict mode when a request repeats one statement shape too often"""
+
+
+class QueryStats:
+    """SQL statistics of a single request"""
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.reported = set()
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def redact_parameters(parameters):
+    """Describe statement parameters without exposing their values"""
+    if isinstance(parameters, dict):
+        return {key: "<redacted>" for key in parameters}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"<{len(parameters)} parameter sets>"
+        return ["<redacted>"] * len(parameters)
+    return "<redacted>"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f} ms): {statement} parameters={redact_parameters(parameters)}"
+        )
+
+    stats = _current_stats.get()
+    if stats is None:
+        return
+
+    stats.statements += 1
+    stats.duration += elapsed
+    # Bound parameters are placeholders in the statement text, so the text is its shape
+    stats.shapes[statement] += 1
+    if stats.shapes[statement] > N_PLUS_ONE_LIMIT and statement not in stats.reported:
+        stats.reported.add(statement)
+        message = f"Possible N+1 query: statement ran more than {N_PLUS_ONE_LIMIT} times in one request: {statement}"
+        if SQL_STRICT:
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+
+def install_query_instrumentation(engine):
+    """Attach the statement timing listeners to an engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware collecting per-request SQL statement counts and DB time.
+    The totals are recorded as Prometheus histograms and logged at debug level.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_stats.reset(token)
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            REQUEST_DB_STATEMENTS.labels(route=route_path).observe(stats.statements)
+            REQUEST_DB_TIME.labels(route=route_path).observe(stats.duration)
+            logger.debug(
+                f"{scope['method']} {scope['path']}: {stats.statements} statement(s), "
+                f"{stats.duration * 1000:.1f} ms in the database"
+            )
@@ -59,4 +59,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if user is None:
         raise credentials_exception
     
-    return user 
\ No newline at end of file
+    return user 
+
+async def get_current_admin_user(current_user = Depends(get_current_user)):
+    """Get the current user and require the admin role"""
+    from db.db_enum import UserRole
+    if current_user.role.role_type != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return current_user
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.dialects.postgresql import insert
+
+from db.models import SingleFlightResult
+from utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Set to "database" to share results between worker processes through the single_flight_results table
+SINGLE_FLIGHT_BACKEND = os.environ.get('SINGLE_FLIGHT_BACKEND', '').lower()
+# How long a stored result is reused for the same key
+SINGLE_FLIGHT_RESULT_TTL_SECONDS = float(os.environ.get('SINGLE_FLIGHT_RESULT_TTL_SECONDS', '300'))
+# A claim without a result after this long is taken to belong to a dead worker and is taken over
+SINGLE_FLIGHT_LEASE_SECONDS = float(os.environ.get('SINGLE_FLIGHT_LEASE_SECONDS', '120'))
+SINGLE_FLIGHT_POLL_SECONDS = 0.2
+# Expired results are purged at most this often per worker
+SINGLE_FLIGHT_PURGE_INTERVAL_SECONDS = 600
+
+_CLAIMED, _STORED, _PENDING, _RETRY = "claimed", "stored", "pending", "retry"
+
+
+class DatabaseResultBackend:
+    """
+    Shares flight results between worker processes through the single_flight_results table.
+
+    The first worker to claim a key computes the result and stores it as JSON. Workers that find
+    the key claimed poll until the result is stored and return it instead of computing their own,
+    and later calls reuse it for SINGLE_FLIGHT_RESULT_TTL_SECONDS. Results must therefore be
+    JSON-serializable and determined by the key. A failed computation releases its claim, and a
+    claim older than SINGLE_FLIGHT_LEASE_SECONDS is taken over.
+    """
+
+    def __init__(self, session_factory, ttl: float = SINGLE_FLIGHT_RESULT_TTL_SECONDS,
+                 lease: float = SINGLE_FLIGHT_LEASE_SECONDS):
+        self.session_factory = session_factory
+        self.ttl = timedelta(seconds=ttl)
+        self.lease = timedelta(seconds=lease)
+        self._last_purge = 0.0
+
+    @staticmethod
+    def key_hash(name: str, key: Hashable) -> str:
+        return hashlib.sha256(json.dumps([name, key], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _claim_or_read(self, key_hash: str) -> Tuple[str, Any]:
+        """Claim the key, or read its stored result; returns (state, claim time or stored JSON)"""
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            self._purge_expired(db, now)
+            claimed = db.execute(
+                insert(SingleFlightResult).values(
+                    key_hash=key_hash, created_at=now, expires_at=now + self.lease + self.ttl,
+                ).on_conflict_do_nothing(index_elements=["key_hash"]).returning(SingleFlightResult.id)
+            ).scalar()
+            db.commit()
+            if claimed is not None:
+                return _CLAIMED, now
+
+            record = db.query(SingleFlightResult).filter_by(key_hash=key_hash).first()
+            if record is None:
+                return _RETRY, None
+            if record.expires_at < now:
+                db.delete(record)
+                db.commit()
+                return _RETRY, None
+            if record.result is not None:
+                return _STORED, record.result
+            if record.created_at < now - self.lease:
+                # Only matches the claim that was read, so of several workers exactly one takes over
+                taken = db.query(SingleFlightResult).filter(
+                    SingleFlightResult.id == record.id,
+                    SingleFlightResult.created_at == record.created_at,
+                    SingleFlightResult.result.is_(None),
+                ).update({"created_at": now, "expires_at": now + self.lease + self.ttl}, synchronize_session=False)
+                db.commit()
+                if taken == 1:
+                    logger.warning(f"Took over single flight result {record.id} after its lease ran out")
+                    return _CLAIMED, now
+                return _RETRY, None
+            return _PENDING, None
+
+    def _own_claim(self, db, key_hash: str, claimed_at: datetime):
+        return db.query(SingleFlightResult).filter(
+            SingleFlightResult.key_hash == key_hash,
+            SingleFlightResult.created_at == claimed_at,
+            SingleFlightResult.result.is_(None),
+        )
+
+    def _store(self, key_hash: str, claimed_at: datetime, result: str):
+        with self.session_factory() as db:
+            self._own_claim(db, key_hash, claimed_at).update(
+                {"result": result, "expires_at": datetime.utcnow() + self.ttl}, synchronize_session=False
+            )
+            db.commit()
+
+    def _release(self, key_hash: str, claimed_at: datetime):
+        with self.session_factory() as db:
+            self._own_claim(db, key_hash, claimed_at).delete(synchronize_session=False)
+            db.commit()
+
+    def _purge_expired(self, db, now: datetime):
+        if time.monotonic() - self._last_purge < SINGLE_FLIGHT_PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        db.query(SingleFlightResult).filter(SingleFlightResult.expires_at < now).delete(synchronize_session=False)
+        db.commit()
+
+    async def run(self, name: str, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        key_hash = self.key_hash(name, key)
+        while True:
+            state, value = await run_in_threadpool(self._claim_or_read, key_hash)
+            if state == _STORED:
+                record_cache(f"shared_result_{name}", True)
+                return json.loads(value)
+            if state == _CLAIMED:
+                claimed_at = value
+                break
+            if state == _PENDING:
+                # Another worker is computing the result
+                await asyncio.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+
+        record_cache(f"shared_result_{name}", False)
+        try:
+            result = await fn()
+        except BaseException:
+            await run_in_threadpool(self._release, key_hash, claimed_at)
+            raise
+        try:
+            await run_in_threadpool(self._store, key_hash, claimed_at, json.dumps(result))
+        except Exception as e:
+            # The result is still returned; other workers take the key over once the lease runs out
+            logger.warning(f"Failed to store single flight result for {name}: {str(e)}")
+        return result
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one computation.
+
+    The first caller starts the computation as its own task; callers arriving while it
+    runs await the same task and get the same result (or exception). Cancelling one
+    caller, e.g. on a timeout, does not cancel the computation for the others, so fn
+    must not use resources owned by the caller's request (such as its DB session).
+    Results are shared objects, so callers must not mutate them.
+
+    Without a backend coalescing is per worker process. With a DatabaseResultBackend the
+    computation also runs once across workers, which then share its stored result.
+    """
+
+    def __init__(self, name: str, backend: Optional[DatabaseResultBackend] = None):
+        self.name = name
+        self.backend = backend
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(self._run(key, fn))
+            # Retrieve the exception even if every caller has gone, to avoid "never retrieved" warnings
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._calls[key] = task
+        record_cache(f"single_flight_{self.name}", shared)
+        return await asyncio.shield(task)
+
+    async def _run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            if self.backend is not None:
+                return await self.backend.run(self.name, key, fn)
+            return await fn()
+        finally:
+            self._calls.pop(key, None)
@@ -0,0 +1,108 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import text
+
+from db.database import engine, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Number of pooled DB connections opened before the worker reports ready
+WARMUP_DB_CONNECTIONS = int(os.environ.get('WARMUP_DB_CONNECTIONS', '5'))
+
+_ready = threading.Event()
+_completed_steps: List[str] = []
+
+
+def is_ready() -> bool:
+    """Whether the warm-up has finished and the worker can take traffic"""
+    return _ready.is_set()
+
+
+def completed_steps() -> List[str]:
+    """Names of the warm-up steps that have finished so far"""
+    return list(_completed_steps)
+
+
+def warm_db_pool():
+    """Open the pooled DB connections up front so first requests skip connect and TLS setup"""
+    size = min(WARMUP_DB_CONNECTIONS, engine.pool.size())
+    connections = []
+    try:
+        # Hold them all at once, otherwise the pool would hand back the same connection
+        for _ in range(size):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def warm_templates():
+    """Compile the prompt templates"""
+    from routers.utils import prompt_env, PROMPT_TEMPLATES
+    for name in PROMPT_TEMPLATES:
+        prompt_env.get_template(name)
+
+
+def warm_charts():
+    """Render every chart once to import matplotlib/seaborn and build the font cache"""
+    from routers.utils import generate_visualizations, EmotionFrame
+    from routers.emotion_frame import SCORE_NAMES
+    today = datetime.utcnow().date()
+    dates = [today - timedelta(days=offset) for offset in (1, 0)]
+    generate_visualizations(EmotionFrame(dates, [[1] * len(SCORE_NAMES), [2] * len(SCORE_NAMES)]))
+
+
+def warm_llm_client():
+    """Create the Gemini client and open its connection with a cheap metadata call"""
+    from routers.utils import get_client
+    from routers.model_router import MODEL_TIERS
+    client = get_client()
+    client.models.get(model=MODEL_TIERS["standard"].model)
+
+
+def warm_recommendation_index():
+    """Load the recommendation catalogue into the in-memory similarity index"""
+    from routers.recommendation_index import recommendation_index
+    with SessionLocal() as db:
+        recommendation_index.load(db)
+
+
+WARMUP_STEPS = [
+    ("db_pool", warm_db_pool),
+    ("templates", warm_templates),
+    ("charts", warm_charts),
+    ("recommendation_index", warm_recommendation_index),
+    ("llm_client", warm_llm_client),
+]
+
+
+def run_warmup():
+    """
+    Run every warm-up step, then mark the worker ready.
+    A failing step is logged and skipped so that an upstream outage cannot keep the worker out of rotation.
+    """
+    for name, step in WARMUP_STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+            _completed_steps.append(name)
+            logger.info(f"Warm-up step '{name}' finished in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            logger.warning(f"Warm-up step '{name}' failed: {str(e)}")
+    
+    _ready.set()
+    logger.info("Warm-up complete, worker is ready.")
+
+
+def start_warmup() -> threading.Thread:
+    """Run the warm-up in a background thread so startup (and liveness) is not delayed"""
+    thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+
+from db.database import SessionLocal
+from db.models import Journal
+from utils.metrics import time_stage
+
+logger = logging.getLogger(__name__)
+
+# Group journal inserts from concurrent requests into micro-batches; unset inserts each entry on its own
+JOURNAL_WRITE_BEHIND = os.environ.get('JOURNAL_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+# A batch is written once it holds this many rows or its first row has waited this long
+JOURNAL_WRITE_BATCH_SIZE = int(os.environ.get('JOURNAL_WRITE_BATCH_SIZE', '50'))
+JOURNAL_WRITE_FLUSH_SECONDS = float(os.environ.get('JOURNAL_WRITE_FLUSH_MS', '20')) / 1000
+
+
+def insert_journal_rows(session_factory, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    Insert journal rows in one executemany round-trip on a short-lived session.
+    Returns the new ids in the order of rows.
+    """
+    with session_factory() as db:
+        with time_stage("db_query", "insert_journals"):
+            result = db.execute(insert(Journal).returning(Journal.id, sort_by_parameter_order=True), rows)
+            journal_ids = list(result.scalars())
+            db.commit()
+    return journal_ids
+
+
+class JournalWriteBuffer:
+    """
+    Write-behind buffer for journal inserts.
+
+    Callers await write(row) and get the row's id once the batch holding it is committed,
+    so a response never acknowledges an entry that is not stored. A single flusher task
+    writes each batch with one pooled connection. stop() flushes everything still queued,
+    which makes a graceful shutdown lose no entries. While the buffer is not running,
+    write() inserts the row directly.
+    """
+
+    def __init__(self, session_factory, batch_size: int = JOURNAL_WRITE_BATCH_SIZE,
+                 flush_interval: float = JOURNAL_WRITE_FLUSH_SECONDS):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None and not self._flusher.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._flusher = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Flush the queued rows and stop the flusher"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._flusher
+        self._flusher = None
+
+    async def write(self, row: Dict[str, Any]) -> int:
+        if not self.running:
+            return (await run_in_threadpool(insert_journal_rows, self.session_factory, [row]))[0]
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch: List[Tuple[Dict[str, Any], asyncio.Future]] = [item]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout) if timeout > 0 else self._queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # Rows queued behind the stop marker are still written
+        while not self._queue.empty():
+            batch = []
+            while not self._queue.empty() and len(batch) < self.batch_size:
+                item = self._queue.get_nowait()
+                if item is not None:
+                    batch.append(item)
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        try:
+            journal_ids = await run_in_threadpool(insert_journal_rows, self.session_factory, [row for row, _ in batch])
+        except Exception as e:
+            logger.error(f"Failed to write a batch of {len(batch)} journal entries: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), journal_id in zip(batch, journal_ids):
+            if not future.done():
+                future.set_result(journal_id)
+
+
+journal_write_buffer = JournalWriteBuffer(SessionLocal)